@@ -0,0 +1,274 @@
+"""
+Simulador de terminal ZKTeco para pruebas de rendimiento.
+
+Implementa el subconjunto del protocolo que usa pyzk para conectarse, leer
+tamaños, usuarios y asistencias, consultar hora/versión/opciones y borrar
+el registro de asistencias, tanto por TCP como por UDP en el mismo puerto.
+"""
+
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from struct import pack, unpack
+
+CMD_USERTEMP_RRQ = 9
+CMD_OPTIONS_RRQ = 11
+CMD_ATTLOG_RRQ = 13
+CMD_CLEAR_ATTLOG = 15
+CMD_GET_FREE_SIZES = 50
+CMD_GET_TIME = 201
+CMD_CONNECT = 1000
+CMD_EXIT = 1001
+CMD_GET_VERSION = 1100
+CMD_PREPARE_DATA = 1500
+CMD_DATA = 1501
+CMD_FREE_DATA = 1502
+CMD_PREPARE_BUFFER = 1503
+CMD_READ_BUFFER = 1504
+CMD_ACK_OK = 2000
+CMD_ACK_ERROR = 2001
+
+MACHINE_PREPARE_DATA_1 = 0x5050
+MACHINE_PREPARE_DATA_2 = 0x7D82
+UDP_PACKET = 1024
+# Por TCP, los buffers más grandes que esto se leen por tramos (CMD_READ_BUFFER), como en los equipos reales
+TCP_INLINE_MAX = 0xFFc0
+
+
+def encode_time(t):
+    """Codificación de fecha del equipo (EncodeTime de zkemsdk)"""
+    return (
+        ((t.year % 100) * 12 * 31 + ((t.month - 1) * 31) + t.day - 1) *
+        (24 * 60 * 60) + (t.hour * 60 + t.minute) * 60 + t.second
+    )
+
+
+class SimulatedDevice:
+    """Terminal simulado que sirve `records` asistencias sintéticas de `users` usuarios"""
+
+    def __init__(self, records=1000, users=50, host='127.0.0.1', port=0, latency=0.0,
+                 serial=None, name=None, seed=0, bandwidth=None):
+        self.host = host
+        self.latency = latency
+        # Bytes por segundo al enviar datos (None: sin límite)
+        self.bandwidth = bandwidth
+        self.serial = serial or f"SIM{seed:06d}"
+        self.name = name or f"Simulador {seed}"
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._users = self._make_users(users)
+        self._records = self._make_records(records)
+        # Marcaciones generadas desde el inicio (siguen avanzando aunque se vacíe el registro)
+        self._generated = records
+
+        device = self
+
+        class TCPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                device._serve_tcp(self.request)
+
+        class UDPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                device._serve_udp(data, sock, self.client_address)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._tcp = socketserver.ThreadingTCPServer((host, port), TCPHandler)
+        self._tcp.daemon_threads = True
+        self.port = self._tcp.server_address[1]
+        self._udp = socketserver.ThreadingUDPServer((host, self.port), UDPHandler)
+        self._udp.daemon_threads = True
+        self._udp_buffers = {}
+
+    # --- Datos sintéticos ---
+    def _make_users(self, count):
+        users = []
+        for uid in range(1, count + 1):
+            user_id = str(1000 + uid).encode()
+            name = f"Usuario {uid}".encode()
+            users.append(pack('<HB8s24sIx7sx24s', uid, 0, b'', name, 0, b'1', user_id))
+        return users
+
+    def _make_records(self, count, first=0):
+        start = datetime(2025, 1, 1, 7, 0, 0)
+        records = []
+        user_count = max(len(self._users), 1)
+        for i in range(first, first + count):
+            uid = i % user_count + 1
+            timestamp = start + timedelta(seconds=i * 37)
+            records.append(pack('<H24sB4sB8s', uid, str(1000 + uid).encode(), 1,
+                                pack('<I', encode_time(timestamp)), i % 2, b''))
+        return records
+
+    def add_records(self, count):
+        """Agrega registros nuevos al final (simula marcaciones posteriores)"""
+        with self._lock:
+            self._records.extend(self._make_records(count, self._generated))
+            self._generated += count
+
+    @property
+    def record_count(self):
+        with self._lock:
+            return len(self._records)
+
+    def _sizes(self):
+        fields = [0] * 20
+        fields[4] = len(self._users)
+        fields[8] = len(self._records)
+        fields[15] = 3000
+        fields[16] = 100000
+        return pack('20i', *fields) + pack('3i', 0, 0, 0)
+
+    def _table(self, rows):
+        body = b''.join(rows)
+        return pack('<I', len(body)) + body
+
+    # --- Protocolo ---
+    def _reply(self, command, session, reply_id, data=b''):
+        return pack('<4H', command, 0, session, reply_id) + data
+
+    def _handle(self, header, payload):
+        """Retorna (respuesta, datos del buffer preparado o None)"""
+        command, _, session, reply_id = unpack('<4H', header)
+        if self.latency:
+            time.sleep(self.latency)
+        if command == CMD_CONNECT:
+            return self._reply(CMD_ACK_OK, 0x1234, reply_id), None
+        if command == CMD_GET_FREE_SIZES:
+            with self._lock:
+                return self._reply(CMD_ACK_OK, session, reply_id, self._sizes()), None
+        if command == CMD_PREPARE_BUFFER:
+            _, table, fct, _ = unpack('<bhii', payload[:11])
+            with self._lock:
+                if table == CMD_ATTLOG_RRQ:
+                    buffer = self._table(self._records)
+                elif table == CMD_USERTEMP_RRQ:
+                    buffer = self._table(self._users)
+                else:
+                    buffer = pack('<I', 0)
+            return self._reply(CMD_DATA, session, reply_id, buffer), buffer
+        if command == CMD_GET_TIME:
+            return self._reply(CMD_ACK_OK, session, reply_id, pack('<I', encode_time(datetime.now()))), None
+        if command == CMD_GET_VERSION:
+            return self._reply(CMD_ACK_OK, session, reply_id, b'Ver 6.60 Simulador\x00'), None
+        if command == CMD_OPTIONS_RRQ:
+            key = payload.split(b'\x00')[0]
+            values = {b'~SerialNumber': self.serial.encode(), b'~DeviceName': self.name.encode()}
+            value = values.get(key, b'')
+            return self._reply(CMD_ACK_OK, session, reply_id, key + b'=' + value + b'\x00'), None
+        if command == CMD_CLEAR_ATTLOG:
+            with self._lock:
+                self._records = []
+            return self._reply(CMD_ACK_OK, session, reply_id), None
+        # CMD_EXIT, CMD_FREE_DATA, habilitar/deshabilitar, etc.
+        return self._reply(CMD_ACK_OK, session, reply_id), None
+
+    @staticmethod
+    def _tcp_frame(packet):
+        return pack('<HHI', MACHINE_PREPARE_DATA_1, MACHINE_PREPARE_DATA_2, len(packet)) + packet
+
+    def _serve_tcp(self, sock):
+        prepared = b''
+        try:
+            while True:
+                top = self._recv_exact(sock, 8)
+                if not top:
+                    return
+                _, _, length = unpack('<HHI', top)
+                packet = self._recv_exact(sock, length)
+                if packet is None:
+                    return
+                command, _, session, reply_id = unpack('<4H', packet[:8])
+                if command == CMD_READ_BUFFER:
+                    # Tramo del buffer preparado: PREPARE_DATA (tamaño), DATA y ACK_OK
+                    start, size = unpack('<ii', packet[8:16])
+                    chunk = prepared[start:start + size]
+                    frame = (self._tcp_frame(self._reply(CMD_PREPARE_DATA, session, reply_id, pack('<II', len(chunk), 0))) +
+                             self._tcp_frame(self._reply(CMD_DATA, session, reply_id, chunk)) +
+                             self._tcp_frame(self._reply(CMD_ACK_OK, session, reply_id)))
+                else:
+                    response, buffer = self._handle(packet[:8], packet[8:])
+                    if buffer is not None and len(buffer) > TCP_INLINE_MAX:
+                        prepared = buffer
+                        response = self._reply(CMD_ACK_OK, session, reply_id, b'\x00' + pack('<I', len(buffer)))
+                    elif command == CMD_FREE_DATA:
+                        prepared = b''
+                    frame = self._tcp_frame(response)
+                if self.bandwidth and len(frame) > 1024:
+                    time.sleep(len(frame) / self.bandwidth)
+                sock.sendall(frame)
+                with self._lock:
+                    self.bytes_sent += len(frame)
+                if command == CMD_EXIT:
+                    return
+        except OSError:
+            return
+
+    def _serve_udp(self, data, sock, address):
+        command, _, session, reply_id = unpack('<4H', data[:8])
+        payload = data[8:]
+        if command == CMD_READ_BUFFER:
+            # Por UDP el buffer se entrega en paquetes de 1024 bytes: PREPARE_DATA, DATA..., ACK_OK
+            start, size = unpack('<ii', payload[:8])
+            buffer = self._udp_buffers.get(address, b'')[start:start + size]
+            packets = [self._reply(CMD_PREPARE_DATA, session, reply_id, pack('<I', len(buffer)))]
+            for offset in range(0, len(buffer), UDP_PACKET):
+                packets.append(self._reply(CMD_DATA, session, reply_id, buffer[offset:offset + UDP_PACKET]))
+            packets.append(self._reply(CMD_ACK_OK, session, reply_id))
+        else:
+            response, buffer = self._handle(data[:8], payload)
+            if buffer is not None:
+                self._udp_buffers[address] = buffer
+                response = self._reply(CMD_ACK_OK, session, reply_id, b'\x00' + pack('<I', len(buffer)))
+            packets = [response]
+        for packet in packets:
+            sock.sendto(packet, address)
+            with self._lock:
+                self.bytes_sent += len(packet)
+
+    @staticmethod
+    def _recv_exact(sock, size):
+        chunks = []
+        while size:
+            chunk = sock.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    # --- Ciclo de vida ---
+    def start(self):
+        threading.Thread(target=self._tcp.serve_forever, daemon=True).start()
+        threading.Thread(target=self._udp.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._tcp.shutdown()
+        self._udp.shutdown()
+        self._tcp.server_close()
+        self._udp.server_close()
+
+    def device_info(self, device_id):
+        """Datos del dispositivo en el formato de /biometricdevices"""
+        return {'id': device_id, 'name': self.name, 'ip_address': self.host, 'port': self.port}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulador de terminal ZKTeco")
+    parser.add_argument('--port', type=int, default=4370)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--bandwidth', type=int, help="Bytes por segundo al enviar datos")
+    args = parser.parse_args()
+
+    sim = SimulatedDevice(records=args.records, users=args.users, port=args.port, bandwidth=args.bandwidth).start()
+    print(f"Simulador escuchando en {sim.host}:{sim.port} ({args.records} registros). Ctrl+C para salir.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
@@ -0,0 +1,164 @@
+"""
+Prueba de carga de la API HTTP del servicio con cada servidor (dev / production).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --servers production --clients 64 --duration 20
+
+Lanza `--clients` hilos (repartidos en `--processes` procesos, para no competir por el
+GIL con el servidor) con sesiones keep-alive que llaman a /estado y, en la proporción
+`--sync-ratio`, a /execute-sync contra un dispositivo simulado.
+Produce una línea JSON por servidor con latencias p50/p95/p99 por ruta.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return round(values[index] * 1000, 2)
+
+
+def client_process(base_url, device, threads, duration, sync_ratio):
+    """Proceso cliente: `threads` hilos con sesiones keep-alive; retorna latencias por ruta"""
+    import requests
+
+    latencies = {'/estado': [], '/execute-sync': []}
+    errors = {'/estado': 0, '/execute-sync': 0}
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+    every = max(int(round(1 / sync_ratio)), 1) if sync_ratio else 0
+
+    def client():
+        session = requests.Session()
+        count = 0
+        while time.time() < stop_at:
+            count += 1
+            is_sync = every and count % every == 0
+            path = '/execute-sync' if is_sync else '/estado'
+            started = time.perf_counter()
+            try:
+                if is_sync:
+                    response = session.post(base_url + path, json=device, timeout=30)
+                else:
+                    response = session.get(base_url + path, timeout=30)
+                ok = response.status_code < 300
+            except requests.exceptions.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies[path].append(elapsed)
+                else:
+                    errors[path] += 1
+
+    workers = [threading.Thread(target=client, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors
+
+
+def run_load(backend, clients, processes, duration, sync_ratio, records):
+    """Levanta el servicio con `backend` y lo somete a carga desde procesos aparte"""
+    from benchmarks.device_sim import SimulatedDevice
+    from benchmarks.mock_api import MockApi
+    from services.wsgi_server import create_server
+    from services.zkteco import device_pool
+    from zkteco_service import ZKTecoService
+
+    device_pool.ommit_ping = True
+    sim = SimulatedDevice(records=records).start()
+    api = MockApi(devices=[sim.device_info(1)]).start()
+
+    service = ZKTecoService(installer_mode=True)
+    service.api_url_base = api.base_url
+    service.init_flask_server()
+    server = create_server(service.flask_app, '127.0.0.1', 0, backend)
+    service.http_server = server
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Hilos del proceso servidor durante la prueba
+    threads_peak = threading.active_count()
+    sampling = threading.Event()
+
+    def sample_threads():
+        nonlocal threads_peak
+        while not sampling.wait(0.1):
+            threads_peak = max(threads_peak, threading.active_count())
+
+    threading.Thread(target=sample_threads, daemon=True).start()
+
+    per_process = [clients // processes + (1 if i < clients % processes else 0) for i in range(processes)]
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(len(per_process)) as pool:
+        outcomes = pool.starmap(client_process, [
+            (base_url, sim.device_info(1), count, duration, sync_ratio) for count in per_process if count
+        ])
+    sampling.set()
+
+    server_stats = server.stats()
+    drain_started = time.perf_counter()
+    drained = server.drain(10)
+    drain_time = time.perf_counter() - drain_started
+    api.stop()
+    sim.stop()
+
+    result = {
+        'server': backend,
+        'clients': clients,
+        'client_processes': processes,
+        'duration': duration,
+        'server_threads_peak': threads_peak,
+        'drained': drained,
+        'drain_seconds': round(drain_time, 3),
+        'server_stats': server_stats,
+    }
+    for path in ('/estado', '/execute-sync'):
+        values = [value for latencies, _ in outcomes for value in latencies[path]]
+        key = path.strip('/').replace('-', '_')
+        result[key] = {
+            'requests': len(values),
+            'errors': sum(errors[path] for _, errors in outcomes),
+            'rps': round(len(values) / duration, 1),
+            'p50_ms': percentile(values, 0.50),
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API HTTP del servicio ZKTeco")
+    parser.add_argument('--servers', default='dev,production', help="Servidores a comparar: dev, production")
+    parser.add_argument('--clients', type=int, default=32, help="Clientes concurrentes")
+    parser.add_argument('--processes', type=int, default=4, help="Procesos entre los que se reparten los clientes")
+    parser.add_argument('--duration', type=float, default=10, help="Duración de cada prueba (s)")
+    parser.add_argument('--sync-ratio', type=float, default=0.05, help="Fracción de peticiones a /execute-sync")
+    parser.add_argument('--records', type=int, default=200, help="Registros del dispositivo simulado")
+    args = parser.parse_args()
+
+    # Estado local aislado (cola, trabajos, índices) en un directorio temporal
+    os.environ.setdefault('ZKTECO_DATA_DIR', tempfile.mkdtemp(prefix='zkload-'))
+
+    for backend in args.servers.split(','):
+        result = run_load(backend, args.clients, max(1, min(args.processes, args.clients)), args.duration,
+                          args.sync_ratio, args.records)
+        sys.stdout.write(json.dumps(result, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
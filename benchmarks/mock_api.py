@@ -0,0 +1,129 @@
+"""
+Sustituto local de los endpoints /api/zkteco/* de Laravel para pruebas de rendimiento.
+
+Permite configurar latencia por petición y una tasa de fallos (HTTP 503) y
+cuenta peticiones, bytes y registros recibidos.
+"""
+
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class MockApi:
+    """API simulada; `devices` es la lista que retorna /biometricdevices"""
+
+    def __init__(self, devices=None, latency=0.0, failure_rate=0.0, host='127.0.0.1', port=0, seed=0):
+        self.devices = devices or []
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.stats = {
+            'requests': 0,
+            'failures': 0,
+            'bytes_received': 0,
+            'bytes_sent': 0,
+            'records_received': 0,
+            'users_received': 0,
+            'users_deleted': 0,
+            'cleared_devices': [],
+        }
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                api._handle(self, 'GET')
+
+            def do_POST(self):
+                api._handle(self, 'POST')
+
+            def do_DELETE(self):
+                api._handle(self, 'DELETE')
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://{host}:{self._server.server_address[1]}/api/zkteco"
+
+    def _handle(self, handler, method):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        request_bytes = len(body) + sum(len(k) + len(v) + 4 for k, v in handler.headers.items()) + len(handler.requestline) + 2
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_received'] += request_bytes
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+
+        path = handler.path.split('?')[0]
+        headers = {}
+        if fail:
+            status, payload = 503, {'message': 'Servicio no disponible (simulado)'}
+            with self._lock:
+                self.stats['failures'] += 1
+        elif method == 'GET' and path.endswith('/biometricdevices'):
+            # ETag del contenido para probar las peticiones condicionales
+            etag = '"%08x"' % (zlib.crc32(json.dumps(self.devices).encode('utf-8')))
+            headers['ETag'] = etag
+            if handler.headers.get('If-None-Match') == etag:
+                status, payload = 304, None
+            else:
+                status, payload = 200, self.devices
+        elif method == 'DELETE' and path.endswith('/clear-attendance'):
+            # Solo se limpia un dispositivo por vez: sin device_id se rechaza
+            device_id = parse_qs(urlsplit(handler.path).query).get('device_id')
+            if device_id:
+                with self._lock:
+                    self.stats['cleared_devices'].append(device_id[0])
+                status, payload = 200, {'message': f'Caché del dispositivo {device_id[0]} limpiado'}
+            else:
+                status, payload = 422, {'message': 'Falta device_id'}
+        elif method == 'POST' and path.endswith('/attendance'):
+            records = json.loads(body or b'[]')
+            with self._lock:
+                self.stats['records_received'] += len(records)
+            status, payload = 200, {'message': f'{len(records)} registros recibidos'}
+        elif method == 'POST' and path.endswith('/users'):
+            users = json.loads(body or b'[]')
+            with self._lock:
+                self.stats['users_received'] += len(users)
+            status, payload = 200, {'message': f'{len(users)} usuarios recibidos'}
+        elif method == 'POST' and path.endswith('/users/delete'):
+            users = json.loads(body or b'[]')
+            with self._lock:
+                self.stats['users_deleted'] += len(users)
+            status, payload = 200, {'message': f'{len(users)} usuarios eliminados'}
+        else:
+            status, payload = 404, {'message': 'No encontrado'}
+
+        response = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(response)))
+        handler.end_headers()
+        handler.wfile.write(response)
+        with self._lock:
+            self.stats['bytes_sent'] += len(response)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,196 @@
+"""
+Benchmarks de sincronización de extremo a extremo contra dispositivos simulados y una API simulada.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --devices 1,10,50,200 --records 2000 --latency 0.02 --output bench.jsonl
+    python -m benchmarks.run_benchmarks --scenarios silent --records 40000 --device-bandwidth 500000 --pipeline both
+
+Cada escenario se ejecuta en un proceso aparte (estado local y RSS máximo aislados)
+y produce una línea JSON con registros/s, tiempo total, RSS máximo y bytes transferidos.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb():
+    """RSS máximo del proceso actual en MB"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+
+
+def run_scenario(spec):
+    """Ejecuta un escenario en este proceso y retorna sus métricas"""
+    from benchmarks.device_sim import SimulatedDevice
+    from benchmarks.mock_api import MockApi
+    from services import config
+    from services.http_client import get_http_client
+    from services.zkteco import device_pool
+
+    # Los simuladores no responden ICMP; además así se mide solo el protocolo
+    device_pool.ommit_ping = True
+    config.get_settings('sync')
+    config._settings['sync']['pipeline'] = spec['pipeline']
+
+    sims = [SimulatedDevice(records=spec['records'], users=spec['users'], latency=spec['device_latency'],
+                            bandwidth=spec['device_bandwidth'], seed=i).start()
+            for i in range(spec['devices'])]
+    api = MockApi(devices=[sim.device_info(i + 1) for i, sim in enumerate(sims)],
+                  latency=spec['latency'], failure_rate=spec['failure_rate']).start()
+
+    def run_once():
+        if spec['scenario'] == 'silent':
+            from services.silent_sync import ZKTecoSilentSync
+            result = ZKTecoSilentSync(sims[0].device_info(1), api_url_base=api.base_url, verbose=False).run()
+            return {'ok': int(result['ok']), 'failed': int(not result['ok']), 'timings': result.get('timings'),
+                    'stages': result.get('stages')}
+        from zkteco_service import ZKTecoService
+        service = ZKTecoService(installer_mode=True)
+        service.api_url_base = api.base_url
+        service._perform_auto_sync()
+        summary = service.last_sync_summary or {'ok': 0, 'failed': spec['devices']}
+        return {'ok': summary['ok'], 'failed': summary['failed'] + summary.get('timeout', 0), 'timings': None,
+                'stages': None}
+
+    try:
+        # Primera pasada: volcado completo
+        if spec['incremental']:
+            run_once()
+            for sim in sims:
+                sim.add_records(spec['incremental'])
+            api.stats.update({key: 0 for key in api.stats})
+            for sim in sims:
+                sim.bytes_sent = 0
+
+        started = time.perf_counter()
+        outcome = run_once()
+        wall_time = time.perf_counter() - started
+    finally:
+        api.stop()
+        for sim in sims:
+            sim.stop()
+
+    uploaded = api.stats['records_received']
+    return {
+        'scenario': spec['scenario'],
+        'devices': spec['devices'],
+        'records_per_device': spec['records'],
+        'pipeline': spec['pipeline'],
+        'device_bandwidth': spec['device_bandwidth'],
+        'incremental': spec['incremental'],
+        'api_latency': spec['latency'],
+        'failure_rate': spec['failure_rate'],
+        'wall_time': round(wall_time, 3),
+        'records_uploaded': uploaded,
+        'records_per_second': round(uploaded / wall_time, 1) if wall_time else None,
+        'devices_ok': outcome['ok'],
+        'devices_failed': outcome['failed'],
+        'peak_rss_mb': peak_rss_mb(),
+        'bytes_to_api': api.stats['bytes_received'],
+        'bytes_from_api': api.stats['bytes_sent'],
+        'bytes_from_devices': sum(sim.bytes_sent for sim in sims),
+        'api_requests': api.stats['requests'],
+        'api_failures': api.stats['failures'],
+        'http': get_http_client().stats(),
+        'timings': outcome['timings'],
+        'stages': outcome['stages'],
+    }
+
+
+def spawn_scenario(spec):
+    """Ejecuta un escenario en un proceso hijo con un directorio de datos temporal"""
+    data_dir = tempfile.mkdtemp(prefix='zkbench-')
+    env = dict(os.environ, ZKTECO_DATA_DIR=data_dir, PYTHONPATH=ROOT_DIR)
+    try:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run_benchmarks', '--child', json.dumps(spec)],
+            cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=spec['timeout']
+        )
+    except subprocess.TimeoutExpired:
+        return dict(spec, error=f"Timeout ({spec['timeout']}s)")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return dict(spec, error=(completed.stderr or completed.stdout).strip()[-500:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de sincronización ZKTeco")
+    parser.add_argument('--scenarios', default='silent,service', help="Escenarios: silent, service")
+    parser.add_argument('--devices', default='1,10,50', help="Cantidades de dispositivos para 'service'")
+    parser.add_argument('--records', type=int, default=2000, help="Registros por dispositivo")
+    parser.add_argument('--users', type=int, default=50, help="Usuarios por dispositivo")
+    parser.add_argument('--incremental', type=int, default=0,
+                        help="Si > 0, mide una segunda pasada con esta cantidad de registros nuevos")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latencia de la API simulada (s)")
+    parser.add_argument('--device-latency', type=float, default=0.0, help="Latencia por comando del dispositivo (s)")
+    parser.add_argument('--device-bandwidth', type=int, default=0,
+                        help="Ancho de banda de cada dispositivo simulado (bytes/s; 0 = sin límite)")
+    parser.add_argument('--pipeline', choices=('on', 'off', 'both'), default='on',
+                        help="Extracción por tramos en paralelo con el envío, secuencial o ambas para comparar")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fracción de peticiones con HTTP 503")
+    parser.add_argument('--timeout', type=int, default=900, help="Tiempo máximo por escenario (s)")
+    parser.add_argument('--output', help="Archivo JSON Lines de resultados (por defecto, salida estándar)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Proceso hijo: el ruido de consola va a stderr, el resultado a stdout
+        spec = json.loads(args.child)
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = run_scenario(spec)
+        stdout.write(json.dumps(result) + '\n')
+        return
+
+    pipelines = {'on': [True], 'off': [False], 'both': [False, True]}[args.pipeline]
+    specs = []
+    for scenario in args.scenarios.split(','):
+        counts = [1] if scenario == 'silent' else [int(n) for n in args.devices.split(',')]
+        for count in counts:
+            for pipeline in pipelines:
+                specs.append({
+                    'scenario': scenario,
+                    'devices': count,
+                    'records': args.records,
+                    'users': args.users,
+                    'incremental': args.incremental,
+                    'latency': args.latency,
+                    'device_latency': args.device_latency,
+                    'device_bandwidth': args.device_bandwidth,
+                    'pipeline': pipeline,
+                    'failure_rate': args.failure_rate,
+                    'timeout': args.timeout,
+                })
+
+    output = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for spec in specs:
+            result = spawn_scenario(spec)
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,592 +1,77 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import threading
-import time
-from datetime import datetime
-import json
-import requests
-import sys
-import argparse
-import os
-from urllib.parse import urljoin
-
-try:
-    from zk import ZK
-    ZK_AVAILABLE = True
-except ImportError:
-    ZK_AVAILABLE = False
-
-# --- PARTE AGREGADA: Clase para la ejecución silenciosa ---
-class ZKTecoSilentSync:
-    def __init__(self, device_info):
-        self.device_info = device_info
-        self.api_url_base = "http://localhost:8000/api/zkteco"
-        # self.api_url_base = "https://sistemas.regionpuno.gob.pe/asiss-api/api/zkteco"
-        self.log_messages = []
-        
-        # Iniciar la sincronización automáticamente
-        self.log("Modo silencioso iniciado.")
-        self.log(f"Dispositivo: {self.device_info['name']} ({self.device_info['ip_address']}:{self.device_info['port']})")
-        
-        # Primero, limpia el caché en la nube antes de extraer y enviar los datos
-        self.clear_cloud_cache()
-
-        # Luego, extrae y envía los registros
-        self.extract_and_send_attendance()
-
-    def log(self, message):
-        """Método de log simple para el modo silencioso"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        print(log_entry)
-        self.log_messages.append(log_entry)
-
-    def extract_and_send_attendance(self):
-        """Conecta, extrae y envía los datos en modo silencioso"""
-        if not ZK_AVAILABLE:
-            self.log("ERROR: Librería 'pyzk' no encontrada. Abortando.")
-            return
-
-        try:
-            ip = self.device_info['ip_address']
-            port = int(self.device_info['port'])
-            
-            self.log("Conectando al dispositivo...")
-            zk = ZK(ip, port=port, timeout=5)
-            conn = zk.connect()
-            
-            if not conn:
-                self.log("ERROR: No se pudo conectar al dispositivo.")
-                return
+"""
+Sincronización de asistencias de un dispositivo ZKTeco.
 
-            self.log("✓ Conexión exitosa.")
-            self.log("Extrayendo registros de asistencia...")
-            
-            attendance = conn.get_attendance()
-            
-            if attendance:
-                attendance_data = []
-                device_id = self.device_info.get('id')
-                for record in attendance:
-                    attendance_data.append({
-                        'uid': record.uid,
-                        'id': record.user_id,
-                        'timestamp': record.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                        'state': record.status,
-                        'type': record.punch,
-                        'device_id': device_id
-                    })
-                
-                self.log(f"✓ {len(attendance)} registros extraídos.")
-                
-                cloud_success = self.send_data_to_cloud('attendance', attendance_data, f"{self.api_url_base}/attendance")
-                
-                if cloud_success:
-                    self.log("✓ Sincronización completada exitosamente.")
-                else:
-                    self.log("✗ Fallo en la sincronización.")
-                    
-            else:
-                self.log("No se encontraron registros de asistencia en el dispositivo.")
-                
-            conn.disconnect()
-            self.log("Desconexión exitosa.")
+    main2.py --params-system '{"id": 1, "name": "...", "ip_address": "...", "port": 4370}'
+    main2.py --silent --params-system '{...}' [--full-resync] [--import-report]
 
-        except Exception as e:
-            self.log(f"ERROR: Fallo crítico durante la sincronización: {e}")
-
-    def send_data_to_cloud(self, data_type, data, endpoint):
-        """Enviar solo los datos a la API de Laravel"""
-        try:
-            self.log(f"Enviando {len(data)} registros a la nube...")
-            url = endpoint
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-            }
-            
-            response = requests.post(
-                url, 
-                json=data,
-                headers=headers,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                self.log(f"✓ {data_type.title()} enviados exitosamente. Respuesta HTTP: {response.status_code}")
-                return True
-            else:
-                self.log(f"✗ Error HTTP {response.status_code}. Respuesta: {response.text[:100]}")
-                return False
-            
-        except requests.exceptions.Timeout:
-            self.log("✗ Error de Timeout (60s) al enviar a la nube.")
-            return False
-        except requests.exceptions.ConnectionError:
-            self.log("✗ Error de conexión con el servidor.")
-            return False
-        except Exception as e:
-            self.log(f"✗ Error inesperado al enviar a la nube: {e}")
-            return False
-
-    def clear_cloud_cache(self):
-        """Limpia el caché de asistencia de la API de Laravel."""
-        try:
-            self.log("Limpiando el caché de la nube...")
-            url = f"{self.api_url_base}/clear-attendance"
-            headers = {'Accept': 'application/json'}
-            
-            # Asumiendo que el endpoint de Laravel usa un método GET o DELETE.
-            # Aquí se usa GET por simplicidad, pero DELETE sería más apropiado.
-            response = requests.delete(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                self.log(f"✓ Caché de asistencia limpiado. Respuesta: {response.json()['message']}")
-                return True
-            else:
-                self.log(f"✗ Fallo al limpiar el caché. Código de estado: {response.status_code}")
-                return False
+El modo --silent (el que usa el servicio) no carga Tk: solo importa lo que necesita la
+sincronización, y `requests` se carga en segundo plano mientras se conecta al dispositivo.
+Con --import-report (o ZKTECO_IMPORT_REPORT=1) se muestra en stderr lo que tardó cada
+importación, para detectar regresiones en el arranque.
+"""
+import time
 
-        except requests.exceptions.ConnectionError:
-            self.log("✗ Error de conexión con la API al intentar limpiar la caché.")
-            return False
-        except Exception as e:
-            self.log(f"✗ Error inesperado al limpiar la caché: {e}")
-            return False
-# --- FIN DE LA PARTE AGREGADA ---
+_STARTED = time.perf_counter()
 
+import json
+import os
+import sys
 
-class ZKTecoApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("ZKTeco Sync v1.1 - Solo Asistencias")
-        self.root.resizable(True, True)
-        self.root.resizable(False, False)
-        
-        self.connection = None
-        self.device = None
-        self.is_connected = False
-        
-        self.system_params = self.parse_system_params_fast()
-        
-        self.device_info = None
-        self.current_device_id = None
-        
-        self.setup_ui()
-        
-        if not ZK_AVAILABLE:
-            self.log_text.insert(tk.END, "ADVERTENCIA: Librería 'pyzk' no encontrada.\n")
-            self.log_text.insert(tk.END, "Instalar con: pip install pyzk\n\n")
 
-    def parse_system_params_fast(self):
-        """Parsing optimizado de parámetros del sistema"""
+def parse_system_params(value):
+    """Interpreta el JSON de --params-system (o de ZKTECO_PARAMS); None si no es válido"""
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        # Algunos lanzadores agregan espacios alrededor de los dos puntos
+        cleaned = value.strip().replace(' :', ':').replace(': ', ':')
         try:
-            for i, arg in enumerate(sys.argv):
-                if arg == '--params-system' and i + 1 < len(sys.argv):
-                    param_value = sys.argv[i + 1]
-                    try:
-                        return json.loads(param_value)
-                    except json.JSONDecodeError:
-                        cleaned = param_value.strip().replace(' :', ':').replace(': ', ':')
-                        try:
-                            return json.loads(cleaned)
-                        except:
-                            return None
-            
-            env_params = os.environ.get('ZKTECO_PARAMS')
-            if env_params:
-                return json.loads(env_params)
-            
-            return None
-            
-        except Exception:
+            return json.loads(cleaned)
+        except json.JSONDecodeError:
             return None
-    
-    def setup_ui(self):
-        # ... [El resto del código de `setup_ui` se mantiene sin cambios] ...
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
-        if self.system_params:
-            self.device_info = {
-                'id': self.system_params.get('id'),
-                'name': self.system_params.get('name', ''),
-                'ip_address': self.system_params.get('ip_address', ''),
-                'port': self.system_params.get('port', 4370)
-            }
-            self.current_device_id = self.device_info['id']
 
-        config_frame = ttk.LabelFrame(main_frame, text="Configuración de Conexión", padding="10")
-        config_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
-        
-        if self.system_params:
-            labels_data = [
-                ("Dispositivo:", self.device_info['name']),
-                ("IP:", self.device_info['ip_address']),
-                ("Puerto:", str(self.device_info['port']))
-            ]
-            
-            for i, (label_text, value_text) in enumerate(labels_data):
-                ttk.Label(config_frame, text=label_text).grid(row=i, column=0, sticky=tk.W, padx=(0, 10))
-                value_label = ttk.Label(config_frame, text=value_text, font=('Arial', 9, 'bold') if i == 0 else None)
-                value_label.grid(row=i, column=1, sticky=tk.W)
-        else:
-            error_label = ttk.Label(config_frame, text="No se puede continuar sin parámetros del dispositivo", foreground='red')
-            error_label.grid(row=0, column=0, columnspan=2)
+def main():
+    import argparse
 
-        ttk.Label(config_frame, text="Timeout (s):").grid(row=3, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
-        self.timeout_var = tk.StringVar(value="5")
-        timeout_entry = ttk.Entry(config_frame, textvariable=self.timeout_var, width=10)
-        timeout_entry.grid(row=3, column=1, sticky=tk.W, pady=(10, 0))
+    parser = argparse.ArgumentParser(description="ZKTeco Sync Application")
+    parser.add_argument('--silent', action='store_true', help="Ejecuta la aplicación en modo silencioso sin GUI.")
+    parser.add_argument('--params-system', help="Parámetros del dispositivo en formato JSON.")
+    parser.add_argument('--full-resync', action='store_true', help="Ignora la marca de agua y reenvía todos los registros del dispositivo.")
+    parser.add_argument('--import-report', action='store_true', help="Muestra en stderr el tiempo de importación de cada módulo.")
+    args, unknown = parser.parse_known_args()
 
-        button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=1, column=0, columnspan=2, pady=(0, 10))
-        
-        button_state = "normal" if self.system_params else "disabled"
-        
-        self.test_btn = ttk.Button(button_frame, text="Probar Conexión", command=self.test_connection, state=button_state)
-        self.test_btn.grid(row=0, column=0, padx=(0, 10))
-        
-        self.connect_btn = ttk.Button(button_frame, text="Conectar", command=self.connect_device, state=button_state)
-        self.connect_btn.grid(row=0, column=1, padx=(0, 10))
-        
-        self.disconnect_btn = ttk.Button(button_frame, text="Desconectar", command=self.disconnect_device, state="disabled")
-        self.disconnect_btn.grid(row=0, column=2)
-        
-        status_frame = ttk.Frame(main_frame)
-        status_frame.grid(row=2, column=0, columnspan=2, pady=(0, 10))
-        
-        ttk.Label(status_frame, text="Estado:").grid(row=0, column=0, padx=(0, 10))
-        self.status_var = tk.StringVar(value="Desconectado")
-        self.status_label = ttk.Label(status_frame, textvariable=self.status_var, foreground="red")
-        self.status_label.grid(row=0, column=1)
-        
-        data_frame = ttk.LabelFrame(main_frame, text="Extracción y Sincronización", padding="10")
-        data_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
-        
-        self.extract_attendance_btn = ttk.Button(data_frame, text="Extraer y Enviar Asistencias", command=self.extract_attendance, state="disabled")
-        self.extract_attendance_btn.grid(row=0, column=0)
-        
-        log_frame = ttk.LabelFrame(main_frame, text="Log de Eventos", padding="10")
-        log_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
-        
-        log_scroll_frame = ttk.Frame(log_frame)
-        log_scroll_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        self.log_text = tk.Text(log_scroll_frame, height=15, width=70)
-        scrollbar = ttk.Scrollbar(log_scroll_frame, orient="vertical", command=self.log_text.yview)
-        self.log_text.configure(yscrollcommand=scrollbar.set)
-        
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        
-        ttk.Button(log_frame, text="Limpiar Log", command=self.clear_log).grid(row=1, column=0, pady=(10, 0))
-        
-        main_frame.columnconfigure(0, weight=1)
-        main_frame.rowconfigure(4, weight=1)
-        log_frame.columnconfigure(0, weight=1)
-        log_frame.rowconfigure(0, weight=1)
-        log_scroll_frame.columnconfigure(0, weight=1)
-        log_scroll_frame.rowconfigure(0, weight=1)
-        
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
-        
-        self.log("Aplicación iniciada - Solo sincronización de asistencias")
-        
-        if ZK_AVAILABLE:
-            self.log("Librería ZK cargada correctamente")
-        else:
-            self.log("ADVERTENCIA: Instalar con 'pip install pyzk requests'")
-        
-        if self.system_params:
-            self.log(f"✓ Dispositivo configurado: {self.device_info['name']} ({self.device_info['ip_address']}:{self.device_info['port']})")
-        else:
-            self.log("✗ No se recibieron parámetros del sistema")
+    device_data = parse_system_params(args.params_system or os.environ.get('ZKTECO_PARAMS'))
 
-    def log(self, message):
-        """Agregar mensaje al log con timestamp"""
-        try:
-            if hasattr(self, 'log_text') and self.log_text:
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                self.root.after(0, lambda: self._safe_log_insert(timestamp, message))
-            else:
-                print(f"[LOG] {message}")
-        except Exception as e:
-            print(f"[ERROR LOG] {message} - Error: {e}")
+    profiler = None
+    if args.import_report or os.environ.get('ZKTECO_IMPORT_REPORT'):
+        from services.startup import ImportProfiler
+        profiler = ImportProfiler().install()
 
-    def _safe_log_insert(self, timestamp, message):
-        """Insertar mensaje en el log de forma segura"""
-        try:
-            self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-            self.log_text.see(tk.END)
-            self.root.update_idletasks()
-        except Exception as e:
-            print(f"[ERROR LOG INSERT] {message} - Error: {e}")
-    
-    def clear_log(self):
-        """Limpiar el log"""
-        self.log_text.delete(1.0, tk.END)
-    
-    def test_connection(self):
-        """Probar conexión con el dispositivo"""
-        if not ZK_AVAILABLE:
-            messagebox.showerror("Error", "Librería pyzk no está instalada")
-            return
-            
-        if not self.system_params:
-            messagebox.showerror("Error", "No hay parámetros de dispositivo disponibles")
-            return
-            
-        def test_conn():
-            try:
-                self.test_btn.config(state="disabled")
-                self.log("Probando conexión...")
-                
-                ip = self.device_info['ip_address']
-                port = int(self.device_info['port'])
-                timeout = int(self.timeout_var.get())
-                
-                self.log(f"Conectando a {ip}:{port}")
-                
-                zk = ZK(ip, port=port, timeout=timeout)
-                conn = zk.connect()
-                
-                if conn:
-                    try:
-                        attendance_count = len(conn.get_attendance())
-                        
-                        conn.disconnect()
-                        
-                        self.log("✓ Conexión exitosa!")
-                        self.log(f"  - Registros de asistencia: {attendance_count}")
-                        
-                        messagebox.showinfo("Éxito", "Conexión establecida correctamente")
-                    except Exception as e:
-                        conn.disconnect()
-                        self.log(f"✓ Conexión establecida (error obteniendo detalles: {str(e)})")
-                        messagebox.showinfo("Éxito", "Conexión establecida correctamente")
-                else:
-                    self.log("✗ Error: No se pudo establecer conexión")
-                    messagebox.showerror("Error", "No se pudo conectar al dispositivo")
-                    
-            except Exception as e:
-                self.log(f"✗ Error de conexión: {str(e)}")
-                messagebox.showerror("Error", f"Error de conexión: {str(e)}")
-            finally:
-                self.test_btn.config(state="normal")
-        
-        threading.Thread(target=test_conn, daemon=True).start()
-    
-    def connect_device(self):
-        """Conectar al dispositivo"""
-        if not ZK_AVAILABLE:
-            messagebox.showerror("Error", "Librería pyzk no está instalada")
-            return
-            
-        if not self.system_params:
-            messagebox.showerror("Error", "No hay parámetros de dispositivo disponibles")
-            return
-            
-        def connect():
-            try:
-                self.connect_btn.config(state="disabled")
-                self.log("Conectando al dispositivo...")
-                
-                ip = self.device_info['ip_address']
-                port = int(self.device_info['port'])
-                timeout = int(self.timeout_var.get())
-                
-                self.device = ZK(ip, port=port, timeout=timeout)
-                self.connection = self.device.connect()
-                
-                if self.connection:
-                    self.is_connected = True
-                    self.status_var.set("Conectado")
-                    self.status_label.config(foreground="green")
-                    
-                    self.extract_attendance_btn.config(state="normal")
-                    self.disconnect_btn.config(state="normal")
-                    
-                    self.log("✓ Dispositivo conectado exitosamente")
-                    messagebox.showinfo("Éxito", "Dispositivo conectado correctamente")
-                else:
-                    self.log("✗ Error: No se pudo conectar")
-                    messagebox.showerror("Error", "No se pudo conectar al dispositivo")
-                    
-            except Exception as e:
-                self.log(f"✗ Error de conexión: {str(e)}")
-                messagebox.showerror("Error", f"Error de conexión: {str(e)}")
-            finally:
-                if not self.is_connected:
-                    self.connect_btn.config(state="normal")
-        
-        threading.Thread(target=connect, daemon=True).start()
-    
-    def disconnect_device(self):
-        """Desconectar del dispositivo"""
-        try:
-            if self.connection:
-                self.connection.disconnect()
-                self.connection = None
-                self.device = None
-                
-            self.is_connected = False
-            self.status_var.set("Desconectado")
-            self.status_label.config(foreground="red")
-            
-            self.extract_attendance_btn.config(state="disabled")
-            self.disconnect_btn.config(state="disabled")
-            self.connect_btn.config(state="normal")
-            
-            self.log("Dispositivo desconectado")
-            
-        except Exception as e:
-            self.log(f"Error al desconectar: {str(e)}")
-    
-    def extract_attendance(self):
-        """Extraer registros de asistencia y enviar a la nube"""
-        if not self.connection:
+    if args.silent:
+        if not device_data:
+            print("ERROR: Parámetros del dispositivo no encontrados para el modo silencioso.")
             return
-            
-        def extract():
-            try:
-                self.extract_attendance_btn.config(state="disabled")
-                self.log("Extrayendo registros de asistencia...")
-                
-                attendance = self.connection.get_attendance()
-                
-                if attendance:
-                    attendance_data = []
-                    device_id = self.device_info.get('id')
-                    for record in attendance:
-                        attendance_data.append({
-                            'uid': record.uid,
-                            'id': record.user_id,
-                            'timestamp': record.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                            'state': record.status,
-                            'type': record.punch,
-                            'device_id': device_id
-                        })
-                    
-                    self.log(f"✓ {len(attendance)} registros extraídos del dispositivo")
 
-                    #url de local
-                    cloud_success = self.send_data_to_cloud('attendance', attendance_data, 'http://localhost:8000/api/zkteco/attendance')
+        from services.startup import preload
+        preload('requests')
+        from services.silent_sync import ZKTecoSilentSync
 
-
-                    # URL de producción
-                    #cloud_success = self.send_data_to_cloud('attendance', attendance_data, 'https://sistemas.regionpuno.gob.pe/asiss-api/api/zkteco/attendance')
-                    
-                    if cloud_success:
-                        messagebox.showinfo("Éxito", "Asistencias sincronizadas correctamente")
-                        self.log("✓ Sincronización completada exitosamente")
-                    else:
-                        messagebox.showerror("Error", "No se pudo sincronizar las asistencias")
-                        
-                else:
-                    self.log("No se encontraron registros de asistencia")
-                    messagebox.showinfo("Información", "No se encontraron registros de asistencia en el dispositivo")
-                    
-            except Exception as e:
-                self.log(f"✗ Error extrayendo asistencias: {str(e)}")
-                messagebox.showerror("Error", f"Error extrayendo asistencias: {str(e)}")
-            finally:
-                self.extract_attendance_btn.config(state="normal")
-        
-        threading.Thread(target=extract, daemon=True).start()
-
-    def send_data_to_cloud(self, data_type, data, endpoint):
-        """Enviar solo los datos a Laravel API"""
+        ready = time.perf_counter() - _STARTED
         try:
-            self.log(f"Enviando {data_type} a la nube...")
-            
-            url = endpoint
-            payload = data
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-            }
-            
-            self.log(f"Enviando a: {url}")
-            self.log(f"Cantidad de registros: {len(data)}")
-            
-            response = requests.post(
-                url, 
-                json=payload,
-                headers=headers,
-                timeout=60
-            )
-            
-            self.log(f"Código de respuesta: {response.status_code}")
-            
-            if response.status_code == 200:
-                try:
-                    response_data = response.json()
-                    self.log(f"✓ {data_type.title()} enviados exitosamente")
-                    if isinstance(response_data, dict) and 'message' in response_data:
-                        self.log(f"   - Respuesta: {response_data['message']}")
-                    return True
-                except:
-                    self.log(f"✓ {data_type.title()} enviados exitosamente")
-                    return True
-            else:
-                try:
-                    error_data = response.json()
-                    self.log(f"✗ Error HTTP {response.status_code}: {error_data.get('message', 'Error desconocido')}")
-                except:
-                    self.log(f"✗ Error HTTP {response.status_code}: {response.text[:200]}")
-                return False
-            
-        except requests.exceptions.Timeout:
-            self.log(f"✗ Timeout enviando a la nube (60s)")
-            return False
-        except requests.exceptions.ConnectionError:
-            self.log(f"✗ Error de conexión con el servidor")
-            return False
-        except Exception as e:
-            self.log(f"✗ Error enviando a la nube: {str(e)}")
-            return False
-
+            ZKTecoSilentSync(device_data, full_resync=args.full_resync).run()
+        finally:
+            if profiler:
+                profiler.report(sys.stderr, ready=ready)
+        return
 
-def main():
-    # --- PARTE MODIFICADA: Detectar el modo silencioso ---
-    parser = argparse.ArgumentParser(description="ZKTeco Sync Application")
-    parser.add_argument('--silent', action='store_true', help="Ejecuta la aplicación en modo silencioso sin GUI.")
-    parser.add_argument('--params-system', help="Parámetros del dispositivo en formato JSON.")
-    args, unknown = parser.parse_known_args()
-
-    # Si se detecta el modo silencioso, ejecutar la lógica silenciosa
-    if args.silent:
-        # Obtener los parámetros del dispositivo
-        device_data = None
-        for i, arg in enumerate(sys.argv):
-            if arg == '--params-system' and i + 1 < len(sys.argv):
-                try:
-                    device_data = json.loads(sys.argv[i + 1])
-                    break
-                except json.JSONDecodeError:
-                    pass
-        
-        if device_data:
-            ZKTecoSilentSync(device_data)
-        else:
-            print("ERROR: Parámetros del dispositivo no encontrados para el modo silencioso.")
-        return # Terminar la ejecución sin iniciar la GUI
-    # --- FIN DE LA PARTE MODIFICADA ---
+    from ui.sync_app import run
+    if profiler:
+        profiler.report(sys.stderr, ready=time.perf_counter() - _STARTED)
+    run(device_data)
 
-    # Lógica de la GUI (original)
-    root = tk.Tk()
-    app = ZKTecoApp(root)
-    
-    def on_closing():
-        if app.is_connected:
-            app.disconnect_device()
-        root.destroy()
-    
-    root.protocol("WM_DELETE_WINDOW", on_closing)
-    root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,17 +1,42 @@
 from flask import Blueprint, request, jsonify
-import subprocess, os
+
+from services.jobs import get_job_manager
 
 sync_bp = Blueprint("sync", __name__)
 
 @sync_bp.route("/execute-sync", methods=["POST"])
 def execute_sync():
-    data = request.json
+    data = request.json or {}
     device_ip = data.get("device_ip")
     device_port = data.get("device_port")
 
     if not device_ip or not device_port:
         return jsonify({"error": "Parámetros inválidos"}), 400
 
-    exe_path = os.path.join(os.getcwd(), "ZKTeco-Sync.exe")
-    subprocess.Popen([exe_path, "--ip", device_ip, "--port", str(device_port)])
-    return jsonify({"status": "sync started"}), 200
+    device_info = {
+        "id": data.get("device_id", device_ip),
+        "name": data.get("name", device_ip),
+        "ip_address": device_ip,
+        "port": device_port,
+    }
+    job, created = get_job_manager().submit(device_info, full_resync=bool(data.get("full_resync")))
+    return jsonify({
+        "status": "sync started" if created else "sync already running",
+        "job_id": job.id,
+    }), 202
+
+@sync_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+    except ValueError:
+        return jsonify({"error": "Parámetro limit inválido"}), 400
+    jobs = get_job_manager().store.recent(limit=limit, status=request.args.get("status"))
+    return jsonify({"jobs": [job.to_dict() for job in jobs]}), 200
+
+@sync_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = get_job_manager().store.get(job_id)
+    if not job:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify(job.to_dict()), 200
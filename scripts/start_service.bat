@@ -28,14 +28,17 @@ if %ERRORLEVEL%==0 (
 
 echo Iniciando el servicio ZKTeco...
 
-REM Iniciar el servicio
-start /b "" "%~dp0..\zkteco_service.exe" start
+REM Iniciar el servicio (en modo silencioso, sin consola interactiva)
+if /I "%~1"=="SILENT" (
+    start /b "" "%~dp0..\zkteco_service.exe" start --installer
+) else (
+    start /b "" "%~dp0..\zkteco_service.exe" start
+)
 
-REM Esperar un momento para la inicialización
-timeout /t 5 /nobreak >nul
+REM Esperar a que el servicio responda en /ready (como máximo 30 segundos)
+"%~dp0..\zkteco_service.exe" wait --installer --timeout 30
 
 REM Comprobar si el servicio se inició correctamente
-tasklist /FI "IMAGENAME eq zkteco_service.exe" | find "zkteco_service.exe" >nul
 if %ERRORLEVEL%==0 (
     echo [EXITO] Servicio iniciado correctamente en el puerto 3322.
     if /I "%~1"=="SILENT" (
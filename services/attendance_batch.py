@@ -0,0 +1,150 @@
+import json
+import zlib
+from array import array
+from operator import methodcaller
+
+from services.dedup import dedup_key
+
+# Mismo formato que "%Y-%m-%d %H:%M:%S", pero isoformat es mucho más rápido que strftime
+_format_timestamp = methodcaller('isoformat', ' ', 'seconds')
+
+# Rango de array('l') en todas las plataformas (en Windows es de 32 bits)
+_UID_MIN, _UID_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class AttendanceBatch:
+    """Lote de asistencias en columnas (en lugar de un dict por registro).
+
+    Se construye una sola vez a partir de la salida de pyzk y se serializa directamente
+    al formato que espera la API.
+
+    pyzk entrega como uid `str(user_id)` cuando el usuario de la marcación ya no está en el
+    equipo (formatos de 8 y 16 bytes). Si no es un entero, la columna guarda en su lugar un
+    código negativo estable derivado del texto (los uid reales son positivos), que sirve para
+    ordenar y para la marca de agua; `uid_labels` lo traduce al valor original al serializar.
+    """
+
+    __slots__ = ('device_id', 'uids', 'user_ids', 'timestamps', 'states', 'punches', 'uid_labels')
+
+    def __init__(self, device_id=None):
+        self.device_id = device_id
+        self.uids = array('l')
+        self.user_ids = []
+        self.timestamps = []
+        self.states = array('l')
+        self.punches = array('l')
+        self.uid_labels = {}
+
+    def __len__(self):
+        return len(self.uids)
+
+    @classmethod
+    def from_pyzk(cls, records, device_id=None, watermark=None):
+        """Convierte una lista de `Attendance` de pyzk, liberando cada objeto al procesarlo.
+
+        Si se indica `watermark` (timestamp, uid) solo se conservan los registros posteriores.
+        """
+        batch = cls(device_id)
+        datetimes = []
+        for i in range(len(records)):
+            record = records[i]
+            records[i] = None
+            try:
+                batch.uids.append(record.uid)
+            except (TypeError, OverflowError):
+                batch.uids.append(batch._uid_code(record.uid))
+            batch.user_ids.append(record.user_id)
+            batch.states.append(record.status)
+            batch.punches.append(record.punch)
+            datetimes.append(record.timestamp)
+        records.clear()
+
+        batch.timestamps = list(map(_format_timestamp, datetimes))
+        del datetimes
+        batch.keep_after(watermark)
+        return batch
+
+    @classmethod
+    def from_rows(cls, rows, device_id=None, watermark=None):
+        """Como `from_pyzk`, a partir de tuplas (uid, user_id, estado, fecha, tipo)"""
+        batch = cls(device_id)
+        if rows:
+            uids, user_ids, states, datetimes, punches = zip(*rows)
+            try:
+                batch.uids = array('l', uids)
+            except (TypeError, OverflowError):
+                batch.uids = array('l', map(batch._uid_code, uids))
+            batch.user_ids = list(user_ids)
+            batch.states = array('l', states)
+            batch.punches = array('l', punches)
+            batch.timestamps = list(map(_format_timestamp, datetimes))
+        batch.keep_after(watermark)
+        return batch
+
+    def _uid_code(self, value):
+        """Valor entero de un uid que no entra directo en la columna (texto o fuera de rango)"""
+        try:
+            uid = int(value)
+            if _UID_MIN <= uid <= _UID_MAX:
+                return uid
+        except (TypeError, ValueError):
+            pass
+        text = str(value)
+        code = -1 - (zlib.crc32(text.encode('utf-8')) & 0x7fffffff)
+        self.uid_labels[code] = text
+        return code
+
+    def uid_values(self):
+        """uid de cada fila tal como los entregó el dispositivo (enteros, o texto si no lo eran)"""
+        labels = self.uid_labels
+        if not labels:
+            return self.uids
+        return [labels.get(uid, uid) if uid < 0 else uid for uid in self.uids]
+
+    def keep_after(self, watermark):
+        """Conserva solo los registros posteriores a `watermark` (timestamp, uid); None no filtra"""
+        if watermark is not None:
+            self.keep([i for i, key in enumerate(zip(self.timestamps, self.uids)) if key > watermark])
+
+    def keep(self, indexes):
+        """Conserva solo las filas indicadas, en ese orden"""
+        self.uids = array('l', (self.uids[i] for i in indexes))
+        self.user_ids = [self.user_ids[i] for i in indexes]
+        self.timestamps = [self.timestamps[i] for i in indexes]
+        self.states = array('l', (self.states[i] for i in indexes))
+        self.punches = array('l', (self.punches[i] for i in indexes))
+
+    def sort(self):
+        """Ordena por (timestamp, uid), el orden de la marca de agua"""
+        timestamps, uids = self.timestamps, self.uids
+        self.keep(sorted(range(len(self)), key=lambda i: (timestamps[i], uids[i])))
+
+    def key(self, index):
+        """(timestamp, uid) de una fila"""
+        return self.timestamps[index], self.uids[index]
+
+    def dedup_keys(self):
+        """Huellas de deduplicación de cada fila, en el orden del lote"""
+        device_id = self.device_id
+        return [dedup_key(device_id, user_id, timestamp, punch)
+                for user_id, timestamp, punch in zip(self.user_ids, self.timestamps, self.punches)]
+
+    def iter_json_rows(self):
+        """Genera cada registro ya serializado en JSON, sin construir diccionarios intermedios"""
+        device_id = json.dumps(self.device_id, ensure_ascii=False)
+        # Hay pocos usuarios distintos y muchas marcas: se codifica cada user_id una sola vez
+        encoded_ids = {}
+        labels = self.uid_labels
+        for uid, user_id, timestamp, state, punch in zip(self.uids, self.user_ids, self.timestamps,
+                                                        self.states, self.punches):
+            if uid < 0 and labels:
+                uid = json.dumps(labels.get(uid, uid), ensure_ascii=False)
+            encoded = encoded_ids.get(user_id)
+            if encoded is None:
+                encoded = encoded_ids[user_id] = json.dumps(user_id, ensure_ascii=False)
+            yield (f'{{"uid": {uid}, "id": {encoded}, "timestamp": "{timestamp}", '
+                   f'"state": {state}, "type": {punch}, "device_id": {device_id}}}')
+
+    def to_dicts(self):
+        """Formato de lista de diccionarios (compatibilidad)"""
+        return [json.loads(row) for row in self.iter_json_rows()]
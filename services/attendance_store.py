@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from services.config import get_data_dir
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def time_bound(text, end=False):
+    """Convierte "AAAA-MM-DD" o "AAAA-MM-DD HH:MM:SS" en un límite para `query` (ValueError si no es válido).
+
+    Como límite final (`end`) es inclusivo: una fecha sola abarca el día completo.
+    """
+    text = text.strip().replace('T', ' ')
+    if len(text) == 10:
+        value = datetime.strptime(text, "%Y-%m-%d")
+        step = timedelta(days=1)
+    else:
+        value = datetime.strptime(text, TIMESTAMP_FORMAT)
+        step = timedelta(seconds=1)
+    if end:
+        value += step
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+class AttendanceStore:
+    """Copia local (SQLite en modo WAL) de todas las asistencias extraídas de los dispositivos.
+
+    Indexada por dispositivo, usuario y fecha para responder consultas ("¿marcó X hoy?")
+    sin conectarse al equipo ni a la nube. Cada marcación se guarda una sola vez aunque se
+    extraiga en varias sincronizaciones o siga en el equipo.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), 'attendance.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Es una copia: ante un corte se recupera en la próxima extracción
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS attendance (
+                device_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                punch INTEGER NOT NULL,
+                uid INTEGER,
+                state INTEGER,
+                PRIMARY KEY (device_id, user_id, timestamp, punch)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_user ON attendance (user_id, timestamp)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_device ON attendance (device_id, timestamp)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_time ON attendance (timestamp)")
+
+    def add(self, batch):
+        """Guarda un AttendanceBatch en una sola transacción; retorna la cantidad de marcaciones nuevas"""
+        if not batch:
+            return 0
+        device_id = str(batch.device_id)
+        rows = zip(batch.user_ids, batch.timestamps, batch.punches, batch.uid_values(), batch.states)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO attendance (device_id, user_id, timestamp, punch, uid, state) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    ((device_id, str(user_id), timestamp, punch, uid, state)
+                     for user_id, timestamp, punch, uid, state in rows)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def has_device(self, device_id):
+        """Indica si ya hay marcaciones guardadas del dispositivo"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM attendance WHERE device_id = ? LIMIT 1", (str(device_id),)
+            ).fetchone() is not None
+
+    def query(self, user=None, device=None, start=None, end=None, limit=100, offset=0):
+        """Marcaciones que cumplen los filtros, por fecha; retorna (filas, total).
+
+        `start` es inclusivo y `end` exclusivo (texto "AAAA-MM-DD HH:MM:SS", ver `time_bound`).
+        Las filas tienen el mismo formato que se envía a la API.
+        """
+        conditions, params = [], []
+        if user is not None:
+            conditions.append("user_id = ?")
+            params.append(str(user))
+        if device is not None:
+            conditions.append("device_id = ?")
+            params.append(str(device))
+        if start:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            conditions.append("timestamp < ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM attendance{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT uid, user_id, timestamp, state, punch, device_id FROM attendance{where} "
+                f"ORDER BY timestamp, device_id, user_id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [{'uid': uid, 'id': user_id, 'timestamp': timestamp, 'state': state, 'type': punch,
+                 'device_id': device_id}
+                for uid, user_id, timestamp, state, punch, device_id in rows], total
+
+    def stats(self):
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT device_id, COUNT(*) FROM attendance GROUP BY device_id"
+            ).fetchall())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_attendance_store():
+    """Almacén compartido por todo el proceso"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AttendanceStore()
+        return _store
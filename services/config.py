@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+
+
+def get_base_dir():
+    """Directorio base de la aplicación (junto al .exe si está empaquetada)"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_data_dir():
+    """Directorio de datos locales del servicio (watermarks, colas, índices)"""
+    data_dir = os.environ.get('ZKTECO_DATA_DIR') or os.path.join(get_base_dir(), 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+# Valores por defecto; se pueden sobrescribir en config/service.json
+DEFAULT_SETTINGS = {
+    'upload': {
+        'max_records': 1000,
+        'max_bytes': 512 * 1024,
+        'max_in_flight': 4,
+        'retries': 3,
+        'backoff': 1.0,
+        'timeout': 30,
+    },
+    'sync': {
+        'concurrency': 8,
+        'device_timeout': 300,
+        # Extracción, conversión y envío en paralelo, por tramos de `chunk_records` registros
+        'pipeline': True,
+        'chunk_records': 2000,
+        'queue_depth': 4,
+        # Borrar en la nube las asistencias del dispositivo antes de una sincronización completa
+        # (DELETE clear-attendance?device_id=...). Activar solo si la API limita el borrado a ese
+        # dispositivo: si ignora el parámetro, se borran las de todos y los demás no las reenvían
+        'clear_cloud': False,
+    },
+    'devices': {
+        'timeout': 5,
+        'ommit_ping': False,
+        'probe_after': 30,
+        'max_idle': 300,
+    },
+    'discovery': {
+        # Espera por dirección al probar el puerto (y el saludo por UDP) y al confirmar por TCP
+        'timeout': 0.5,
+        'handshake_timeout': 3,
+        'workers': 256,
+        'udp': True,
+        'max_hosts': 4096,
+    },
+    'users': {
+        # Rutas bajo la URL base de la API para altas/cambios y bajas de usuarios. El contrato
+        # actual de Laravel no las define: se asume este formato hasta que la API lo publique
+        'upsert_path': 'users',
+        'delete_path': 'users/delete',
+    },
+    'http': {
+        'pool_connections': 4,
+        'pool_maxsize': 16,
+    },
+    'registry': {
+        # Segundos en que la lista de dispositivos se usa sin consultar la API
+        'ttl': 60,
+        'timeout': 10,
+        # Antigüedad máxima de la lista guardada para usarla si la API no responde (0 = sin límite)
+        'max_stale': 7 * 24 * 3600,
+    },
+    'server': {
+        # 'production': waitress con hilos y conexiones acotados; 'dev': servidor de desarrollo de Werkzeug
+        'backend': 'production',
+        'workers': 8,
+        # Conexiones en espera en el socket cuando se alcanzó max_connections
+        'backlog': 64,
+        'max_connections': 256,
+        'keepalive': 5,
+        'drain_timeout': 10,
+    },
+    'schedule': {
+        # Por defecto: 12:00 y 00:00, repartidos en una ventana de 10 minutos
+        'default': {'cron': '0 0,12 * * *'},
+        'groups': {},
+        'devices': {},
+        'jitter': 600,
+        'refresh': 900,
+    },
+    'jobs': {
+        'workers': 4,
+        'max_jobs': 200,
+        'persist': True,
+    },
+    'dedup': {
+        'enabled': True,
+        # Marcaciones que caben en el filtro de Bloom con la tasa de falsos positivos indicada
+        'capacity': 1000000,
+        'error_rate': 0.01,
+    },
+    'purge': {
+        # Vaciar el registro del dispositivo tras verificar que todo está confirmado en la nube
+        'enabled': False,
+        # Solo se vacía cuando el equipo acumula al menos esta cantidad de registros
+        'min_records': 20000,
+        # Copia local de lo borrado (relativo al directorio de la aplicación); vacío = data/archive
+        'archive_dir': '',
+    },
+    'logging': {
+        # Registros del servicio en JSON Lines, rotados por tamaño ('size') o por tiempo ('time')
+        'enabled': True,
+        'path': os.path.join('logs', 'service.log'),
+        'level': 'INFO',
+        'rotate': 'size',
+        'max_bytes': 10 * 1024 * 1024,
+        'when': 'midnight',
+        'backup_count': 5,
+        # Registros en espera del escritor; si se llena, se descartan en lugar de bloquear
+        'queue_size': 10000,
+    },
+    'ui': {
+        # Líneas visibles en el log de la ventana y cada cuánto se vuelca (ms)
+        'log_max_lines': 2000,
+        'log_flush_ms': 50,
+        # Archivo con el log completo (relativo al directorio de la aplicación); vacío = sin archivo
+        'log_file': '',
+    },
+    'outbox': {
+        'interval': 30,
+        'claim_size': 4000,
+        'lease': 300,
+        'backoff_base': 10,
+        'backoff_max': 900,
+    },
+}
+
+_settings = None
+
+
+def get_settings(section):
+    """Retorna la sección de configuración combinando defaults y config/service.json"""
+    global _settings
+    if _settings is None:
+        settings = {name: dict(values) for name, values in DEFAULT_SETTINGS.items()}
+        path = os.path.join(get_base_dir(), 'config', 'service.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                user_settings = json.load(f)
+            for name, values in user_settings.items():
+                if isinstance(values, dict):
+                    settings.setdefault(name, {}).update(values)
+        except (OSError, ValueError):
+            pass
+        _settings = settings
+    return dict(_settings.get(section, {}))
@@ -0,0 +1,271 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+
+from services.config import get_data_dir, get_settings
+
+KEY_SIZE = 16
+# Límite de parámetros por consulta de SQLite en versiones antiguas
+_QUERY_CHUNK = 500
+
+
+def dedup_key(device_id, user_id, timestamp, punch):
+    """Huella de 16 bytes de (dispositivo, usuario, fecha-hora, tipo de marcación)"""
+    raw = f"{device_id}\x1f{user_id}\x1f{timestamp}\x1f{punch}".encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=KEY_SIZE).digest()
+
+
+def xor_keys(keys, start=bytes(KEY_SIZE)):
+    """XOR de las huellas: resumen de un conjunto que se actualiza al agregar o quitar elementos"""
+    value = int.from_bytes(start, 'little')
+    for key in keys:
+        value ^= int.from_bytes(key, 'little')
+    return value.to_bytes(KEY_SIZE, 'little')
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre huellas ya calculadas (las posiciones salen de los propios bytes)"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        h1 = int.from_bytes(key[:8], 'little')
+        h2 = int.from_bytes(key[8:16], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class DedupIndex:
+    """Índice persistente de marcaciones ya confirmadas por la API.
+
+    Un filtro de Bloom en memoria descarta rápido las marcaciones nuevas (la gran mayoría
+    en una sincronización normal); solo los posibles repetidos se verifican contra el
+    conjunto exacto en SQLite (data/dedup.db). El filtro nunca supera `capacity`: si el
+    conjunto crece más, se descarta y se consulta todo en SQLite (más lento, igual de
+    exacto) hasta que un `purge_device` lo deje de nuevo dentro de la capacidad.
+
+    La sincronización incremental avanza la marca de agua al encolar (la cola local es
+    durable), así que ahí casi nunca hay repetidos: el índice protege los envíos sin marca
+    de agua (ventana de sincronización y reenvío de archivos) y es la referencia exacta con
+    la que se verifica el vaciado del equipo (`on_device`).
+    """
+
+    def __init__(self, path=None, capacity=None, error_rate=None):
+        settings = get_settings('dedup')
+        self.enabled = settings['enabled']
+        self.capacity = capacity or settings['capacity']
+        self.error_rate = error_rate or settings['error_rate']
+        self.path = path or os.path.join(get_data_dir(), 'dedup.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS uploaded (
+                device_id TEXT NOT NULL,
+                key BLOB NOT NULL,
+                PRIMARY KEY (device_id, key)
+            ) WITHOUT ROWID
+        """)
+        # Cantidad y XOR de las huellas confirmadas y de las borradas del equipo, por dispositivo
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ledger (
+                device_id TEXT PRIMARY KEY,
+                acked INTEGER NOT NULL,
+                acked_xor BLOB NOT NULL,
+                purged INTEGER NOT NULL,
+                purged_xor BLOB NOT NULL
+            )
+        """)
+        self._init_ledger()
+        # None: por construir; False: el conjunto superó la capacidad y no hay filtro
+        self._bloom = None
+        self._bloom_keys = 0
+        self._stats = {'checked': 0, 'skipped': 0, 'bloom_hits': 0, 'false_positives': 0, 'added': 0}
+
+    def _init_ledger(self):
+        """Resume las confirmaciones registradas antes de que existiera el libro de cuentas"""
+        missing = [device_id for (device_id,) in self._conn.execute(
+            "SELECT DISTINCT device_id FROM uploaded WHERE device_id NOT IN (SELECT device_id FROM ledger)"
+        ).fetchall()]
+        for device_id in missing:
+            keys = [key for (key,) in self._conn.execute("SELECT key FROM uploaded WHERE device_id = ?", (device_id,))]
+            self._write_ledger(device_id, (len(keys), xor_keys(keys), 0, bytes(KEY_SIZE)))
+
+    def _read_ledger(self, device_id):
+        row = self._conn.execute(
+            "SELECT acked, acked_xor, purged, purged_xor FROM ledger WHERE device_id = ?", (device_id,)
+        ).fetchone()
+        return row or (0, bytes(KEY_SIZE), 0, bytes(KEY_SIZE))
+
+    def _write_ledger(self, device_id, row):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO ledger (device_id, acked, acked_xor, purged, purged_xor) VALUES (?, ?, ?, ?, ?)",
+            (device_id,) + tuple(row)
+        )
+
+    def _ensure_bloom(self):
+        """Construye el filtro a partir del conjunto en disco (con el lock tomado); None si no cabe"""
+        if self._bloom is None:
+            count = self._conn.execute("SELECT COUNT(*) FROM uploaded").fetchone()[0]
+            if count > self.capacity:
+                self._bloom = False
+            else:
+                bloom = BloomFilter(self.capacity, self.error_rate)
+                for (key,) in self._conn.execute("SELECT key FROM uploaded"):
+                    bloom.add(key)
+                self._bloom = bloom
+                self._bloom_keys = count
+        return self._bloom or None
+
+    def filter(self, batch):
+        """Elimina del lote (AttendanceBatch) las marcaciones ya confirmadas.
+
+        Retorna (huellas de las filas conservadas en su orden, cantidad omitida).
+        """
+        keys = batch.dedup_keys()
+        if not self.enabled or not keys:
+            return keys, 0
+        device_id = str(batch.device_id)
+
+        with self._lock:
+            bloom = self._ensure_bloom()
+            candidates = [i for i, key in enumerate(keys) if bloom is None or key in bloom]
+            known = self._query_known(device_id, [keys[i] for i in candidates])
+            self._stats['checked'] += len(keys)
+            self._stats['bloom_hits'] += len(candidates)
+            self._stats['false_positives'] += len(candidates) - len(known)
+            self._stats['skipped'] += len(known)
+
+        if not known:
+            return keys, 0
+        indexes = [i for i, key in enumerate(keys) if key not in known]
+        batch.keep(indexes)
+        return [keys[i] for i in indexes], len(keys) - len(indexes)
+
+    def _query_known(self, device_id, keys):
+        """Huellas de `keys` presentes en el conjunto exacto (con el lock tomado)"""
+        known = set()
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            known.update(key for (key,) in self._conn.execute(
+                f"SELECT key FROM uploaded WHERE device_id = ? AND key IN ({placeholders})",
+                [device_id] + chunk
+            ))
+        return known
+
+    def known(self, device_id, keys):
+        """Subconjunto de `keys` confirmado por la API, consultado directamente en SQLite"""
+        with self._lock:
+            return self._query_known(str(device_id), list(keys))
+
+    def add(self, device_id, keys):
+        """Registra marcaciones confirmadas por la API"""
+        keys = list({key for key in keys if key})
+        if not keys:
+            return
+        device_id = str(device_id)
+        with self._lock:
+            bloom = self._ensure_bloom()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = self._query_known(device_id, keys)
+                new = [key for key in keys if key not in known]
+                self._conn.executemany(
+                    "INSERT INTO uploaded (device_id, key) VALUES (?, ?)",
+                    ((device_id, key) for key in new)
+                )
+                acked, acked_xor, purged, purged_xor = self._read_ledger(device_id)
+                self._write_ledger(device_id, (acked + len(new), xor_keys(new, acked_xor), purged, purged_xor))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if bloom is not None:
+                self._bloom_keys += len(new)
+                if self._bloom_keys > self.capacity:
+                    # Pasada la capacidad casi todo daría positivo: se libera la memoria
+                    self._bloom = False
+                else:
+                    for key in new:
+                        bloom.add(key)
+            self._stats['added'] += len(new)
+
+    def record_purge(self, device_id, keys):
+        """Registra marcaciones borradas del equipo (siguen confirmadas, pero ya no están en él)"""
+        keys = set(keys)
+        device_id = str(device_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                acked, acked_xor, purged, purged_xor = self._read_ledger(device_id)
+                self._write_ledger(device_id, (acked, acked_xor, purged + len(keys), xor_keys(keys, purged_xor)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def on_device(self, device_id):
+        """(cantidad, XOR) de las marcaciones confirmadas que el equipo debería conservar"""
+        with self._lock:
+            acked, acked_xor, purged, purged_xor = self._read_ledger(str(device_id))
+        return acked - purged, xor_keys([purged_xor], acked_xor)
+
+    def purge_device(self, device_id):
+        """Olvida las marcaciones de un dispositivo (p. ej. tras limpiar el caché de la nube).
+
+        El filtro de Bloom no admite borrados: sus bits quedan y solo provocan consultas de más.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute("DELETE FROM uploaded WHERE device_id = ?", (str(device_id),))
+                self._conn.execute("DELETE FROM ledger WHERE device_id = ?", (str(device_id),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if cursor.rowcount and self._bloom is False:
+                # Puede volver a caber: se reconstruye en el próximo uso
+                self._bloom = None
+        return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._conn.execute("SELECT COUNT(*) FROM uploaded").fetchone()[0]
+            if self._bloom:
+                stats['bloom_bytes'] = len(self._bloom.bits)
+            stats['bloom_saturated'] = self._bloom is False
+        return stats
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dedup_index():
+    """Índice compartido por todo el proceso"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DedupIndex()
+        return _index
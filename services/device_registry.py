@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from services.config import get_data_dir, get_settings
+from services.http_client import get_http_client
+
+
+class DeviceRegistry:
+    """Lista de dispositivos de la API con caché en memoria y en disco.
+
+    Dentro de `ttl` segundos se responde desde memoria sin consultar la API; pasado ese
+    tiempo se hace una petición condicional (If-None-Match / If-Modified-Since). Un 304, o
+    un 200 con el mismo cuerpo que la última vez, no vuelve a interpretar el JSON. Si la API
+    no responde se usa la última lista válida, que se guarda en data/devices.json para
+    sobrevivir a un reinicio del servicio.
+    """
+
+    def __init__(self, url, ttl=None, timeout=None, max_stale=None, path=None, log=None):
+        settings = get_settings('registry')
+        self.url = url
+        self.ttl = settings['ttl'] if ttl is None else ttl
+        self.timeout = timeout or settings['timeout']
+        self.max_stale = settings['max_stale'] if max_stale is None else max_stale
+        self.path = path or os.path.join(get_data_dir(), 'devices.json')
+        self.log = log or (lambda message: None)
+        self._lock = threading.Lock()
+        self._devices = None
+        self._etag = None
+        self._last_modified = None
+        self._digest = None
+        # Momento (time.time()) en que la API confirmó la lista por última vez
+        self._saved_at = None
+        self._checked_at = None
+        self._loaded = False
+        self._stats = {'hits': 0, 'not_modified': 0, 'unchanged': 0, 'fetched': 0, 'fallbacks': 0, 'errors': 0}
+
+    # --- Caché en disco ---
+    def _load(self):
+        """Recupera la última lista guardada (con el lock tomado; solo la primera vez)"""
+        self._loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('url') != self.url or not isinstance(data.get('devices'), list):
+            return
+        self._devices = data['devices']
+        self._etag = data.get('etag')
+        self._last_modified = data.get('last_modified')
+        self._digest = data.get('digest')
+        self._saved_at = data.get('saved_at')
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'url': self.url,
+                'etag': self._etag,
+                'last_modified': self._last_modified,
+                'digest': self._digest,
+                'saved_at': self._saved_at,
+                'devices': self._devices,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # --- Consulta ---
+    def get_devices(self, force=False):
+        """Retorna la lista de dispositivos, o None si la API falla y no hay una lista guardada"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            now = time.time()
+            if (not force and self._devices is not None and self._checked_at is not None
+                    and now - self._checked_at < self.ttl):
+                self._stats['hits'] += 1
+                return list(self._devices)
+
+            headers = {}
+            if self._devices is not None:
+                if self._etag:
+                    headers['If-None-Match'] = self._etag
+                if self._last_modified:
+                    headers['If-Modified-Since'] = self._last_modified
+
+            try:
+                response = get_http_client().get(self.url, headers=headers, timeout=self.timeout)
+                if response.status_code == 304 and self._devices is not None:
+                    self._stats['not_modified'] += 1
+                    self._confirmed(now, response)
+                    return list(self._devices)
+                if response.status_code != 200:
+                    raise ValueError(f"HTTP {response.status_code}")
+
+                body = response.content
+                digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+                if digest == self._digest and self._devices is not None:
+                    # Servidor sin ETag: el mismo cuerpo no se vuelve a interpretar
+                    self._stats['unchanged'] += 1
+                    self._confirmed(now, response)
+                    return list(self._devices)
+
+                devices = json.loads(body)
+                if not isinstance(devices, list):
+                    raise ValueError("se esperaba una lista")
+                self._devices = devices
+                self._digest = digest
+                self._stats['fetched'] += 1
+                self._confirmed(now, response)
+                return list(devices)
+
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self._stats['errors'] += 1
+                return self._fallback(now, e)
+
+    def _confirmed(self, now, response):
+        """La API confirmó la lista: reinicia el TTL y actualiza los validadores.
+
+        Se guarda aunque no haya cambiado (304 o mismo cuerpo): `saved_at` en disco debe ser la
+        última confirmación, así tras un reinicio sin API `max_stale` no cuenta desde el último cambio.
+        """
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        self._checked_at = now
+        self._saved_at = now
+        try:
+            self._save()
+        except OSError as e:
+            self.log(f"✗ No se pudo guardar la lista de dispositivos: {e}")
+
+    def _fallback(self, now, error):
+        if self._devices is None:
+            self.log(f"✗ Error al consultar la API de dispositivos: {error}")
+            return None
+        age = now - self._saved_at if self._saved_at else None
+        if self.max_stale and age is not None and age > self.max_stale:
+            self.log(f"✗ Error al consultar la API de dispositivos: {error}; "
+                     f"la lista guardada tiene {int(age // 3600)} h y se descarta.")
+            return None
+        self._stats['fallbacks'] += 1
+        self.log(f"✗ Error al consultar la API de dispositivos: {error}; "
+                 f"se usa la lista guardada ({len(self._devices)} dispositivos).")
+        return list(self._devices)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['devices'] = None if self._devices is None else len(self._devices)
+            stats['age'] = int(time.time() - self._saved_at) if self._saved_at else None
+        return stats
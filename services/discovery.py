@@ -0,0 +1,123 @@
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.config import get_settings
+from services.zkteco import Zkteco
+
+
+def expand_ranges(ranges, max_hosts):
+    """Direcciones a revisar a partir de rangos CIDR o IPs sueltas (ValueError si no son válidos)"""
+    hosts = []
+    seen = set()
+    for value in ranges:
+        network = ipaddress.ip_network(str(value).strip(), strict=False)
+        if network.version != 4:
+            raise ValueError(f"Solo se admiten rangos IPv4: {value}")
+        # Sin las direcciones de red y broadcast, salvo en /31 y /32
+        for address in (network.hosts() if network.num_addresses > 2 else network):
+            ip = str(address)
+            if ip not in seen:
+                if len(hosts) >= max_hosts:
+                    raise ValueError(f"Demasiadas direcciones (máximo {max_hosts})")
+                seen.add(ip)
+                hosts.append(ip)
+    return hosts
+
+
+class SubnetScanner:
+    """Busca terminales ZKTeco en rangos de red, revisando muchas direcciones a la vez.
+
+    Cada dirección se prueba con una conexión TCP al puerto (con `timeout` corto); si acepta,
+    o si no acepta pero se prueba también UDP, se confirma con el saludo del protocolo a
+    través de `Zkteco.identify`, que además retorna serie, firmware y nombre. Con `workers`
+    hilos un /24 se recorre en pocas rondas de `timeout` segundos.
+    """
+
+    def __init__(self, port=4370, timeout=None, handshake_timeout=None, workers=None, udp=None, max_hosts=None):
+        settings = get_settings('discovery')
+        self.port = int(port)
+        self.timeout = timeout or settings['timeout']
+        self.handshake_timeout = handshake_timeout or settings['handshake_timeout']
+        self.workers = workers or settings['workers']
+        self.udp = settings['udp'] if udp is None else udp
+        self.max_hosts = max_hosts or settings['max_hosts']
+
+    def _tcp_open(self, ip):
+        try:
+            with socket.create_connection((ip, self.port), timeout=self.timeout):
+                return True
+        except OSError:
+            return False
+
+    def probe(self, ip):
+        """Datos del terminal en `ip` o None si no hay uno respondiendo"""
+        started = time.perf_counter()
+        protocols = ['tcp'] if self._tcp_open(ip) else []
+        if self.udp:
+            protocols.append('udp')
+        for protocol in protocols:
+            # Por UDP no hay conexión previa que confirme al equipo: el saludo mismo es la prueba
+            timeout = self.handshake_timeout if protocol == 'tcp' else self.timeout
+            status = Zkteco(ip, self.port).identify(timeout=timeout, udp=protocol == 'udp')
+            if status:
+                return dict(status, ip=ip, port=self.port, protocol=protocol,
+                            elapsed=round(time.perf_counter() - started, 3))
+        return None
+
+    def scan(self, ranges):
+        """Revisa los rangos; retorna {'devices': [...], 'scanned': n, 'elapsed': s}"""
+        started = time.perf_counter()
+        hosts = expand_ranges(ranges, self.max_hosts)
+        devices = []
+        if hosts:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(hosts)), thread_name_prefix='zk-scan') as executor:
+                devices = [device for device in executor.map(self.probe, hosts) if device]
+        devices.sort(key=lambda device: ipaddress.ip_address(device['ip']))
+        return {'devices': devices, 'scanned': len(hosts), 'elapsed': round(time.perf_counter() - started, 3)}
+
+
+class DiscoveryRun:
+    """Búsqueda ejecutada como trabajo (ver JobManager): resultado con fase y contadores en vivo"""
+
+    def __init__(self, ranges, port=4370, scanner=None):
+        self.ranges = ranges
+        self.scanner = scanner or SubnetScanner(port=port)
+        self._lock = threading.Lock()
+        self.result = {
+            'ok': False,
+            'phase': 'pending',
+            'hosts': 0,
+            'scanned': 0,
+            'found': 0,
+            'devices': [],
+            'error': None,
+            'elapsed': 0.0,
+        }
+
+    def _probe(self, ip, probe):
+        device = probe(ip)
+        with self._lock:
+            self.result['scanned'] += 1
+            if device:
+                self.result['found'] += 1
+        return device
+
+    def run(self):
+        started = time.time()
+        try:
+            self.result['hosts'] = len(expand_ranges(self.ranges, self.scanner.max_hosts))
+            self.result['phase'] = 'scanning'
+            probe = self.scanner.probe
+            self.scanner.probe = lambda ip: self._probe(ip, probe)
+            summary = self.scanner.scan(self.ranges)
+            self.result['devices'] = summary['devices']
+            self.result['ok'] = True
+        except Exception as e:
+            self.result['error'] = str(e)
+        finally:
+            self.result['phase'] = 'done'
+            self.result['elapsed'] = round(time.time() - started, 3)
+        return self.result
@@ -2,6 +2,7 @@ from flask import Flask
 from routes.home import home_bp
 from routes.status import status_bp
 from routes.sync import sync_bp
+from services.wsgi_server import create_server
 
 def create_app():
     app = Flask(__name__)
@@ -10,5 +11,7 @@ def create_app():
     app.register_blueprint(sync_bp)
     return app
 
-def run_flask(app, port=5000):
-    app.run(port=port, debug=False, use_reloader=False)
\ No newline at end of file
+def run_flask(app, port=5000, server=None):
+    # server: 'production' (hilos y cola acotados) o 'dev'; por defecto, config/service.json
+    http_server = create_server(app, "127.0.0.1", port, server)
+    http_server.serve_forever()
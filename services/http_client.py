@@ -0,0 +1,79 @@
+import threading
+
+from services.config import get_settings
+
+
+class HttpClient:
+    """Sesión HTTP compartida con pool de conexiones keep-alive para todas las llamadas a la API"""
+
+    def __init__(self, pool_connections=None, pool_maxsize=None):
+        # requests tarda en importarse: se carga recién al crear el cliente, no al importar el módulo
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        settings = get_settings('http')
+        self.pool_connections = pool_connections or settings['pool_connections']
+        self.pool_maxsize = pool_maxsize or settings['pool_maxsize']
+        self.session = requests.Session()
+        # Los reintentos los maneja quien llama (p. ej. BatchUploader), no el adaptador
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._adapter = adapter
+        self._request_error = requests.exceptions.RequestException
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.request(method, url, **kwargs)
+        except self._request_error:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        """Contadores de uso: peticiones, conexiones abiertas y reutilizadas"""
+        connections = 0
+        pool_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            pool_requests += pool.num_requests
+        with self._lock:
+            total, errors = self._requests, self._errors
+        return {
+            'requests': total,
+            'errors': errors,
+            'connections_opened': connections,
+            'connections_reused': max(pool_requests - connections, 0),
+            'pool_maxsize': self.pool_maxsize,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Cliente HTTP compartido por todo el proceso"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
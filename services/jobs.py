@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from services.config import get_data_dir, get_settings
+from services.discovery import DiscoveryRun
+from services.silent_sync import ZKTecoSilentSync
+from services.sync_engine import get_sync_slots
+from services.user_sync import UserRosterSync
+
+ACTIVE_STATUSES = ('queued', 'running')
+# Tipos de trabajo y los contadores de su resultado que se muestran como progreso
+JOB_KINDS = {
+    'attendance': ('extracted', 'new', 'skipped', 'sent', 'pending'),
+    'users': ('users', 'added', 'changed', 'removed', 'unchanged', 'sent', 'pending'),
+    'discovery': ('hosts', 'scanned', 'found'),
+}
+
+
+class SyncJob:
+    """Sincronización manual de un dispositivo (asistencias o usuarios) con su estado consultable.
+
+    Con kind='discovery' es una búsqueda de terminales: `device_info` lleva 'ranges' y 'port'.
+    """
+
+    def __init__(self, device_info, full_resync=False, job_id=None, kind='attendance'):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de trabajo desconocido: '{kind}'")
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.device_info = device_info
+        self.full_resync = full_resync
+        self.status = 'queued'
+        self.created_at = datetime.now().isoformat(timespec='seconds')
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.sync = None
+
+    @property
+    def device_id(self):
+        return self.device_info.get('id')
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self):
+        # Mientras corre se lee el resultado parcial de la sincronización (fase y contadores)
+        result = self.result or (self.sync.result if self.sync else None)
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'phase': result['phase'] if result else 'pending',
+            'device': {
+                'id': self.device_info.get('id'),
+                'name': self.device_info.get('name'),
+                'ip': self.device_info.get('ip_address'),
+                'port': self.device_info.get('port'),
+            },
+            'full_resync': self.full_resync,
+            'progress': {key: result.get(key) for key in JOB_KINDS[self.kind]} if result else None,
+            'timings': dict(result.get('timings') or {}) if result else {},
+            # Extracción por tramos: estado y segundos de cada etapa (extract, convert, upload)
+            'stages': {name: {'state': state, 'seconds': result.get('stages', {}).get(name)}
+                       for name, state in result['stage_state'].items()} if result and 'stage_state' in result else None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed': result['elapsed'] if result else None,
+            'error': self.error,
+        }
+        if self.kind == 'discovery':
+            # Terminales encontrados por la búsqueda
+            data['devices'] = result.get('devices') if result else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        device = data.get('device') or {}
+        job = cls({'id': device.get('id'), 'name': device.get('name'),
+                   'ip_address': device.get('ip'), 'port': device.get('port')},
+                  data.get('full_resync', False), data['id'], data.get('kind', 'attendance'))
+        job.status = data.get('status', 'done')
+        job.created_at = data.get('created_at')
+        job.started_at = data.get('started_at')
+        job.finished_at = data.get('finished_at')
+        job.error = data.get('error')
+        if data.get('progress') is not None:
+            job.result = dict(data['progress'], phase=data.get('phase'), timings=data.get('timings') or {},
+                              elapsed=data.get('elapsed'), devices=data.get('devices'))
+        return job
+
+
+class JobStore:
+    """Almacén acotado de trabajos en memoria, con persistencia opcional en data/jobs.json.
+
+    Al superar `max_jobs` se descartan primero los trabajos terminados más antiguos.
+    """
+
+    def __init__(self, max_jobs=None, path=None, persist=None):
+        settings = get_settings('jobs')
+        self.max_jobs = max_jobs or settings['max_jobs']
+        self.persist = settings['persist'] if persist is None else persist
+        self.path = path or os.path.join(get_data_dir(), 'jobs.json')
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._jobs = OrderedDict()
+        if self.persist:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+        for data in items[-self.max_jobs:]:
+            try:
+                job = SyncJob.from_dict(data)
+            except (KeyError, TypeError):
+                continue
+            # Un trabajo que seguía activo cuando el proceso terminó ya no se completará
+            if job.active:
+                job.status = 'interrupted'
+                job.error = job.error or "El servicio se detuvo antes de terminar"
+            self._jobs[job.id] = job
+
+    def save(self):
+        if not self.persist:
+            return
+        # Se guarda desde varios hilos: una escritura a la vez, la última deja el estado más reciente
+        with self._save_lock:
+            with self._lock:
+                items = [job.to_dict() for job in self._jobs.values()]
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(items, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+    def add(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            excess = len(self._jobs) - self.max_jobs
+            if excess > 0:
+                for job_id in [key for key, item in self._jobs.items() if not item.active][:excess]:
+                    del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find_active(self, device_id, kind='attendance'):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.kind == kind and str(job.device_id) == str(device_id):
+                    return job
+        return None
+
+    def recent(self, limit=50, status=None):
+        """Trabajos más recientes primero"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        jobs.reverse()
+        if status:
+            jobs = [job for job in jobs if job.status == status]
+        return jobs[:limit]
+
+
+class JobManager:
+    """Ejecuta sincronizaciones manuales en un pool de hilos y registra su progreso en un JobStore"""
+
+    def __init__(self, store=None, workers=None, log=None):
+        settings = get_settings('jobs')
+        self.store = store or JobStore()
+        self.workers = workers or settings['workers']
+        self.log = log or (lambda message: None)
+        self._submit_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='zk-job')
+
+    def submit(self, device_info, api_url_base=None, full_resync=False, kind='attendance'):
+        """Encola la sincronización de un dispositivo; retorna (trabajo, creado).
+
+        Si ya hay un trabajo activo del mismo tipo para el dispositivo se retorna ese en lugar
+        de duplicarlo. Con kind='users' se envían los usuarios (`full_resync`: envío completo);
+        con kind='discovery' se buscan terminales (ver `submit_discovery`).
+        """
+        # Buscar y registrar juntos: dos pedidos simultáneos no deben crear dos trabajos
+        with self._submit_lock:
+            existing = self.store.find_active(device_info.get('id'), kind)
+            if existing:
+                return existing, False
+            job = SyncJob(device_info, full_resync=full_resync, kind=kind)
+            self.store.add(job)
+        self.store.save()
+        self._executor.submit(self._run, job, api_url_base)
+        return job, True
+
+    def submit_discovery(self, ranges, port=4370):
+        """Encola una búsqueda de terminales; retorna (trabajo, creado) como `submit`.
+
+        Una búsqueda de los mismos rangos y puerto que siga activa se reutiliza.
+        """
+        key = f"discovery:{port}:{','.join(ranges)}"
+        name = f"Búsqueda en {', '.join(ranges)}"
+        return self.submit({'id': key, 'name': name, 'ranges': list(ranges), 'port': port}, kind='discovery')
+
+    def _run(self, job, api_url_base):
+        if job.kind == 'discovery':
+            # No usa sesiones de dispositivos: no ocupa lugar entre las sincronizaciones
+            self._run_job(job, api_url_base)
+            return
+        # Comparte el límite de dispositivos simultáneos con las sincronizaciones programadas
+        with get_sync_slots():
+            self._run_job(job, api_url_base)
+
+    def _run_job(self, job, api_url_base):
+        job.status = 'running'
+        job.started_at = datetime.now().isoformat(timespec='seconds')
+        started = time.time()
+        try:
+            if job.kind == 'users':
+                job.sync = UserRosterSync(job.device_info, api_url_base, full=job.full_resync)
+            elif job.kind == 'discovery':
+                job.sync = DiscoveryRun(job.device_info['ranges'], job.device_info['port'])
+            else:
+                job.sync = ZKTecoSilentSync(job.device_info, full_resync=job.full_resync,
+                                            api_url_base=api_url_base, verbose=False)
+            job.result = job.sync.run()
+            job.error = job.result['error']
+            job.status = 'done' if job.result['ok'] else 'failed'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.now().isoformat(timespec='seconds')
+            self.log(f"Trabajo {job.id} ({job.device_info.get('name')}): {job.status} en {time.time() - started:.1f}s.")
+            self.store.save()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Gestor de trabajos compartido por todo el proceso"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,149 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from services.config import get_base_dir, get_settings
+
+LOGGER_NAME = 'zkteco'
+
+# Fin de la cola del escritor
+_STOP = object()
+
+# Sin pipeline configurado (p. ej. main2 --silent) los registros se descartan sin ir a stderr
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+
+def get_logger(name=None):
+    """Logger del servicio ('zkteco' o 'zkteco.<name>')"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def log_event(logger, message, level=logging.INFO, **fields):
+    """Registra un mensaje con campos estructurados (dispositivo, fase, duración, conteos...)"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={'fields': fields})
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Un objeto JSON por línea: fecha, nivel, logger, hilo, mensaje y los campos del registro"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Encola sin esperar nunca: con la cola llena el registro se descarta y se cuenta"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Registros del servicio en archivos JSON Lines rotados, escritos por un solo hilo.
+
+    Los hilos que registran solo encolan (cola acotada, sin bloquear): si el disco se
+    pone lento se pierden registros, nunca se frena una sincronización. El hilo escritor
+    rota el archivo por tamaño o por tiempo según la configuración.
+    """
+
+    def __init__(self, path=None, level=None):
+        settings = get_settings('logging')
+        self.path = path or os.path.join(get_base_dir(), settings['path'])
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if settings['rotate'] == 'time':
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                self.path, when=settings['when'], backupCount=settings['backup_count'], encoding='utf-8', delay=True)
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=settings['max_bytes'], backupCount=settings['backup_count'],
+                encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonLinesFormatter())
+
+        self.queue = queue.Queue(maxsize=settings['queue_size'])
+        self.handler = _NonBlockingQueueHandler(self.queue)
+        self.file_handler = file_handler
+        self._thread = None
+
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(level or settings['level'])
+        # No se propaga al logger raíz (que el servicio deja en ERROR para Flask/Werkzeug)
+        self.logger.propagate = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write, name='log-writer', daemon=True)
+        self._thread.start()
+        self.logger.addHandler(self.handler)
+        return self
+
+    def _write(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                return
+            # Los errores de escritura los informa el propio handler (handleError)
+            self.file_handler.handle(record)
+
+    def stop(self, timeout=5):
+        """Deja de aceptar registros y espera a que el escritor vacíe la cola (a lo sumo `timeout` s)"""
+        self.logger.removeHandler(self.handler)
+        deadline = time.time() + timeout
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return False
+        self._thread.join(max(deadline - time.time(), 0.1))
+        if self._thread.is_alive():
+            return False
+        self.file_handler.close()
+        return True
+
+    def stats(self):
+        return {'path': self.path, 'queued': self.queue.qsize(), 'dropped': self.handler.dropped}
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def start_logging(path=None, level=None):
+    """Inicia el pipeline de logs del proceso (una sola vez)"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None and get_settings('logging')['enabled']:
+            _pipeline = LogPipeline(path, level).start()
+        return _pipeline
+
+
+def stop_logging():
+    global _pipeline
+    with _pipeline_lock:
+        pipeline, _pipeline = _pipeline, None
+    if pipeline is not None:
+        pipeline.stop()
+
+
+def logging_stats():
+    pipeline = _pipeline
+    return pipeline.stats() if pipeline else None
@@ -0,0 +1,155 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Límites de los histogramas en segundos
+DURATION_BUCKETS = (1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+CONNECT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Contadores, medidores e histogramas con etiquetas, exportables en formato de texto de Prometheus.
+
+    Sin dependencias externas: el servicio se distribuye empaquetado con PyInstaller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+        self._collectors = []
+
+    def define(self, name, kind, help_text, buckets=None):
+        with self._lock:
+            self._meta[name] = (kind, help_text, buckets)
+            self._values.setdefault(name, {})
+
+    def add_collector(self, collector):
+        """Función llamada en cada exportación para actualizar medidores (p. ej. profundidad de la cola)"""
+        self._collectors.append(collector)
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._values[name][self._key(labels)] = value
+
+    def replace(self, name, values):
+        """Reemplaza todas las series de un medidor: `values` es una lista de (etiquetas, valor)"""
+        with self._lock:
+            self._values[name] = {self._key(labels): value for labels, value in values}
+
+    def observe(self, name, labels, value):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self._meta[name][2])
+            histogram.observe(value)
+
+    def render(self):
+        """Exporta todas las métricas en formato de texto de Prometheus (versión 0.0.4)"""
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception:
+                pass
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in sorted(self._meta.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != 'histogram':
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.define('zkteco_sync_duration_seconds', 'histogram',
+               'Duración de la sincronización de un dispositivo', DURATION_BUCKETS)
+metrics.define('zkteco_device_connect_seconds', 'histogram',
+               'Latencia para obtener una sesión con el dispositivo', CONNECT_BUCKETS)
+metrics.define('zkteco_sync_total', 'counter', 'Sincronizaciones ejecutadas por resultado')
+metrics.define('zkteco_sync_failures_total', 'counter', 'Sincronizaciones fallidas por fase')
+metrics.define('zkteco_records_extracted_total', 'counter', 'Registros leídos del dispositivo')
+metrics.define('zkteco_records_skipped_total', 'counter', 'Registros omitidos por haber sido confirmados antes')
+metrics.define('zkteco_records_uploaded_total', 'counter', 'Registros confirmados por la API')
+metrics.define('zkteco_records_purged_total', 'counter', 'Registros borrados del dispositivo tras verificarlos')
+metrics.define('zkteco_upload_bytes_total', 'counter', 'Bytes enviados a la API')
+metrics.define('zkteco_outbox_depth', 'gauge', 'Registros pendientes en la cola local')
+metrics.define('zkteco_last_success_timestamp_seconds', 'gauge',
+               'Hora (epoch) de la última sincronización exitosa')
+
+
+def record_sync(result, connect_seconds=None, failed_phase=None):
+    """Registra el resultado de la sincronización de un dispositivo"""
+    labels = {'device': result.get('device_id'), 'name': result.get('name') or ''}
+    metrics.observe('zkteco_sync_duration_seconds', labels, result.get('elapsed', 0.0))
+    if connect_seconds is not None:
+        metrics.observe('zkteco_device_connect_seconds', labels, connect_seconds)
+    metrics.inc('zkteco_sync_total', dict(labels, result='ok' if result.get('ok') else 'error'))
+    metrics.inc('zkteco_records_extracted_total', labels, result.get('extracted', 0))
+    metrics.inc('zkteco_records_skipped_total', labels, result.get('skipped', 0))
+    metrics.inc('zkteco_records_uploaded_total', labels, result.get('sent', 0))
+    metrics.inc('zkteco_upload_bytes_total', labels, result.get('bytes', 0))
+    if result.get('purged'):
+        metrics.inc('zkteco_records_purged_total', labels, result['purged'])
+    if result.get('ok'):
+        metrics.set('zkteco_last_success_timestamp_seconds', labels, round(time.time(), 3))
+    else:
+        metrics.inc('zkteco_sync_failures_total', dict(labels, phase=failed_phase or 'unknown'))
@@ -0,0 +1,247 @@
+import os
+import sqlite3
+import threading
+import time
+
+from services.config import get_data_dir, get_settings
+from services.dedup import get_dedup_index
+from services.uploader import BatchUploader
+
+
+class AttendanceOutbox:
+    """Cola local persistente (SQLite en modo WAL) de registros pendientes de enviar a la API.
+
+    Cada fila guarda el registro ya serializado en JSON. Las filas se "reservan" al leerlas
+    (next_attempt en el futuro) para que dos drenadores no envíen lo mismo, y se eliminan
+    solo cuando la API confirma el lote.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), 'outbox.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: una vez confirmado el encolado, el registro sobrevive a un corte de energía
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                endpoint TEXT NOT NULL,
+                device_id TEXT,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0
+            )
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        if 'dedup_key' not in columns:
+            # Colas creadas antes del índice de deduplicación
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN dedup_key BLOB")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (next_attempt, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_device ON outbox (device_id)")
+
+    def enqueue(self, endpoint, device_id, rows, keys=None):
+        """Guarda filas JSON en una sola transacción; retorna la cantidad encolada.
+
+        `keys` son las huellas de deduplicación de cada fila (se registran al confirmarse).
+        """
+        now = time.time()
+        device_id = None if device_id is None else str(device_id)
+        if keys is None:
+            pairs = ((row, None) for row in rows)
+        else:
+            pairs = zip(rows, keys)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.executemany(
+                    "INSERT INTO outbox (endpoint, device_id, payload, created_at, dedup_key) VALUES (?, ?, ?, ?, ?)",
+                    ((endpoint, device_id, row, now, key) for row, key in pairs)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def claim(self, limit, lease, device_id=None):
+        """Reserva hasta `limit` filas listas para enviar durante `lease` segundos"""
+        now = time.time()
+        query = "SELECT id, endpoint, payload FROM outbox WHERE next_attempt <= ?"
+        params = [now]
+        if device_id is not None:
+            query += " AND device_id = ?"
+            params.append(str(device_id))
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(query, params).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET next_attempt = ? WHERE id = ?",
+                    ((now + lease, row[0]) for row in rows)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def ack(self, ids):
+        """Elimina filas confirmadas por la API; retorna sus huellas como {device_id: [keys]}"""
+        acked = {}
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    for device_id, key in self._conn.execute(
+                        f"SELECT device_id, dedup_key FROM outbox WHERE id IN ({placeholders}) AND dedup_key IS NOT NULL",
+                        chunk
+                    ):
+                        acked.setdefault(device_id, []).append(key)
+                    self._conn.execute(f"DELETE FROM outbox WHERE id IN ({placeholders})", chunk)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return acked
+
+    def retry_later(self, ids, backoff_base, backoff_max):
+        """Devuelve filas a la cola con espera exponencial según sus intentos"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, "
+                "next_attempt = ? + MIN(?, ? * (1 << MIN(attempts, 16))) WHERE id = ?",
+                ((now, backoff_max, backoff_base, i) for i in ids)
+            )
+
+    def purge_device(self, device_id):
+        """Descarta los pendientes de un dispositivo (antes de una resincronización completa)"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM outbox WHERE device_id = ?", (str(device_id),))
+        return cursor.rowcount
+
+    def pending_keys(self, device_id, keys):
+        """Huellas de `keys` que ya están en la cola para el dispositivo"""
+        pending = set()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                pending.update(key for (key,) in self._conn.execute(
+                    f"SELECT dedup_key FROM outbox WHERE device_id = ? AND dedup_key IN ({placeholders})",
+                    [str(device_id)] + list(chunk)
+                ))
+        return pending
+
+    def depth(self, device_id=None):
+        """Cantidad de registros pendientes"""
+        with self._lock:
+            if device_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE device_id = ?", (str(device_id),)
+            ).fetchone()[0]
+
+    def depth_by_device(self):
+        """Registros pendientes agrupados por dispositivo"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT device_id, COUNT(*) FROM outbox GROUP BY device_id"
+            ).fetchall())
+
+
+class OutboxDrainer:
+    """Envía los registros de la cola a la API por lotes, con espera exponencial ante fallos"""
+
+    def __init__(self, outbox, log=None, dedup=None):
+        settings = get_settings('outbox')
+        self.outbox = outbox
+        self.dedup = dedup or get_dedup_index()
+        self.interval = settings['interval']
+        self.claim_size = settings['claim_size']
+        self.lease = settings['lease']
+        self.backoff_base = settings['backoff_base']
+        self.backoff_max = settings['backoff_max']
+        self.log = log or (lambda message: None)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def drain_once(self, device_id=None):
+        """Envía una tanda de filas listas; retorna {'sent', 'failed', 'bytes'}"""
+        totals = {'sent': 0, 'failed': 0, 'bytes': 0}
+        while True:
+            rows = self.outbox.claim(self.claim_size, self.lease, device_id)
+            if not rows:
+                break
+
+            by_endpoint = {}
+            for row_id, endpoint, payload in rows:
+                by_endpoint.setdefault(endpoint, []).append((row_id, payload))
+
+            failed_any = False
+            for endpoint, items in by_endpoint.items():
+                uploader = BatchUploader(endpoint, log=self.log)
+                result = uploader.send_rows(payload for _, payload in items)
+
+                # Los lotes son tramos consecutivos de las filas enviadas
+                offset = 0
+                acked, failed = [], []
+                for batch in result.batches:
+                    ids = [row_id for row_id, _ in items[offset:offset + batch.count]]
+                    offset += batch.count
+                    (acked if batch.ok else failed).extend(ids)
+                if acked:
+                    for acked_device, keys in self.outbox.ack(acked).items():
+                        self.dedup.add(acked_device, keys)
+                if failed:
+                    self.outbox.retry_later(failed, self.backoff_base, self.backoff_max)
+                    failed_any = True
+                totals['sent'] += len(acked)
+                totals['failed'] += len(failed)
+                totals['bytes'] += result.bytes_sent
+
+            # Ante un fallo se deja el resto para la próxima vuelta (la API probablemente no responde)
+            if failed_any or len(rows) < self.claim_size:
+                break
+        return totals
+
+    def start(self):
+        """Inicia el drenado periódico en segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-drainer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                totals = self.drain_once()
+                if totals['sent'] or totals['failed']:
+                    self.log(f"Cola local: {totals['sent']} registros enviados, {totals['failed']} reintentarán más tarde.")
+            except Exception as e:
+                self.log(f"✗ Error drenando la cola local: {e}")
+            self._stop_event.wait(self.interval)
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """Cola compartida por todo el proceso"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = AttendanceOutbox()
+        return _outbox
@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from services.attendance_batch import AttendanceBatch
+from services.config import get_base_dir, get_data_dir, get_settings
+from services.dedup import dedup_key, xor_keys
+from services.zkteco import iter_attendance
+
+
+class PurgeSkipped(Exception):
+    """No se cumplen las condiciones para vaciar el registro del dispositivo (no es un error)"""
+
+
+def checksum(keys):
+    """Huella de un conjunto de marcaciones: blake2b de sus huellas de deduplicación ordenadas"""
+    digest = hashlib.blake2b(digest_size=16)
+    for key in sorted(keys):
+        digest.update(key)
+    return digest.hexdigest()
+
+
+def read_archive(path, device_id):
+    """Filas (JSON, tal como se envían a la API) y huellas de un archivo de lo borrado"""
+    rows, keys = [], []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            rows.append(line.rstrip('\n'))
+            keys.append(dedup_key(device_id, row['id'], row['timestamp'], row['type']))
+    return rows, keys
+
+
+def get_archive_dir(device_id):
+    """Directorio con las copias locales de lo borrado de un dispositivo"""
+    archive_dir = get_settings('purge')['archive_dir']
+    archive_dir = os.path.join(get_base_dir(), archive_dir) if archive_dir else os.path.join(get_data_dir(), 'archive')
+    return os.path.join(archive_dir, str(device_id))
+
+
+def list_archives(device_id):
+    """Archivos guardados de un dispositivo, del más antiguo al más reciente"""
+    archive_dir = get_archive_dir(device_id)
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(os.path.join(archive_dir, name) for name in os.listdir(archive_dir) if name.endswith('.jsonl.gz'))
+
+
+class DeviceLogPurge:
+    """Vacía el registro de asistencias del dispositivo cuando todo ya está confirmado en la nube.
+
+    Con el equipo deshabilitado (no acepta marcaciones mientras tanto) se relee el registro
+    completo y se verifica que ninguna marcación sea posterior a la marca de agua, que todas
+    figuren como confirmadas por la API y que su cantidad y XOR coincidan con los acumulados
+    al confirmarlas (índice de deduplicación), descontando lo ya borrado en vaciados
+    anteriores. Recién entonces se guarda un archivo local comprimido, se comprueba leyéndolo
+    de nuevo y se borra el registro del equipo, que queda anotado en el índice. Ante
+    cualquier diferencia no se borra nada.
+    """
+
+    def __init__(self, device_id, watermark, dedup, outbox, archive_dir=None, min_records=None,
+                 chunk_records=2000, log=None):
+        settings = get_settings('purge')
+        self.device_id = device_id
+        self.watermark = watermark
+        self.dedup = dedup
+        self.outbox = outbox
+        self.archive_dir = os.path.join(archive_dir, str(device_id)) if archive_dir else get_archive_dir(device_id)
+        self.min_records = settings['min_records'] if min_records is None else min_records
+        self.chunk_records = chunk_records
+        self.log = log or (lambda message: None)
+
+    def run(self, conn):
+        """Verifica, archiva y vacía el registro; retorna el resumen (lanza PurgeSkipped si no corresponde)"""
+        if self.watermark is None:
+            raise PurgeSkipped("sin marca de agua")
+        if not self.dedup.enabled:
+            raise PurgeSkipped("el índice de deduplicación está deshabilitado; no hay con qué verificar")
+        pending = self.outbox.depth(self.device_id)
+        if pending:
+            raise PurgeSkipped(f"{pending} registros pendientes en la cola local")
+        conn.read_sizes()
+        if conn.records < self.min_records:
+            raise PurgeSkipped(f"{conn.records} registros en el equipo (mínimo {self.min_records})")
+
+        conn.disable_device()
+        try:
+            batch = self._read_all(conn)
+            keys, digest, cutoff = self._verify(batch)
+            archive = self._archive(batch, digest, cutoff)
+            self.log(f"Registro verificado y archivado en {archive}; vaciando el dispositivo...")
+            conn.clear_attendance()
+            conn.read_sizes()
+            if conn.records:
+                # Sin anotarlo, el próximo vaciado no coincidirá y se rechazará
+                self.log(f"✗ El dispositivo aún informa {conn.records} registros después de vaciarlo.")
+            else:
+                self.dedup.record_purge(self.device_id, keys)
+        finally:
+            conn.enable_device()
+        return {'purged': len(batch), 'unique': len(keys), 'checksum': digest, 'cutoff': cutoff, 'archive': archive}
+
+    def _read_all(self, conn):
+        rows = []
+        for chunk in iter_attendance(conn, self.chunk_records):
+            rows.extend(chunk)
+        batch = AttendanceBatch.from_rows(rows, self.device_id)
+        batch.sort()
+        return batch
+
+    def _verify(self, batch):
+        """Compara lo que hay en el equipo con lo confirmado por la API; retorna (huellas, huella, corte)"""
+        if not batch:
+            raise PurgeSkipped("el dispositivo no tiene registros")
+        cutoff = batch.key(len(batch) - 1)
+        if cutoff > tuple(self.watermark):
+            raise PurgeSkipped(f"hay marcaciones posteriores a la marca de agua ({cutoff[0]})")
+
+        # Las marcaciones repetidas en el equipo comparten huella: se compara el conjunto
+        keys = set(batch.dedup_keys())
+        confirmed = self.dedup.known(self.device_id, keys)
+        if len(confirmed) != len(keys):
+            raise PurgeSkipped(f"{len(keys) - len(confirmed)} de {len(keys)} marcaciones no figuran como "
+                               f"confirmadas por la API")
+        expected, expected_xor = self.dedup.on_device(self.device_id)
+        if len(keys) != expected or xor_keys(keys) != expected_xor:
+            raise PurgeSkipped(f"el registro del dispositivo ({len(keys)} marcaciones) no coincide con lo "
+                               f"confirmado por la API ({expected} marcaciones)")
+        return keys, checksum(keys), cutoff
+
+    def _archive(self, batch, digest, cutoff):
+        """Escribe el registro en <archivo>.jsonl.gz (y su resumen en .json) y lo verifica releyéndolo"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        name = f"attendance-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{digest[:8]}"
+        path = os.path.join(self.archive_dir, name + '.jsonl.gz')
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for row in batch.iter_json_rows():
+                f.write(row + '\n')
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+
+        rows, keys = read_archive(tmp_path, self.device_id)
+        lines = len(rows)
+        keys = set(keys)
+        if lines != len(batch) or checksum(keys) != digest:
+            os.remove(tmp_path)
+            raise PurgeSkipped("el archivo local no coincide con el registro leído")
+        os.replace(tmp_path, path)
+
+        manifest = {
+            'device_id': self.device_id,
+            'records': lines,
+            'unique': len(keys),
+            'checksum': digest,
+            'cutoff': {'timestamp': cutoff[0], 'uid': cutoff[1]},
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(self.archive_dir, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        return path
@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from services.config import get_data_dir, get_settings
+
+
+class CronSchedule:
+    """Expresión cron de 5 campos: minuto hora día-del-mes mes día-de-la-semana (0 = domingo)"""
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expresión cron inválida: '{expression}'")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = None
+            if '/' in part:
+                part, step = part.split('/')
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(v) for v in part.split('-'))
+            else:
+                start = int(part)
+                # Como en cron: 'a/b' va desde a hasta el final del rango cada b
+                end = start if step is None else high
+            step = 1 if step is None else step
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Campo cron fuera de rango: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.isoweekday() % 7) in self.weekdays
+        # Como en cron: si ambos campos están restringidos basta con que coincida uno
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after):
+        """Primera ocurrencia estrictamente posterior a `after`"""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"La expresión cron '{self.expression}' no tiene próximas ocurrencias")
+
+    def describe(self):
+        return f"cron '{self.expression}'"
+
+
+class IntervalSchedule:
+    """Ejecución cada `seconds` segundos"""
+
+    def __init__(self, seconds):
+        self.seconds = int(seconds)
+        if self.seconds < 60:
+            raise ValueError("El intervalo mínimo es de 60 segundos")
+
+    def next_after(self, after):
+        return after + timedelta(seconds=self.seconds)
+
+    def describe(self):
+        return f"cada {self.seconds}s"
+
+
+def parse_schedule(spec):
+    """Acepta {'cron': '...'}, {'interval': segundos}, una expresión cron o un número de segundos"""
+    if isinstance(spec, dict):
+        if 'cron' in spec:
+            return CronSchedule(spec['cron'])
+        if 'interval' in spec:
+            return IntervalSchedule(spec['interval'])
+        raise ValueError(f"Programación inválida: {spec}")
+    if isinstance(spec, (int, float)):
+        return IntervalSchedule(spec)
+    return CronSchedule(str(spec))
+
+
+class SyncScheduler:
+    """Programador de sincronizaciones por dispositivo o grupo.
+
+    Cada dispositivo tiene su propia programación y un desfase fijo (jitter) derivado de su id,
+    para que no arranquen todos en el mismo segundo. Las ejecuciones perdidas mientras el
+    servicio estaba detenido se recuperan una sola vez al iniciar.
+
+    Los dispositivos vencidos se sincronizan en un hilo aparte: el bucle sigue atendiendo a
+    los demás mientras tanto, y un dispositivo que todavía se está sincronizando no se vuelve
+    a lanzar aunque venza otra vez. Cuántos dispositivos se sincronizan a la vez lo limita
+    `run_devices` (SyncEngine comparte un semáforo por proceso, ver `get_sync_slots`).
+    """
+
+    def __init__(self, fetch_devices, run_devices, shutdown_event, log=None, state_path=None):
+        settings = get_settings('schedule')
+        self.fetch_devices = fetch_devices
+        self.run_devices = run_devices
+        self.shutdown_event = shutdown_event
+        self.log = log or (lambda message: None)
+        self.default_spec = settings['default']
+        self.groups = settings['groups']
+        self.overrides = settings['devices']
+        self.jitter = settings['jitter']
+        self.refresh_interval = settings['refresh']
+        self.state_path = state_path or os.path.join(get_data_dir(), 'schedule_state.json')
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._entries = {}
+        # Dispositivos con una sincronización programada en curso
+        self._running = set()
+        self._last_runs = self._load_state()
+        self._last_refresh = 0.0
+        # Se activa al entrar al bucle principal (antes de consultar la API)
+        self.started = threading.Event()
+
+    # --- Estado persistente ---
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return {key: datetime.fromisoformat(value) for key, value in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _save_state(self):
+        # Lo guardan los hilos de cada ejecución al terminar: una escritura a la vez
+        with self._state_lock:
+            with self._lock:
+                data = {key: value.isoformat() for key, value in self._last_runs.items()}
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+
+    # --- Programación ---
+    def _schedule_for(self, device):
+        key = str(device.get('id'))
+        spec = (device.get('schedule') or self.overrides.get(key)
+                or self.groups.get(str(device.get('group'))) or self.default_spec)
+        return parse_schedule(spec)
+
+    def _offset(self, key):
+        """Desfase estable en segundos dentro de [0, jitter)"""
+        if not self.jitter:
+            return timedelta(0)
+        return timedelta(seconds=zlib.crc32(key.encode('utf-8')) % int(self.jitter))
+
+    def _next_run(self, schedule, offset, last_run, now):
+        if last_run is None:
+            return schedule.next_after(now - offset) + offset
+        # Si una ejecución se perdió mientras el servicio estaba detenido, se recupera de inmediato
+        return max(schedule.next_after(last_run - offset) + offset, now)
+
+    def refresh_devices(self):
+        """Actualiza la lista de dispositivos y recalcula sus próximas ejecuciones"""
+        devices = self.fetch_devices()
+        if devices is None:
+            return
+        now = datetime.now()
+        entries = {}
+        for device in devices:
+            if not device.get('ip_address') or not device.get('port'):
+                continue
+            key = str(device.get('id'))
+            try:
+                schedule = self._schedule_for(device)
+            except ValueError as e:
+                self.log(f"✗ {device.get('name')}: {e}; se usa la programación por defecto.")
+                schedule = parse_schedule(self.default_spec)
+            offset = self._offset(key)
+            with self._lock:
+                previous = self._entries.get(key)
+            if previous and previous['schedule'].describe() == schedule.describe():
+                next_run = previous['next_run']
+            else:
+                next_run = self._next_run(schedule, offset, self._last_runs.get(key), now)
+            entries[key] = {'device': device, 'schedule': schedule, 'offset': offset, 'next_run': next_run}
+        with self._lock:
+            self._entries = entries
+        self._last_refresh = time.time()
+
+    def next_runs(self):
+        """Próximas ejecuciones por dispositivo, ordenadas por fecha"""
+        with self._lock:
+            entries = list(self._entries.items())
+            last_runs = dict(self._last_runs)
+            running = set(self._running)
+        return sorted(({
+            'device_id': entry['device'].get('id'),
+            'name': entry['device'].get('name'),
+            'running': key in running,
+            'schedule': entry['schedule'].describe(),
+            'jitter_seconds': int(entry['offset'].total_seconds()),
+            'next_run': entry['next_run'].isoformat(timespec='seconds'),
+            'last_run': last_runs[key].isoformat(timespec='seconds') if key in last_runs else None,
+        } for key, entry in entries), key=lambda item: item['next_run'])
+
+    def dispatch_due(self, now=None):
+        """Lanza en segundo plano los dispositivos vencidos que no se estén sincronizando; retorna sus claves"""
+        now = now or datetime.now()
+        with self._lock:
+            due = [(key, entry['device']) for key, entry in self._entries.items()
+                   if entry['next_run'] <= now and key not in self._running]
+            self._running.update(key for key, _ in due)
+        if due:
+            self.log(f"Sincronización programada de {len(due)} dispositivo(s).")
+            threading.Thread(target=self._run_due, args=(due,), name='scheduled-sync', daemon=True).start()
+        return [key for key, _ in due]
+
+    def _run_due(self, due):
+        try:
+            self.run_devices([device for _, device in due])
+        except Exception as e:
+            self.log(f"✗ Error durante la sincronización programada: {e}")
+        finished = datetime.now()
+        with self._lock:
+            for key, _ in due:
+                self._running.discard(key)
+                self._last_runs[key] = finished
+                # La lista pudo actualizarse mientras tanto: se reprograma la entrada vigente
+                entry = self._entries.get(key)
+                if entry:
+                    entry['next_run'] = entry['schedule'].next_after(finished - entry['offset']) + entry['offset']
+        try:
+            self._save_state()
+        except OSError as e:
+            self.log(f"✗ No se pudo guardar el estado del programador: {e}")
+
+    def run(self):
+        """Bucle principal: espera a la próxima ejecución y lanza los dispositivos vencidos"""
+        self.started.set()
+        while not self.shutdown_event.is_set():
+            if time.time() - self._last_refresh >= self.refresh_interval:
+                try:
+                    self.refresh_devices()
+                except Exception as e:
+                    self.log(f"✗ Error actualizando la lista de dispositivos: {e}")
+
+            now = datetime.now()
+            self.dispatch_due(now)
+            with self._lock:
+                upcoming = [entry['next_run'] for key, entry in self._entries.items()
+                            if entry['next_run'] > now and key not in self._running]
+                running = bool(self._running)
+
+            wait = self.refresh_interval - (time.time() - self._last_refresh)
+            if upcoming:
+                wait = min(wait, (min(upcoming) - now).total_seconds())
+            if running:
+                # Al terminar una ejecución se recalcula su próxima fecha: se revisa seguido
+                wait = min(wait, 1)
+            self.shutdown_event.wait(timeout=max(wait, 1))
@@ -0,0 +1,550 @@
+import logging
+import queue
+import time
+import threading
+from datetime import datetime
+
+from services.attendance_batch import AttendanceBatch
+from services.attendance_store import get_attendance_store
+from services.config import get_settings
+from services.dedup import get_dedup_index
+from services.http_client import get_http_client
+from services.logs import get_logger, log_event
+from services.metrics import record_sync
+from services.outbox import OutboxDrainer, get_outbox
+from services.watermark import get_watermark_store
+
+try:
+    from services.zkteco import device_pool, iter_attendance
+    from services.purge import DeviceLogPurge, PurgeSkipped, list_archives, read_archive
+    ZK_AVAILABLE = True
+except ImportError:
+    ZK_AVAILABLE = False
+
+DEFAULT_API_URL_BASE = "http://localhost:8000/api/zkteco"
+# DEFAULT_API_URL_BASE = "https://sistemas.regionpuno.gob.pe/asiss-api/api/zkteco"
+
+
+class SyncCancelled(Exception):
+    """La sincronización fue cancelada (p. ej. por timeout del motor)"""
+
+
+# Fin de datos entre etapas del pipeline
+_END = object()
+
+logger = get_logger('sync')
+
+
+class ZKTecoSilentSync:
+    """Sincronización sin GUI de un dispositivo: conecta, extrae y envía las asistencias.
+
+    Se usa tanto desde `main2.py --silent` como en proceso desde el motor de sincronización.
+    """
+
+    def __init__(self, device_info, full_resync=False, api_url_base=None, cancel_event=None,
+                 watermarks=None, verbose=True):
+        self.device_info = device_info
+        self.api_url_base = api_url_base or DEFAULT_API_URL_BASE
+        self.cancel_event = cancel_event or threading.Event()
+        self.verbose = verbose
+        self.log_messages = []
+        self.watermarks = watermarks or get_watermark_store()
+        self.connect_seconds = None
+        self.failed_phase = None
+        self._phase_started = None
+
+        settings = get_settings('sync')
+        self.pipeline = settings['pipeline']
+        self.chunk_records = settings['chunk_records']
+        self.queue_depth = settings['queue_depth']
+        self.purge = get_settings('purge')['enabled']
+        self.clear_cloud = get_settings('sync')['clear_cloud']
+        # Timeout de las llamadas al equipo: el del dispositivo en la API o el de la configuración
+        self.device_timeout = self.device_info.get('timeout') or get_settings('devices')['timeout']
+
+        # Sin marca de agua previa no hay nada incremental que hacer: se sincroniza todo
+        device_id = self.device_info.get('id')
+        self.watermark = None if full_resync else self.watermarks.get(device_id)
+        self.full_resync = self.watermark is None
+
+        self.result = {
+            'device_id': device_id,
+            'name': self.device_info.get('name'),
+            'ip_address': self.device_info.get('ip_address'),
+            'ok': False,
+            'phase': 'pending',
+            'extracted': 0,
+            'new': 0,
+            'skipped': 0,
+            'stored': 0,
+            'sent': 0,
+            'bytes': 0,
+            'pending': 0,
+            'purged': 0,
+            'error': None,
+            'elapsed': 0.0,
+            'timings': {},
+        }
+
+    def run(self):
+        """Ejecuta la sincronización completa y retorna el resumen del dispositivo"""
+        started = time.time()
+        self.log("Modo silencioso iniciado.")
+        self.log(f"Dispositivo: {self.device_info['name']} ({self.device_info['ip_address']}:{self.device_info['port']})")
+
+        try:
+            if self.full_resync:
+                self.log("Sincronización completa (sin marca de agua previa o solicitada explícitamente).")
+                # Primero, limpia en la nube las asistencias de este dispositivo (solo de este)
+                if not self.clear_cloud:
+                    self.log("Limpieza de la nube deshabilitada (sync.clear_cloud): se reenvía todo sin borrar.")
+                elif not self.clear_cloud_cache():
+                    # Sin limpieza confirmada no se toca la cola ni el índice local
+                    self.failed_phase = 'clearing'
+                    self.result['error'] = "No se pudo limpiar la nube; sincronización completa cancelada"
+                    self.log(f"✗ {self.result['error']}.")
+                    self.result['phase'] = 'done'
+                    return self.result
+                # Los pendientes de la cola se reenviarán como parte del volcado completo
+                purged = get_outbox().purge_device(self.device_info.get('id'))
+                if purged:
+                    self.log(f"Descartados {purged} registros pendientes de la cola local.")
+                # La nube ya no tiene esas marcaciones: se olvidan también en el índice local
+                get_dedup_index().purge_device(self.device_info.get('id'))
+                if ZK_AVAILABLE:
+                    self.restore_archives()
+            else:
+                self.log(f"Sincronización incremental desde {self.watermark[0]} (uid {self.watermark[1]}).")
+
+            # Luego, extrae y envía los registros
+            self.extract_and_send_attendance()
+            if self.purge and self.result['ok']:
+                self.purge_device_log()
+        except SyncCancelled:
+            self.failed_phase = self.failed_phase or self.result['phase']
+            self.result['error'] = f"Cancelada durante la fase '{self.failed_phase}'"
+            self.log(f"✗ {self.result['error']}.")
+        finally:
+            self.result['elapsed'] = round(time.time() - started, 3)
+            record_sync(self.result, self.connect_seconds, self.failed_phase)
+            result = self.result
+            log_event(logger, "Sincronización finalizada" if result['ok'] else "Sincronización fallida",
+                      level=logging.INFO if result['ok'] else logging.WARNING,
+                      device=result['device_id'], name=result['name'], ok=result['ok'],
+                      phase=self.failed_phase, duration=result['elapsed'], extracted=result['extracted'],
+                      new=result['new'], skipped=result['skipped'], stored=result['stored'], sent=result['sent'],
+                      pending=result['pending'], purged=result['purged'], bytes=result['bytes'],
+                      timings=result['timings'], error=result['error'])
+        return self.result
+
+    def log(self, message):
+        """Método de log simple para el modo silencioso"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_entry = f"[{timestamp}] {message}"
+        if self.verbose:
+            print(f"[{timestamp}] [{self.device_info.get('name')}] {message}")
+        self.log_messages.append(log_entry)
+        log_event(logger, message, device=self.device_info.get('id'), name=self.device_info.get('name'),
+                  phase=self.result['phase'])
+
+    def _enter_phase(self, phase):
+        if self.cancel_event.is_set():
+            raise SyncCancelled()
+        self._close_phase()
+        self.result['phase'] = phase
+        self._phase_started = time.perf_counter()
+
+    def _close_phase(self):
+        """Acumula la duración de la fase actual en result['timings']"""
+        if self._phase_started is not None:
+            timings = self.result['timings']
+            phase = self.result['phase']
+            timings[phase] = round(timings.get(phase, 0.0) + time.perf_counter() - self._phase_started, 3)
+            self._phase_started = None
+
+    def extract_and_send_attendance(self):
+        """Conecta, extrae y envía los datos en modo silencioso"""
+        if not ZK_AVAILABLE:
+            self.failed_phase = 'connecting'
+            self.result['error'] = "Librería 'pyzk' no encontrada"
+            self.log("ERROR: Librería 'pyzk' no encontrada. Abortando.")
+            return
+
+        try:
+            ip = self.device_info['ip_address']
+            port = int(self.device_info['port'])
+
+            self._enter_phase('connecting')
+            self.log("Conectando al dispositivo...")
+            if self.pipeline:
+                self._extract_and_send_pipelined(ip, port)
+                return
+
+            # La sesión queda abierta en el pool para la próxima sincronización
+            connect_started = time.perf_counter()
+            with device_pool.session(ip, port, timeout=self.device_timeout) as conn:
+                self.connect_seconds = time.perf_counter() - connect_started
+                self.log("✓ Conexión exitosa.")
+                self._enter_phase('extracting')
+                self.log("Extrayendo registros de asistencia...")
+
+                attendance = conn.get_attendance()
+
+            if attendance:
+                device_id = self.device_info.get('id')
+                self.result['extracted'] = len(attendance)
+                # Sin marcaciones del equipo en el almacén local, se guarda el registro completo
+                store = get_attendance_store()
+                backfill = not store.has_device(device_id)
+                # Convierte y libera los objetos de pyzk; solo quedan los posteriores a la marca de agua
+                attendance_data = AttendanceBatch.from_pyzk(attendance, device_id,
+                                                            None if backfill else self.watermark)
+                self.result['stored'] = store.add(attendance_data)
+                if backfill:
+                    attendance_data.keep_after(self.watermark)
+
+                self.result['new'] = len(attendance_data)
+                self.log(f"✓ {self.result['extracted']} registros extraídos, {len(attendance_data)} nuevos.")
+
+                if not attendance_data:
+                    self.result['ok'] = True
+                    self.log("✓ Sin registros nuevos desde la última sincronización.")
+                else:
+                    # Ordenar por (timestamp, uid) para que el último registro sea la nueva marca de agua
+                    attendance_data.sort()
+                    last_key = attendance_data.key(len(attendance_data) - 1)
+
+                    # Las marcaciones que la API ya confirmó no se vuelven a serializar ni enviar
+                    keys, skipped = get_dedup_index().filter(attendance_data)
+                    self.result['skipped'] = skipped
+                    if skipped:
+                        self.log(f"✓ {skipped} registros omitidos por haber sido enviados anteriormente.")
+
+                    if not attendance_data:
+                        self.watermarks.update(device_id, *last_key)
+                        self.result['ok'] = True
+                        self.log("✓ Todos los registros nuevos ya estaban en la nube.")
+                        return
+
+                    endpoint = f"{self.api_url_base}/attendance"
+
+                    # Primero se confirman en la cola local: desde ahí ya no se pierden aunque la API falle
+                    outbox = get_outbox()
+                    outbox.enqueue(endpoint, device_id, attendance_data.iter_json_rows(), keys)
+                    self.watermarks.update(device_id, *last_key)
+                    self.log(f"✓ {len(attendance_data)} registros guardados en la cola local.")
+
+                    self._enter_phase('uploading')
+                    cloud_success = self.send_data_to_cloud('attendance', device_id)
+
+                    if cloud_success:
+                        self.result['ok'] = True
+                        self.log("✓ Sincronización completada exitosamente.")
+                    else:
+                        self.failed_phase = 'uploading'
+                        self.result['error'] = "Fallo en el envío a la nube; registros pendientes en la cola local"
+                        self.log("✗ Fallo en la sincronización. Los registros se reenviarán desde la cola local.")
+
+            else:
+                self.result['ok'] = True
+                self.log("No se encontraron registros de asistencia en el dispositivo.")
+
+        except SyncCancelled:
+            self.failed_phase = self.result['phase']
+            raise
+        except Exception as e:
+            self.failed_phase = self.result['phase']
+            self.result['error'] = str(e)
+            self.log(f"ERROR: Fallo crítico durante la sincronización: {e}")
+        finally:
+            self._close_phase()
+            self.result['phase'] = 'done'
+
+    def _extract_and_send_pipelined(self, ip, port):
+        """Extrae, convierte y envía por tramos, con las tres etapas en paralelo.
+
+        Entre etapas hay colas acotadas (`queue_depth` tramos): si la API es más lenta que el
+        dispositivo, la extracción espera en lugar de acumular todo el registro en memoria.
+        El estado y la duración de cada etapa se ven en vivo en result['stage_state'] y
+        result['stages']; la fase pasa a 'uploading' apenas termina la lectura del equipo.
+
+        La marca de agua avanza recién cuando todos los tramos están en la cola local. Si se
+        cancela a mitad de camino, lo ya encolado se envía igual y la próxima ejecución, que
+        vuelve a leer esos tramos, no los encola de nuevo.
+        """
+        device_id = self.device_info.get('id')
+        endpoint = f"{self.api_url_base}/attendance"
+        outbox = get_outbox()
+        dedup = get_dedup_index()
+        store = get_attendance_store()
+        # Sin marcaciones del equipo en el almacén local, se guarda el registro completo
+        backfill = not store.has_device(device_id)
+        # Con pendientes en la cola (p. ej. de una ejecución cancelada) se evita encolarlos dos veces
+        resume = outbox.depth(device_id) > 0
+        extracted = queue.Queue(maxsize=self.queue_depth)
+        stored = queue.Queue(maxsize=self.queue_depth)
+        failed = threading.Event()
+        errors = []
+        stages = self.result['stages'] = {'extract': 0.0, 'convert': 0.0, 'upload': 0.0}
+        stage_state = self.result['stage_state'] = {'extract': 'waiting', 'convert': 'waiting', 'upload': 'waiting'}
+        last_key = [None]
+
+        def put(target, item):
+            while True:
+                try:
+                    target.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    if failed.is_set() or self.cancel_event.is_set():
+                        return False
+
+        def finish(target, consumer):
+            # El fin de datos se entrega siempre, salvo que la etapa siguiente ya haya terminado
+            while consumer.is_alive():
+                try:
+                    target.put(_END, timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+
+        def convert_stage():
+            # Tramos de tuplas -> lote filtrado por marca de agua y duplicados -> cola local
+            try:
+                while True:
+                    rows = extracted.get()
+                    if rows is _END:
+                        stage_state['convert'] = 'done'
+                        return
+                    stage_state['convert'] = 'running'
+                    started = time.perf_counter()
+                    batch = AttendanceBatch.from_rows(rows, device_id, None if backfill else self.watermark)
+                    del rows
+                    self.result['stored'] += store.add(batch)
+                    if backfill:
+                        batch.keep_after(self.watermark)
+                    self.result['new'] += len(batch)
+                    count = 0
+                    if batch:
+                        batch.sort()
+                        key = batch.key(len(batch) - 1)
+                        if last_key[0] is None or key > last_key[0]:
+                            last_key[0] = key
+                        keys, skipped = dedup.filter(batch)
+                        if batch and resume:
+                            keys, queued = self._skip_queued(outbox, batch, keys)
+                            skipped += queued
+                        self.result['skipped'] += skipped
+                        # Tras una cancelación no se encola nada más
+                        if self.cancel_event.is_set():
+                            stage_state['convert'] = 'cancelled'
+                            return
+                        if batch:
+                            count = outbox.enqueue(endpoint, device_id, batch.iter_json_rows(), keys)
+                    stages['convert'] += time.perf_counter() - started
+                    if count and not put(stored, count):
+                        return
+            except Exception as e:
+                stage_state['convert'] = 'failed'
+                errors.append(e)
+                failed.set()
+            finally:
+                finish(stored, uploader)
+
+        def upload_stage():
+            # Envía lo que haya en la cola local del dispositivo cada vez que llega un tramo
+            drainer = OutboxDrainer(outbox, log=self.log)
+            try:
+                finished = False
+                while not finished:
+                    item = stored.get()
+                    # Varios avisos acumulados se atienden con un solo drenado
+                    while item is not _END:
+                        try:
+                            item = stored.get_nowait()
+                        except queue.Empty:
+                            break
+                    finished = item is _END
+                    stage_state['upload'] = 'running'
+                    started = time.perf_counter()
+                    totals = drainer.drain_once(device_id)
+                    stages['upload'] += time.perf_counter() - started
+                    self.result['sent'] += totals['sent']
+                    self.result['bytes'] += totals['bytes']
+                stage_state['upload'] = 'done'
+            except Exception as e:
+                stage_state['upload'] = 'failed'
+                errors.append(e)
+                failed.set()
+
+        converter = threading.Thread(target=convert_stage, name='zk-convert', daemon=True)
+        uploader = threading.Thread(target=upload_stage, name='zk-upload', daemon=True)
+        converter.start()
+        uploader.start()
+        try:
+            # La sesión queda abierta en el pool para la próxima sincronización
+            connect_started = time.perf_counter()
+            with device_pool.session(ip, port, timeout=self.device_timeout) as conn:
+                self.connect_seconds = time.perf_counter() - connect_started
+                self.log("✓ Conexión exitosa.")
+                self._enter_phase('extracting')
+                self.log("Extrayendo, convirtiendo y enviando registros por tramos...")
+
+                stage_state['extract'] = 'running'
+                chunks = iter_attendance(conn, self.chunk_records)
+                while True:
+                    started = time.perf_counter()
+                    rows = next(chunks, None)
+                    stages['extract'] += time.perf_counter() - started
+                    if rows is None:
+                        break
+                    self.result['extracted'] += len(rows)
+                    if self.cancel_event.is_set():
+                        stage_state['extract'] = 'cancelled'
+                        raise SyncCancelled()
+                    if not put(extracted, rows):
+                        # Una etapa posterior falló: se corta la lectura (y se descarta la sesión)
+                        stage_state['extract'] = 'cancelled' if self.cancel_event.is_set() else 'failed'
+                        raise SyncCancelled() if self.cancel_event.is_set() else errors[0]
+                stage_state['extract'] = 'done'
+            # El equipo ya se leyó completo: lo que queda es terminar de convertir y enviar
+            self._enter_phase('uploading')
+        finally:
+            finish(extracted, converter)
+            converter.join()
+            uploader.join()
+            for name, value in stages.items():
+                stages[name] = round(value, 3)
+
+        if errors:
+            raise errors[0]
+        if self.cancel_event.is_set():
+            raise SyncCancelled()
+
+        if last_key[0] is not None:
+            self.watermarks.update(device_id, *last_key[0])
+
+        pending = outbox.depth(device_id)
+        self.result['pending'] = pending
+        self.log(f"✓ {self.result['extracted']} registros extraídos, {self.result['new']} nuevos, "
+                 f"{self.result['skipped']} omitidos por duplicados, {self.result['sent']} enviados.")
+        if pending:
+            self.failed_phase = 'uploading'
+            self.result['error'] = "Fallo en el envío a la nube; registros pendientes en la cola local"
+            self.log(f"✗ {pending} registros quedan pendientes en la cola local.")
+        else:
+            self.result['ok'] = True
+            self.log("✓ Sincronización completada exitosamente.")
+
+    @staticmethod
+    def _skip_queued(outbox, batch, keys):
+        """Quita del lote las filas que ya esperan en la cola local; retorna (huellas, omitidas)"""
+        queued = outbox.pending_keys(batch.device_id, keys)
+        if not queued:
+            return keys, 0
+        indexes = [i for i, key in enumerate(keys) if key not in queued]
+        batch.keep(indexes)
+        return [keys[i] for i in indexes], len(keys) - len(indexes)
+
+    def restore_archives(self):
+        """Vuelve a encolar lo borrado del dispositivo en vaciados anteriores.
+
+        Tras limpiar la nube, esas marcaciones solo existen en los archivos locales; quedan
+        anotadas como borradas del equipo para que el próximo vaciado siga cuadrando.
+        """
+        device_id = self.device_info.get('id')
+        endpoint = f"{self.api_url_base}/attendance"
+        restored, purged_keys = 0, set()
+        for path in list_archives(device_id):
+            rows, keys = read_archive(path, device_id)
+            get_outbox().enqueue(endpoint, device_id, rows, keys)
+            purged_keys.update(keys)
+            restored += len(rows)
+        if restored:
+            get_dedup_index().record_purge(device_id, purged_keys)
+            self.log(f"{restored} registros archivados de vaciados anteriores vueltos a encolar.")
+        return restored
+
+    def purge_device_log(self):
+        """Vacía el registro del dispositivo si todo lo que contiene ya está confirmado en la nube.
+
+        Es un paso opcional posterior a la sincronización: si no corresponde o falla, la
+        sincronización sigue siendo exitosa y el registro queda intacto.
+        """
+        if self.cancel_event.is_set():
+            return
+        device_id = self.device_info.get('id')
+        purge = DeviceLogPurge(device_id, self.watermarks.get(device_id), get_dedup_index(), get_outbox(),
+                               chunk_records=self.chunk_records, log=self.log)
+        self._enter_phase('purging')
+        try:
+            self.log("Verificando el registro del dispositivo antes de vaciarlo...")
+            with device_pool.session(self.device_info['ip_address'], int(self.device_info['port']),
+                                    timeout=self.device_timeout) as conn:
+                try:
+                    summary = purge.run(conn)
+                except PurgeSkipped as e:
+                    self.result['purge'] = {'status': 'skipped', 'reason': str(e)}
+                    self.log(f"Registro del dispositivo conservado: {e}.")
+                    return
+            self.result['purged'] = summary['purged']
+            self.result['purge'] = dict(summary, status='purged', cutoff=list(summary['cutoff']))
+            self.log(f"✓ {summary['purged']} registros borrados del dispositivo (hasta {summary['cutoff'][0]}, "
+                     f"huella {summary['checksum']}).")
+        except Exception as e:
+            self.result['purge'] = {'status': 'error', 'error': str(e)}
+            self.log(f"✗ No se pudo vaciar el registro del dispositivo: {e}")
+        finally:
+            self._close_phase()
+            self.result['phase'] = 'done'
+
+    def send_data_to_cloud(self, data_type, device_id):
+        """Drena hacia la API de Laravel los registros en cola de este dispositivo"""
+        try:
+            outbox = get_outbox()
+            self.log(f"Enviando {outbox.depth(device_id)} registros a la nube...")
+            totals = OutboxDrainer(outbox, log=self.log).drain_once(device_id)
+            pending = outbox.depth(device_id)
+            self.result['sent'] = totals['sent']
+            self.result['bytes'] = totals['bytes']
+            self.result['pending'] = pending
+
+            if not pending:
+                self.log(f"✓ {data_type.title()} enviados exitosamente ({totals['sent']} registros).")
+                return True
+            self.log(f"✗ {pending} registros quedan pendientes en la cola local.")
+            return False
+
+        except Exception as e:
+            self.log(f"✗ Error inesperado al enviar a la nube: {e}")
+            return False
+
+    def clear_cloud_cache(self):
+        """Limpia en la API de Laravel las asistencias de este dispositivo (no las de los demás).
+
+        Solo con `sync.clear_cloud` activado: el alcance depende de que la API respete `device_id`.
+        """
+        import requests
+
+        try:
+            self.log("Limpiando el caché de la nube...")
+            url = f"{self.api_url_base}/clear-attendance"
+            headers = {'Accept': 'application/json'}
+
+            # Los demás dispositivos ya avanzaron su marca de agua: una limpieza global borraría
+            # en la nube marcaciones que no se vuelven a enviar
+            response = get_http_client().delete(url, params={'device_id': self.device_info.get('id')},
+                                                headers=headers, timeout=10)
+
+            if response.status_code == 200:
+                self.log(f"✓ Caché de asistencia limpiado. Respuesta: {response.json()['message']}")
+                return True
+            else:
+                self.log(f"✗ Fallo al limpiar el caché. Código de estado: {response.status_code}")
+                return False
+
+        except requests.exceptions.ConnectionError:
+            self.log("✗ Error de conexión con la API al intentar limpiar la caché.")
+            return False
+        except Exception as e:
+            self.log(f"✗ Error inesperado al limpiar la caché: {e}")
+            return False
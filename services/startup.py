@@ -0,0 +1,146 @@
+import importlib
+import sys
+import threading
+import time
+
+
+class _TimedLoader:
+    """Envuelve el loader de un módulo para medir su creación y ejecución"""
+
+    def __init__(self, loader, name, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+        self._started = False
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+    def create_module(self, spec):
+        self._profiler._enter()
+        self._started = True
+        try:
+            return self._loader.create_module(spec)
+        except BaseException:
+            self._profiler._leave(self._name)
+            self._started = False
+            raise
+
+    def exec_module(self, module):
+        if not self._started:
+            self._profiler._enter()
+        self._started = False
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._leave(self._name)
+
+
+class ImportProfiler:
+    """Tiempo de importación de cada módulo, con el formato de `python -X importtime`.
+
+    A diferencia de -X importtime funciona también en los ejecutables de PyInstaller,
+    donde no se pueden pasar opciones al intérprete.
+    """
+
+    def __init__(self):
+        # (nombre, propio en µs, acumulado en µs, nivel, hilo), en orden de finalización
+        self.records = []
+        self._local = threading.local()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        if getattr(self._local, 'finding', False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                find_spec = getattr(finder, 'find_spec', None)
+                if finder is self or find_spec is None:
+                    continue
+                spec = find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, name, self)
+        return spec
+
+    def _enter(self):
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append([time.perf_counter(), 0.0])
+
+    def _leave(self, name):
+        stack = self._local.stack
+        started, children = stack.pop()
+        cumulative = time.perf_counter() - started
+        if stack:
+            stack[-1][1] += cumulative
+        self.records.append((name, int((cumulative - children) * 1e6), int(cumulative * 1e6), len(stack),
+                             threading.current_thread().name))
+
+    def report(self, stream=None, ready=None):
+        """Escribe el desglose por módulo y un resumen con los más lentos"""
+        stream = stream or sys.stderr
+        stream.write("import time: self [us] | cumulative | imported package\n")
+        for name, own, cumulative, level, thread in self.records:
+            suffix = '' if thread == 'MainThread' else f'  [{thread}]'
+            stream.write(f"import time: {own:>9} | {cumulative:>10} | {'  ' * level}{name}{suffix}\n")
+
+        top = [record for record in self.records if record[3] == 0]
+        total = sum(record[2] for record in top)
+        stream.write(f"Importaciones: {len(self.records)} módulos en {total / 1000:.1f} ms\n")
+        for name, _, cumulative, _, thread in sorted(top, key=lambda record: -record[2])[:10]:
+            stream.write(f"  {cumulative / 1000:>8.1f} ms  {name}{'' if thread == 'MainThread' else f' [{thread}]'}\n")
+        if ready is not None:
+            stream.write(f"Inicio hasta quedar listo: {ready * 1000:.1f} ms\n")
+        stream.flush()
+
+
+def preload(*modules):
+    """Importa módulos en segundo plano (p. ej. mientras se conecta al dispositivo)"""
+    def load():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+    thread = threading.Thread(target=load, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+
+class StartupTimer:
+    """Duración de cada fase del arranque, en el orden en que se completan"""
+
+    def __init__(self, started=None):
+        self.started = started or time.perf_counter()
+        self.phases = []
+        self._last = self.started
+
+    def mark(self, name):
+        """Cierra la fase `name`: el tiempo transcurrido desde la marca anterior"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def as_dict(self):
+        return {
+            'phases': [{'name': name, 'ms': round(seconds * 1000, 1)} for name, seconds in self.phases],
+            'total_ms': round((self._last - self.started) * 1000, 1),
+        }
+
+    def summary(self):
+        phases = ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        return f"Arranque en {(self._last - self.started) * 1000:.0f} ms ({phases})"
@@ -0,0 +1,160 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from services.config import get_settings
+from services.silent_sync import ZKTecoSilentSync
+from services.watermark import get_watermark_store
+
+try:
+    from services.zkteco import device_pool
+    ZK_AVAILABLE = True
+except ImportError:
+    ZK_AVAILABLE = False
+
+# Fases en las que la sincronización tiene prestada la sesión del dispositivo
+DEVICE_PHASES = ('connecting', 'extracting', 'purging')
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def get_sync_slots():
+    """Semáforo compartido por todo el proceso: dispositivos sincronizándose a la vez (sync.concurrency).
+
+    Lo toman las sincronizaciones programadas, la automática y los trabajos manuales, así el
+    límite vale para el proceso completo y no para cada ejecución por separado.
+    """
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(get_settings('sync')['concurrency'])
+        return _slots
+
+
+class SyncEngine:
+    """Sincroniza varios dispositivos en el mismo proceso con un límite de concurrencia
+    y un tiempo máximo por dispositivo.
+
+    Cada dispositivo espera además un lugar en `get_sync_slots()`: varias ejecuciones
+    simultáneas (una por despacho del programador) no superan juntas `sync.concurrency`.
+    """
+
+    def __init__(self, api_url_base=None, concurrency=None, device_timeout=None, full_resync=False,
+                 verbose=True, log=None):
+        settings = get_settings('sync')
+        self.api_url_base = api_url_base
+        self.concurrency = concurrency or settings['concurrency']
+        self.device_timeout = device_timeout or settings['device_timeout']
+        self.full_resync = full_resync
+        self.verbose = verbose
+        self.log = log or (lambda message: None)
+        # El mismo almacén que usan los trabajos manuales: uno solo por proceso
+        self.watermarks = get_watermark_store()
+
+    def _create_sync(self, device_data, cancel_event=None):
+        return ZKTecoSilentSync(
+            device_data,
+            full_resync=self.full_resync,
+            api_url_base=self.api_url_base,
+            cancel_event=cancel_event,
+            watermarks=self.watermarks,
+            verbose=self.verbose,
+        )
+
+    def sync_device(self, device_data, cancel_event=None):
+        """Sincroniza un único dispositivo y retorna su resumen"""
+        return self._create_sync(device_data, cancel_event).run()
+
+    def run(self, devices):
+        """Sincroniza todos los dispositivos y retorna un resumen de la ejecución"""
+        started = time.time()
+        results = []
+        running = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='zk-sync')
+        try:
+            for device_data in devices:
+                cancel_event = threading.Event()
+                state = {'device': device_data, 'cancel': cancel_event, 'started': None, 'sync': None}
+                future = executor.submit(self._run_tracked, device_data, cancel_event, state)
+                running[future] = state
+
+            while running:
+                done, _ = wait(list(running), timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    state = running.pop(future)
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(self._failed_result(state['device'], str(e)))
+
+                # El timeout cuenta desde que el dispositivo empezó a ejecutarse, no desde que se encoló
+                now = time.time()
+                for future, state in list(running.items()):
+                    if state['started'] and now - state['started'] > self.device_timeout:
+                        state['cancel'].set()
+                        self._abort_device(state)
+                        running.pop(future)
+                        result = self._failed_result(state['device'], f"Timeout ({self.device_timeout}s)")
+                        result['timeout'] = True
+                        results.append(result)
+                        self.log(f"✗ {state['device'].get('name')}: tiempo máximo excedido.")
+        finally:
+            # Los hilos cancelados terminan por su cuenta en la siguiente fase (o al fallar la
+            # llamada al dispositivo que se cortó)
+            executor.shutdown(wait=False)
+
+        return self._summary(results, time.time() - started)
+
+    def _run_tracked(self, device_data, cancel_event, state):
+        # El timeout empieza a contar recién con un lugar libre en el proceso
+        with get_sync_slots():
+            state['sync'] = self._create_sync(device_data, cancel_event)
+            state['started'] = time.time()
+            return state['sync'].run()
+
+    def _abort_device(self, state):
+        """Corta la sesión de un dispositivo que no respondió a tiempo.
+
+        La cancelación solo se revisa entre tramos: una llamada de pyzk bloqueada esperando
+        al equipo ocuparía el hilo (y su lugar en la concurrencia) hasta su propio timeout.
+        """
+        sync = state['sync']
+        if not ZK_AVAILABLE or sync is None or sync.result['phase'] not in DEVICE_PHASES:
+            return
+        device = state['device']
+        if device_pool.abort(device['ip_address'], int(device['port'])):
+            self.log(f"Sesión con {device.get('name')} cortada para liberar el hilo.")
+
+    @staticmethod
+    def _failed_result(device_data, error):
+        return {
+            'device_id': device_data.get('id'),
+            'name': device_data.get('name'),
+            'ip_address': device_data.get('ip_address'),
+            'ok': False,
+            'phase': 'done',
+            'extracted': 0,
+            'new': 0,
+            'skipped': 0,
+            'sent': 0,
+            'bytes': 0,
+            'error': error,
+            'elapsed': 0.0,
+        }
+
+    @staticmethod
+    def _summary(results, elapsed):
+        return {
+            'total': len(results),
+            'ok': sum(1 for r in results if r['ok']),
+            'failed': sum(1 for r in results if not r['ok'] and not r.get('timeout')),
+            'timeout': sum(1 for r in results if r.get('timeout')),
+            'extracted': sum(r['extracted'] for r in results),
+            'skipped': sum(r.get('skipped', 0) for r in results),
+            'sent': sum(r['sent'] for r in results),
+            'elapsed': round(elapsed, 3),
+            'devices': results,
+        }
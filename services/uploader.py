@@ -0,0 +1,165 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from services.config import get_settings
+from services.http_client import get_http_client
+
+
+class BatchResult:
+    """Resultado del envío de un lote"""
+
+    def __init__(self, index, count, size):
+        self.index = index
+        self.count = count
+        self.size = size
+        self.ok = False
+        self.status_code = None
+        self.error = None
+        self.attempts = 0
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'count': self.count,
+            'bytes': self.size,
+            'ok': self.ok,
+            'status_code': self.status_code,
+            'error': self.error,
+            'attempts': self.attempts,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+class UploadResult:
+    """Resumen de un envío por lotes; es verdadero solo si todos los lotes fueron aceptados"""
+
+    def __init__(self, batches):
+        self.batches = sorted(batches, key=lambda b: b.index)
+
+    def __bool__(self):
+        return self.success
+
+    @property
+    def success(self):
+        return all(b.ok for b in self.batches)
+
+    @property
+    def sent_records(self):
+        return sum(b.count for b in self.batches if b.ok)
+
+    @property
+    def failed_records(self):
+        return sum(b.count for b in self.batches if not b.ok)
+
+    @property
+    def bytes_sent(self):
+        return sum(b.size for b in self.batches if b.ok)
+
+    @property
+    def acknowledged_prefix(self):
+        """Cantidad de registros en los lotes iniciales aceptados de forma consecutiva"""
+        total = 0
+        for batch in self.batches:
+            if not batch.ok:
+                break
+            total += batch.count
+        return total
+
+
+class BatchUploader:
+    """Envía registros a la API en lotes acotados (registros y bytes), con varios lotes en paralelo
+    y reintentos independientes por lote."""
+
+    RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+
+    def __init__(self, endpoint, max_records=None, max_bytes=None, max_in_flight=None,
+                 retries=None, backoff=None, timeout=None, log=None):
+        settings = get_settings('upload')
+        self.endpoint = endpoint
+        self.max_records = max_records or settings['max_records']
+        self.max_bytes = max_bytes or settings['max_bytes']
+        self.max_in_flight = max_in_flight or settings['max_in_flight']
+        self.retries = settings['retries'] if retries is None else retries
+        self.backoff = settings['backoff'] if backoff is None else backoff
+        self.timeout = timeout or settings['timeout']
+        self.log = log or (lambda message: None)
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+
+    def send(self, records):
+        """Serializa y envía una lista de diccionarios"""
+        return self.send_rows(json.dumps(r, ensure_ascii=False) for r in records)
+
+    def iter_batches(self, rows):
+        """Agrupa filas JSON ya serializadas en cuerpos '[...]' que respetan los límites"""
+        batch = []
+        size = 2
+        for row in rows:
+            row_size = len(row.encode('utf-8')) + 1
+            if batch and (len(batch) >= self.max_records or size + row_size > self.max_bytes):
+                yield batch
+                batch = []
+                size = 2
+            batch.append(row)
+            size += row_size
+        if batch:
+            yield batch
+
+    def send_rows(self, rows):
+        """Envía filas JSON serializadas manteniendo como máximo `max_in_flight` lotes en curso"""
+        results = []
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for index, batch in enumerate(self.iter_batches(rows)):
+                if len(pending) >= self.max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.extend(f.result() for f in done)
+                body = ('[' + ','.join(batch) + ']').encode('utf-8')
+                pending.add(executor.submit(self._post_batch, index, len(batch), body))
+            done, _ = wait(pending)
+            results.extend(f.result() for f in done)
+
+        result = UploadResult(results)
+        failed = [b for b in result.batches if not b.ok]
+        if failed and len(failed) < len(result.batches):
+            self.log(f"⚠ Envío parcial: {len(result.batches) - len(failed)}/{len(result.batches)} lotes aceptados, "
+                     f"{result.failed_records} registros pendientes.")
+        return result
+
+    def _post_batch(self, index, count, body):
+        import requests
+
+        result = BatchResult(index, count, len(body))
+        started = time.time()
+        for attempt in range(self.retries + 1):
+            result.attempts = attempt + 1
+            try:
+                response = get_http_client().post(self.endpoint, data=body, headers=self.headers, timeout=self.timeout)
+                result.status_code = response.status_code
+                if response.status_code == 200:
+                    result.ok = True
+                    result.error = None
+                    break
+                result.error = f"HTTP {response.status_code}: {response.text[:100]}"
+                if response.status_code not in self.RETRY_STATUS:
+                    break
+            except requests.exceptions.Timeout:
+                result.error = f"Timeout ({self.timeout}s)"
+            except requests.exceptions.ConnectionError:
+                result.error = "Error de conexión con el servidor"
+            except Exception as e:
+                result.error = f"Error inesperado: {e}"
+                break
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        result.elapsed = time.time() - started
+
+        if result.ok:
+            self.log(f"  ✓ Lote {index + 1}: {count} registros aceptados ({result.elapsed:.1f}s).")
+        else:
+            self.log(f"  ✗ Lote {index + 1}: {count} registros rechazados tras {result.attempts} intentos ({result.error}).")
+        return result
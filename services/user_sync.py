@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from services.config import get_data_dir, get_settings
+from services.uploader import BatchUploader
+
+try:
+    from services.zkteco import device_pool
+    ZK_AVAILABLE = True
+except ImportError:
+    ZK_AVAILABLE = False
+
+
+def user_hash(user):
+    """Huella de 16 bytes de los datos de un usuario de pyzk que se publican en la nube"""
+    raw = (f"{user.uid}\x1f{user.user_id}\x1f{user.name}\x1f{user.privilege}\x1f"
+           f"{user.card}\x1f{user.group_id}").encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+class RosterIndex:
+    """Huellas de los usuarios de cada dispositivo tal como quedaron en la nube (data/users.db)"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), 'users.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS roster (
+                device_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                PRIMARY KEY (device_id, user_id)
+            ) WITHOUT ROWID
+        """)
+
+    def load(self, device_id):
+        """{user_id: huella} del último envío confirmado"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT user_id, hash FROM roster WHERE device_id = ?", (str(device_id),)
+            ).fetchall())
+
+    def apply(self, device_id, upserted, removed):
+        """Registra en una transacción los usuarios (user_id, huella) enviados y los user_id eliminados"""
+        device_id = str(device_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO roster (device_id, user_id, hash) VALUES (?, ?, ?)",
+                    ((device_id, user_id, digest) for user_id, digest in upserted)
+                )
+                self._conn.executemany(
+                    "DELETE FROM roster WHERE device_id = ? AND user_id = ?",
+                    ((device_id, user_id) for user_id in removed)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def purge_device(self, device_id):
+        """Olvida las huellas de un dispositivo (el próximo envío será completo)"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM roster WHERE device_id = ?", (str(device_id),))
+        return cursor.rowcount
+
+
+def _accepted(rows, result):
+    """Filas de los lotes aceptados (los lotes cubren `rows` en orden)"""
+    accepted = []
+    offset = 0
+    for batch in result.batches:
+        if batch.ok:
+            accepted.extend(rows[offset:offset + batch.count])
+        offset += batch.count
+    return accepted
+
+
+class UserRosterSync:
+    """Envía a la nube solo los usuarios del dispositivo agregados, modificados o eliminados.
+
+    Cada usuario se resume en una huella de (uid, user_id, nombre, privilegio, tarjeta, grupo);
+    se compara con las huellas del último envío confirmado y solo viajan las diferencias:
+    altas y cambios a `<api>/users`, bajas a `<api>/users/delete` (rutas configurables en la
+    sección 'users'). Las huellas se actualizan por lote aceptado, así un envío parcial se
+    completa en la próxima ejecución.
+    """
+
+    def __init__(self, device_info, api_url_base, roster=None, full=False, log=None):
+        self.device_info = device_info
+        self.api_url_base = api_url_base
+        self.roster = roster or get_roster_index()
+        self.full = full
+        self.log = log or (lambda message: None)
+        settings = get_settings('users')
+        self.upsert_path = settings['upsert_path']
+        self.delete_path = settings['delete_path']
+        self.result = {
+            'device_id': device_info.get('id'),
+            'name': device_info.get('name'),
+            'ok': False,
+            'phase': 'pending',
+            'users': 0,
+            'added': 0,
+            'changed': 0,
+            'removed': 0,
+            'unchanged': 0,
+            'sent': 0,
+            'pending': 0,
+            'error': None,
+            'elapsed': 0.0,
+        }
+
+    def run(self):
+        started = time.time()
+        try:
+            if not ZK_AVAILABLE:
+                raise RuntimeError("Librería 'pyzk' no encontrada")
+            device_id = self.device_info.get('id')
+            self.result['phase'] = 'reading'
+            with device_pool.session(self.device_info['ip_address'], int(self.device_info['port']),
+                                     timeout=self.device_info.get('timeout')) as conn:
+                users = conn.get_users()
+            self.result['users'] = len(users)
+
+            if self.full:
+                self.roster.purge_device(device_id)
+            previous = self.roster.load(device_id)
+            upserts, current = [], set()
+            for user in users:
+                user_id = str(user.user_id)
+                current.add(user_id)
+                digest = user_hash(user)
+                known = previous.get(user_id)
+                if known == digest:
+                    self.result['unchanged'] += 1
+                    continue
+                self.result['added' if known is None else 'changed'] += 1
+                upserts.append((user_id, digest, json.dumps({
+                    'uid': user.uid, 'id': user_id, 'name': user.name, 'privilege': user.privilege,
+                    'card': user.card, 'group_id': user.group_id, 'device_id': device_id,
+                }, ensure_ascii=False)))
+            removed = [user_id for user_id in previous if user_id not in current]
+            self.result['removed'] = len(removed)
+            self.log(f"{len(users)} usuarios en el dispositivo: {self.result['added']} nuevos, "
+                     f"{self.result['changed']} modificados, {len(removed)} eliminados.")
+
+            self.result['phase'] = 'uploading'
+            accepted_upserts = self._send(self.upsert_path, upserts, lambda item: item[2])
+            device_json = json.dumps(device_id, ensure_ascii=False)
+            accepted_removed = self._send(self.delete_path, removed,
+                                          lambda user_id: f'{{"id": {json.dumps(user_id)}, "device_id": {device_json}}}')
+            self.roster.apply(device_id, [(user_id, digest) for user_id, digest, _ in accepted_upserts],
+                              accepted_removed)
+
+            self.result['sent'] = len(accepted_upserts) + len(accepted_removed)
+            self.result['pending'] = len(upserts) + len(removed) - self.result['sent']
+            self.result['ok'] = not self.result['pending']
+            if self.result['pending']:
+                self.result['error'] = f"{self.result['pending']} cambios no confirmados por la API"
+        except Exception as e:
+            self.result['error'] = str(e)
+            self.log(f"✗ Error al sincronizar usuarios: {e}")
+        finally:
+            self.result['phase'] = 'done'
+            self.result['elapsed'] = round(time.time() - started, 3)
+        return self.result
+
+    def _send(self, path, items, serialize):
+        """Envía `items` por lotes; retorna los confirmados por la API"""
+        if not items:
+            return []
+        uploader = BatchUploader(f"{self.api_url_base}/{path}", log=self.log)
+        return _accepted(items, uploader.send_rows(serialize(item) for item in items))
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_roster_index():
+    """Índice compartido por todo el proceso"""
+    global _roster
+    with _roster_lock:
+        if _roster is None:
+            _roster = RosterIndex()
+        return _roster
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from services.config import get_data_dir
+
+
+@contextmanager
+def _file_lock(path):
+    """Bloqueo exclusivo entre procesos sobre `path` (se crea si no existe)"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class WatermarkStore:
+    """Marca de agua persistente por dispositivo: último (timestamp, uid) confirmado por la API.
+
+    Usar `get_watermark_store()`: un almacén por proceso. Cada escritura parte del archivo
+    actual y cambia solo el dispositivo indicado, con el archivo bloqueado (`watermarks.json.lock`)
+    mientras tanto, así no se pisan las marcas que escriba otro proceso (p. ej.
+    `main2.py --silent` mientras corre el servicio). Las lecturas vuelven a cargar el archivo
+    cuando cambió desde la última vez, así se ven también las marcas avanzadas por otro proceso.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), 'watermarks.json')
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._marks = self._load()
+
+    def _file_stamp(self):
+        """Identifica la versión del archivo (os.replace cambia el inodo aunque coincida la fecha)"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _refresh(self):
+        """Relee el archivo si cambió desde la última lectura o escritura (llamar con `_lock`)"""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._marks = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, device_id, mark):
+        """Escribe la marca de un dispositivo (None la elimina) sobre el contenido actual del archivo"""
+        with _file_lock(f"{self.path}.lock"):
+            marks = self._load()
+            current = marks.get(device_id)
+            if mark is None:
+                marks.pop(device_id, None)
+            elif current and (current['timestamp'], current['uid']) >= (mark['timestamp'], mark['uid']):
+                # Otro proceso ya la avanzó más
+                self._stamp = self._file_stamp()
+                self._marks = marks
+                return
+            else:
+                marks[device_id] = mark
+            # Escritura atómica, con un temporal propio de este proceso e hilo
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(marks, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._stamp = self._file_stamp()
+        self._marks = marks
+
+    def get(self, device_id):
+        """Retorna (timestamp, uid) del último registro confirmado o None"""
+        with self._lock:
+            self._refresh()
+            mark = self._marks.get(str(device_id))
+        if not mark:
+            return None
+        return mark['timestamp'], mark['uid']
+
+    def update(self, device_id, timestamp, uid):
+        """Avanza la marca de agua; nunca retrocede"""
+        with self._lock:
+            self._refresh()
+            current = self._marks.get(str(device_id))
+            if current and (current['timestamp'], current['uid']) >= (timestamp, uid):
+                return
+            self._save(str(device_id), {'timestamp': timestamp, 'uid': uid})
+
+    def reset(self, device_id):
+        """Elimina la marca de agua (la próxima sincronización será completa)"""
+        with self._lock:
+            self._refresh()
+            if str(device_id) in self._marks:
+                self._save(str(device_id), None)
+
+    @staticmethod
+    def is_newer(mark, timestamp, uid):
+        """Indica si el registro (timestamp, uid) es posterior a la marca"""
+        return mark is None or (timestamp, uid) > mark
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_watermark_store():
+    """Almacén compartido por todo el proceso"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WatermarkStore()
+        return _store
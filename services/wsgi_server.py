@@ -0,0 +1,172 @@
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from services.config import get_settings
+
+try:
+    from waitress import wasyncore
+    from waitress.server import create_server as create_waitress_server
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+SERVER_BACKENDS = ('dev', 'production')
+
+
+class WaitressWSGIServer:
+    """Servidor WSGI de producción sobre waitress.
+
+    Un número fijo de hilos (`workers`) atiende las peticiones; el bucle asíncrono de
+    waitress lee y escribe las conexiones, así que las keep-alive inactivas no ocupan un
+    hilo y se cierran tras `keepalive` segundos. Con `max_connections` abiertas deja de
+    aceptar y las nuevas esperan en la cola del socket (`backlog`). `drain()` deja de
+    aceptar conexiones y espera a que terminen las peticiones en curso y las ya recibidas.
+    """
+
+    def __init__(self, host, port, app, workers=8, backlog=64, keepalive=5, max_connections=256):
+        self.workers = workers
+        self.backlog = backlog
+        self.keepalive = keepalive
+        self.max_connections = max_connections
+        self._map = {}
+        self._server = create_waitress_server(
+            app, map=self._map, host=host, port=port, threads=workers, backlog=backlog,
+            connection_limit=max_connections, channel_timeout=keepalive,
+            cleanup_interval=max(int(keepalive), 1), ident='zkteco-service',
+        )
+        self.server_address = (self._server.effective_host, self._server.effective_port)
+        self._serving = threading.Event()
+        self._stopped = threading.Event()
+        self._stopping = False
+
+    def serve_forever(self):
+        self._serving.set()
+        adj = self._server.adj
+        try:
+            # Igual que waitress.server.run(), pero el bucle termina al pedir el cierre
+            while self._map and not self._stopping:
+                wasyncore.loop(timeout=adj.asyncore_loop_timeout, map=self._map,
+                               use_poll=adj.asyncore_use_poll, count=1)
+        finally:
+            self._close_all()
+            self._stopped.set()
+
+    def wait_serving(self, timeout=None):
+        """Espera a que el bucle de atención esté en marcha"""
+        return self._serving.wait(timeout)
+
+    def _in_loop(self, action):
+        """Ejecuta `action` en el hilo del bucle (los canales de waitress no son seguros entre hilos)"""
+        if self._serving.is_set() and not self._stopped.is_set():
+            done = threading.Event()
+
+            def thunk():
+                try:
+                    action()
+                finally:
+                    done.set()
+
+            self._server.trigger.pull_trigger(thunk)
+            done.wait(2)
+        else:
+            action()
+
+    def _stop_accepting(self):
+        server = self._server
+        server.accepting = False
+        if server.socket is not None:
+            wasyncore.dispatcher.close(server)
+        # Las conexiones inactivas no recibirán otra petición
+        for channel in list(server.active_channels.values()):
+            if not channel.requests and not channel.total_outbufs_len:
+                channel.will_close = True
+
+    def _pending(self):
+        dispatcher = self._server.task_dispatcher
+        with dispatcher.lock:
+            busy = dispatcher.active_count or len(dispatcher.queue)
+        return busy or any(channel.requests or channel.total_outbufs_len
+                           for channel in list(self._server.active_channels.values()))
+
+    def _close_all(self):
+        for channel in list(self._server.active_channels.values()):
+            channel.close()
+        if self._server.socket is not None:
+            wasyncore.dispatcher.close(self._server)
+        self._server.trigger.close()
+        wasyncore.close_all(self._map)
+
+    def drain(self, timeout=10):
+        """Deja de aceptar conexiones y espera las peticiones pendientes; retorna True si terminaron todas"""
+        self._in_loop(self._stop_accepting)
+        deadline = time.time() + timeout
+        while self._pending() and time.time() < deadline:
+            time.sleep(0.05)
+        drained = not self._pending()
+
+        self._stopping = True
+        if self._serving.is_set():
+            # Despierta al bucle para que vea el pedido de cierre
+            try:
+                self._server.trigger.pull_trigger()
+            except OSError:
+                pass
+            self._stopped.wait(max(deadline - time.time(), 2))
+        else:
+            self._close_all()
+        self._server.task_dispatcher.shutdown(cancel_pending=True, timeout=max(deadline - time.time(), 1))
+        return drained
+
+    def stats(self):
+        dispatcher = self._server.task_dispatcher
+        with dispatcher.lock:
+            busy, queued = dispatcher.active_count, len(dispatcher.queue)
+        return {'backend': 'production', 'server': 'waitress', 'workers': self.workers, 'busy': busy,
+                'queued': queued, 'open_connections': len(self._server.active_channels),
+                'max_connections': self.max_connections, 'backlog': self.backlog, 'keepalive': self.keepalive}
+
+
+class DevWSGIServer:
+    """Servidor de desarrollo de Werkzeug (un hilo por petición, sin límite)"""
+
+    def __init__(self, host, port, app):
+        self._server = make_server(host, port, app, threaded=True)
+        self.server_address = self._server.server_address
+        self._serving = threading.Event()
+
+    def serve_forever(self):
+        self._serving.set()
+        self._server.serve_forever()
+
+    def wait_serving(self, timeout=None):
+        return self._serving.wait(timeout)
+
+    def drain(self, timeout=10):
+        if self._serving.is_set():
+            self._server.shutdown()
+        self._server.server_close()
+        return True
+
+    def stats(self):
+        return {'backend': 'dev'}
+
+
+def create_server(app, host, port, backend=None, log=None):
+    """Crea el servidor HTTP según `backend` ('dev' o 'production'; por defecto, la configuración).
+
+    Sin waitress (p. ej. un ejecutable empaquetado sin ella) se usa el servidor 'dev' y se
+    avisa por `log`: el servicio arranca igual, con menos control sobre las conexiones.
+    """
+    settings = get_settings('server')
+    backend = backend or settings['backend']
+    if backend == 'production' and not WAITRESS_AVAILABLE:
+        (log or print)("Librería 'waitress' no encontrada (pip install waitress); se usa el servidor 'dev'")
+        backend = 'dev'
+    if backend == 'dev':
+        return DevWSGIServer(host, port, app)
+    if backend == 'production':
+        return WaitressWSGIServer(host, port, app, workers=settings['workers'], backlog=settings['backlog'],
+                                  keepalive=settings['keepalive'], max_connections=settings['max_connections'])
+    raise ValueError(f"Servidor desconocido: '{backend}' (opciones: {', '.join(SERVER_BACKENDS)})")
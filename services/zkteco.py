@@ -1,53 +1,352 @@
-from zk import ZK
+import atexit
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from struct import iter_unpack, pack, unpack
+
+from zk import ZK, const
+from zk.exception import ZKErrorResponse
+
+from services.config import get_settings
+
+
+class _PooledDevice:
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = port
+        self.lock = threading.RLock()
+        self.conn = None
+        # Conexión en curso (antes de quedar en `conn`) y corte pedido por `abort`
+        self.connecting = None
+        self.aborted = False
+        self.last_used = 0.0
+
+
+class DevicePool:
+    """Pool de sesiones abiertas con los dispositivos, por (ip, puerto).
+
+    Cada dispositivo se usa de a un hilo por vez. Antes de prestar una sesión inactiva
+    se verifica con una consulta barata (hora del equipo) y se reconecta si no responde.
+    """
+
+    def __init__(self, timeout=None, probe_after=None, max_idle=None, ommit_ping=None):
+        settings = get_settings('devices')
+        self.timeout = timeout or settings['timeout']
+        self.probe_after = settings['probe_after'] if probe_after is None else probe_after
+        self.max_idle = settings['max_idle'] if max_idle is None else max_idle
+        # pyzk lanza un proceso `ping` antes de cada conexión salvo que se omita
+        self.ommit_ping = settings['ommit_ping'] if ommit_ping is None else ommit_ping
+        self._lock = threading.Lock()
+        self._devices = {}
+
+    def _entry(self, ip, port):
+        key = (ip, int(port))
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is None:
+                entry = self._devices[key] = _PooledDevice(ip, int(port))
+            return entry
+
+    @contextmanager
+    def session(self, ip, port=4370, timeout=None):
+        """Presta una conexión autenticada; cualquier error durante su uso la descarta"""
+        self.evict_idle()
+        entry = self._entry(ip, port)
+        with entry.lock:
+            conn = self._ensure_connected(entry, timeout or self.timeout)
+            try:
+                yield conn
+            except Exception:
+                self._close_entry(entry)
+                raise
+            finally:
+                entry.last_used = time.time()
+
+    def _ensure_connected(self, entry, timeout):
+        if entry.aborted:
+            self._close_entry(entry)
+        if entry.conn is not None and time.time() - entry.last_used > self.probe_after:
+            try:
+                entry.conn.get_time()
+            except Exception:
+                self._close_entry(entry)
+        if entry.conn is None:
+            entry.connecting = ZK(entry.ip, port=entry.port, timeout=timeout, ommit_ping=self.ommit_ping)
+            try:
+                entry.conn = entry.connecting.connect()
+            finally:
+                entry.connecting = None
+            entry.last_used = time.time()
+        return entry.conn
+
+    def _close_entry(self, entry):
+        entry.aborted = False
+        conn, entry.conn = entry.conn, None
+        if conn is not None:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+
+    def close(self, ip, port=4370):
+        """Cierra la sesión de un dispositivo (espera a que termine quien la esté usando)"""
+        entry = self._entry(ip, port)
+        with entry.lock:
+            self._close_entry(entry)
+
+    def abort(self, ip, port=4370):
+        """Corta el socket de la sesión de un dispositivo sin esperar a quien la está usando.
+
+        Una llamada de pyzk bloqueada en ese socket falla de inmediato y libera el hilo; la
+        sesión se descarta y la próxima vuelve a conectar. Retorna False si no había conexión.
+        """
+        entry = self._entry(ip, port)
+        conn = entry.conn or entry.connecting
+        if conn is None:
+            return False
+        entry.aborted = True
+        sock = getattr(conn, '_ZK__sock', None)
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except (OSError, AttributeError):
+            pass
+        return True
+
+    def evict_idle(self):
+        """Cierra las sesiones que llevan más de `max_idle` segundos sin usarse"""
+        now = time.time()
+        with self._lock:
+            entries = list(self._devices.values())
+        for entry in entries:
+            if entry.conn is not None and now - entry.last_used > self.max_idle:
+                # Si otro hilo la está usando no está inactiva: no esperar
+                if entry.lock.acquire(blocking=False):
+                    try:
+                        self._close_entry(entry)
+                    finally:
+                        entry.lock.release()
+
+    def close_all(self, timeout=None):
+        """Cierra todas las sesiones.
+
+        Con `timeout` no se espera a que termine quien esté usando una: se corta su socket
+        (como en `abort`) y se le dan, entre todas, hasta `timeout` segundos para soltarla.
+        """
+        with self._lock:
+            entries = list(self._devices.values())
+        deadline = None if timeout is None else time.time() + timeout
+        for entry in entries:
+            if deadline is None:
+                with entry.lock:
+                    self._close_entry(entry)
+                continue
+            if not entry.lock.acquire(blocking=False):
+                self.abort(entry.ip, entry.port)
+                if not entry.lock.acquire(timeout=max(deadline - time.time(), 0)):
+                    continue
+            try:
+                self._close_entry(entry)
+            finally:
+                entry.lock.release()
+
+
+device_pool = DevicePool()
+# Al salir, una descarga en curso en un hilo daemon no debe retener al intérprete
+atexit.register(device_pool.close_all, timeout=2)
+
+
+# pyzk no define esta constante (usa el número directamente)
+_CMD_PREPARE_BUFFER = 1503
+
+# Formato de asistencia de 40 bytes (firmware actual): uid, user_id, estado, fecha, tipo, reservado
+_ATTENDANCE_RECORD = '<H24sB4sB8s'
+_ATTENDANCE_RECORD_SIZE = 40
+
+
+def _decode_time(raw):
+    """Fecha del equipo (DecodeTime de zkemsdk, igual que pyzk)"""
+    t = unpack('<I', raw)[0]
+    second = t % 60
+    t //= 60
+    minute = t % 60
+    t //= 60
+    hour = t % 24
+    t //= 24
+    day = t % 31 + 1
+    t //= 31
+    month = t % 12 + 1
+    year = t // 12 + 2000
+    return datetime(year, month, day, hour, minute, second)
+
+
+def _iter_buffer_chunks(conn, command):
+    """Lee un buffer del equipo por tramos (como `read_with_buffer` de pyzk, pero sin juntarlo todo)"""
+    max_chunk = 0xFFc0 if conn.tcp else 16 * 1024
+    response = conn._ZK__send_command(_CMD_PREPARE_BUFFER, pack('<bhii', 1, command, 0, 0), 1024)
+    if not response.get('status'):
+        raise ZKErrorResponse("RWB Not supported")
+    if response['code'] == const.CMD_DATA:
+        # El equipo envió todo en la misma respuesta
+        data = conn._ZK__data
+        if conn.tcp and len(data) < conn._ZK__tcp_length - 8:
+            data = data + conn._ZK__recieve_raw_data(conn._ZK__tcp_length - 8 - len(data))
+        yield data
+        return
+    size = unpack('I', conn._ZK__data[1:5])[0]
+    start = 0
+    while start < size:
+        length = min(max_chunk, size - start)
+        yield conn._ZK__read_chunk(start, length)
+        start += length
+    conn.free_data()
+
+
+def iter_attendance(conn, chunk_records=2000):
+    """Genera las asistencias del equipo por tramos, a medida que se leen del dispositivo.
+
+    Cada tramo es una lista de tuplas (uid, user_id, estado, fecha, tipo), como los campos
+    de `Attendance` de pyzk. Usa métodos internos de pyzk para no esperar a tener todo el
+    registro en memoria; los formatos antiguos (8 y 16 bytes) se leen con `get_attendance()`.
+    """
+    conn.read_sizes()
+    if conn.records == 0:
+        return
+    pending = b''
+    header_read = False
+    chunk_bytes = chunk_records * _ATTENDANCE_RECORD_SIZE
+    chunks = _iter_buffer_chunks(conn, const.CMD_ATTLOG_RRQ)
+    for data in chunks:
+        if not header_read:
+            if len(data) < 4:
+                return
+            total_size = unpack('I', data[:4])[0]
+            if total_size / conn.records in (8, 16):
+                # Formato antiguo: terminar la lectura en curso y usar el parser de pyzk
+                for _ in chunks:
+                    pass
+                records = conn.get_attendance()
+                for start in range(0, len(records), chunk_records):
+                    yield [(r.uid, r.user_id, r.status, r.timestamp, r.punch)
+                           for r in records[start:start + chunk_records]]
+                return
+            data = data[4:]
+            header_read = True
+        pending += data
+        # Se procesa por tramos acotados (el equipo puede enviar todo el registro de una vez)
+        usable = len(pending) - len(pending) % _ATTENDANCE_RECORD_SIZE
+        for offset in range(0, usable, chunk_bytes):
+            end = min(offset + chunk_bytes, usable)
+            yield [
+                (uid, user_id.split(b'\x00')[0].decode(errors='ignore'), status, _decode_time(timestamp), punch)
+                for uid, user_id, status, timestamp, punch, _ in iter_unpack(_ATTENDANCE_RECORD, pending[offset:end])
+            ]
+        pending = pending[usable:]
+
+
+class OperationCancelled(Exception):
+    """Operación con el dispositivo cancelada por quien la pidió"""
+
 
 class Zkteco:
     def __init__(self, ip, port=4370):
         self.ip = ip
         self.port = port
-        self.conn = None
+        self.connected = False
 
     def connect(self):
-        zk = ZK(self.ip, port=self.port, timeout=5)
         try:
-            self.conn = zk.connect()
+            with device_pool.session(self.ip, self.port):
+                pass
+            self.connected = True
             return True, "Dispositivo conectado correctamente ✅"
         except Exception as e:
+            self.connected = False
             return False, f"Error al conectar: {e}"
 
     def disconnect(self):
-        if self.conn:
-            self.conn.disconnect()
-            self.conn = None
+        if self.connected:
+            device_pool.close(self.ip, self.port)
+            self.connected = False
             return True, "Dispositivo desconectado 🔌"
         return False, "No hay conexión activa"
-    
+
+    @staticmethod
+    def _read_status(conn):
+        return {
+            "firmware_version": conn.get_firmware_version(),
+            "serial_number": conn.get_serialnumber(),
+            "device_name": conn.get_device_name() if hasattr(conn, "get_device_name") else "ZKTeco",
+        }
+
     def get_status(self):
-        if not self.conn:
+        if not self.connected:
             return False, "No hay conexión activa"
         try:
-            status = {
-                "firmware_version": self.conn.get_firmware_version(),
-                "serial_number": self.conn.get_serialnumber(),
-                "device_name": self.conn.get_device_name() if hasattr(self.conn, "get_device_name") else "ZKTeco",
-            }
+            with device_pool.session(self.ip, self.port) as conn:
+                status = self._read_status(conn)
             return True, status
         except Exception as e:
             return False, f"Error al obtener estado: {e}"
 
+    def identify(self, timeout=3, udp=False):
+        """Conexión breve, fuera del pool, para confirmar que responde un terminal ZKTeco.
+
+        Retorna su estado (firmware, serie, nombre) o None si no completa el saludo.
+        """
+        conn = None
+        try:
+            conn = ZK(self.ip, port=self.port, timeout=timeout, force_udp=udp, ommit_ping=True).connect()
+            return self._read_status(conn)
+        except Exception:
+            return None
+        finally:
+            if conn is not None:
+                try:
+                    conn.disconnect()
+                except Exception:
+                    pass
+
     def get_users(self):
-        if not self.conn:
+        if not self.connected:
             return False, "No hay conexión activa"
         try:
-            users = self.conn.get_users()
+            with device_pool.session(self.ip, self.port) as conn:
+                users = conn.get_users()
             return True, users
         except Exception as e:
             return False, f"Error al obtener usuarios: {e}"
-        
+
     def get_attendance(self):
-        if not self.conn:
+        if not self.connected:
             return False, "No hay conexión activa"
         try:
-            logs = self.conn.get_attendance()
+            with device_pool.session(self.ip, self.port) as conn:
+                logs = conn.get_attendance()
             return True, logs
         except Exception as e:
             return False, f"Error al obtener asistencias: {e}"
+
+    def get_attendance_rows(self, cancel_event=None, progress=None):
+        """Como get_attendance, pero por tramos y como tuplas (user_id, fecha, estado).
+
+        Entre tramos se revisa `cancel_event` y se informa el avance con `progress(cantidad)`.
+        """
+        if not self.connected:
+            return False, "No hay conexión activa"
+        rows = []
+        try:
+            with device_pool.session(self.ip, self.port) as conn:
+                for chunk in iter_attendance(conn):
+                    # Cancelar a mitad de la descarga descarta la conexión (queda a medio leer)
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise OperationCancelled()
+                    rows.extend((user_id, timestamp, status) for _, user_id, status, timestamp, _ in chunk)
+                    if progress:
+                        progress(len(rows))
+            return True, rows
+        except OperationCancelled:
+            return False, "Descarga cancelada"
+        except Exception as e:
+            return False, f"Error al obtener asistencias: {e}"
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import attendance_store, config, dedup, jobs, outbox, sync_engine, user_sync, watermark  # noqa: E402
+
+# Índices y colas compartidos por el proceso: cada prueba parte de instancias nuevas
+SINGLETONS = [
+    (watermark, '_store'),
+    (outbox, '_outbox'),
+    (dedup, '_index'),
+    (attendance_store, '_store'),
+    (user_sync, '_roster'),
+    (jobs, '_manager'),
+    (sync_engine, '_slots'),
+]
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Directorio de datos temporal y configuración por defecto (sin config/service.json ni logs)"""
+    monkeypatch.setenv('ZKTECO_DATA_DIR', str(tmp_path))
+    settings = {name: dict(values) for name, values in config.DEFAULT_SETTINGS.items()}
+    settings['logging']['enabled'] = False
+    monkeypatch.setattr(config, '_settings', settings)
+    for module, name in SINGLETONS:
+        monkeypatch.setattr(module, name, None)
+    return tmp_path
+
+
+@pytest.fixture
+def settings():
+    """Secciones de la configuración en uso, modificables desde la prueba"""
+    return config._settings
+
+
+@pytest.fixture
+def device(monkeypatch):
+    """Terminal simulado con 3000 marcaciones"""
+    from benchmarks.device_sim import SimulatedDevice
+    from services.zkteco import device_pool
+
+    # El simulador no responde ping ICMP
+    monkeypatch.setattr(device_pool, 'ommit_ping', True)
+    sim = SimulatedDevice(records=3000, users=20, seed=1).start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture
+def api(device):
+    """API de Laravel simulada que conoce al terminal simulado (id 1)"""
+    from benchmarks.mock_api import MockApi
+
+    mock = MockApi(devices=[device.device_info(1)]).start()
+    yield mock
+    mock.stop()
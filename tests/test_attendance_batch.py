@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timedelta
+
+from zk.attendance import Attendance
+
+from services.attendance_batch import AttendanceBatch
+from services.attendance_store import AttendanceStore
+from services.watermark import WatermarkStore
+
+
+START = datetime(2025, 1, 1, 7, 0, 0)
+
+
+def orphan_records():
+    # pyzk (8/16 bytes) usa str(user_id) como uid si el usuario ya no existe en el equipo
+    return [
+        Attendance('1001', START, 1, 0, 5),
+        Attendance('A-77', START + timedelta(seconds=1), 1, 0, 'A-77'),
+        Attendance('1002', START + timedelta(seconds=1), 1, 1, '1002'),
+        Attendance('B-12', START + timedelta(seconds=2), 1, 0, 'B-12'),
+    ]
+
+
+def test_from_pyzk_accepts_text_uids():
+    batch = AttendanceBatch.from_pyzk(orphan_records(), 1)
+
+    assert len(batch) == 4
+    assert list(batch.uid_values()) == [5, 'A-77', 1002, 'B-12']
+    rows = batch.to_dicts()
+    assert [row['uid'] for row in rows] == [5, 'A-77', 1002, 'B-12']
+    assert rows[1] == {'uid': 'A-77', 'id': 'A-77', 'timestamp': '2025-01-01 07:00:01', 'state': 1,
+                       'type': 0, 'device_id': 1}
+
+
+def test_from_rows_matches_from_pyzk():
+    rows = [(r.uid, r.user_id, r.status, r.timestamp, r.punch) for r in orphan_records()]
+    batch = AttendanceBatch.from_rows(rows, 1)
+
+    assert list(batch.iter_json_rows()) == list(AttendanceBatch.from_pyzk(orphan_records(), 1).iter_json_rows())
+    assert all(isinstance(uid, int) for uid in batch.uids)
+
+
+def test_text_uid_codes_are_stable_and_negative():
+    first = AttendanceBatch.from_pyzk(orphan_records(), 1)
+    second = AttendanceBatch.from_pyzk(orphan_records(), 1)
+
+    assert list(first.uids) == list(second.uids)
+    assert first.uids[1] < 0 and first.uids[3] < 0
+    # Fuera del rango de la columna en la plataforma se conserva como texto
+    assert str(AttendanceBatch.from_rows([(2 ** 40, '9', 1, START, 0)], 1).to_dicts()[0]['uid']) == '1099511627776'
+
+
+def test_watermark_with_text_uid(data_dir):
+    batch = AttendanceBatch.from_pyzk(orphan_records(), 1)
+    batch.sort()
+    marks = WatermarkStore()
+    marks.update(1, *batch.key(len(batch) - 1))
+    watermark = WatermarkStore().get(1)
+    assert watermark == batch.key(len(batch) - 1)
+
+    # La siguiente extracción solo conserva lo posterior, sin comparar texto con enteros
+    again = AttendanceBatch.from_pyzk(orphan_records() + [Attendance('1001', START + timedelta(seconds=3), 1, 0, 5)],
+                                      1, watermark)
+    assert again.to_dicts()[0]['timestamp'] == '2025-01-01 07:00:03'
+    assert len(again) == 1
+
+    # Dentro del mismo segundo el código de un uid de texto ordena antes que los uid reales
+    cut = AttendanceBatch.from_pyzk(orphan_records(), 1, batch.key(1))
+    assert batch.key(1)[0] == '2025-01-01 07:00:01'
+    assert [row['uid'] for row in cut.to_dicts()] == [1002, 'B-12']
+
+
+def test_store_keeps_the_original_uid(data_dir):
+    store = AttendanceStore()
+    store.add(AttendanceBatch.from_pyzk(orphan_records(), 1))
+
+    rows, total = store.query(user='A-77')
+    assert total == 1 and rows[0]['uid'] == 'A-77'
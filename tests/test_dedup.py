@@ -0,0 +1,107 @@
+import os
+from datetime import datetime, timedelta
+
+from services.attendance_batch import AttendanceBatch
+from services.dedup import BloomFilter, DedupIndex, dedup_key, xor_keys
+
+
+START = datetime(2025, 1, 1, 7, 0, 0)
+
+
+def keys(count, start=0, device_id=1):
+    return [dedup_key(device_id, str(1000 + i % 7), str(START + timedelta(seconds=i)), i % 2)
+            for i in range(start, start + count)]
+
+
+def batch(count, start=0):
+    rows = [(i % 7 + 1, str(1000 + i % 7), 1, START + timedelta(seconds=i), i % 2)
+            for i in range(start, start + count)]
+    return AttendanceBatch.from_rows(rows, 1)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    added = keys(1000)
+    for key in added:
+        bloom.add(key)
+    assert all(key in bloom for key in added)
+    false_positives = sum(key in bloom for key in keys(1000, start=5000, device_id=2))
+    assert false_positives < 50
+
+
+def test_bloom_filter_size_does_not_depend_on_content():
+    assert len(BloomFilter(1000, 0.01).bits) == len(BloomFilter(1000, 0.01).bits)
+    assert len(BloomFilter(2000, 0.01).bits) > len(BloomFilter(1000, 0.01).bits)
+
+
+def test_filter_skips_confirmed_rows(data_dir):
+    index = DedupIndex(capacity=1000)
+    data = batch(100)
+    index.add(1, data.dedup_keys()[:40])
+
+    kept, skipped = index.filter(data)
+
+    assert skipped == 40
+    assert len(data) == len(kept) == 60
+    assert kept == data.dedup_keys()
+
+
+def test_bloom_is_capped_at_capacity(data_dir):
+    index = DedupIndex(capacity=100)
+    index.add(1, keys(80))
+    size = index.stats()['bloom_bytes']
+
+    index.add(1, keys(80, start=80))
+
+    stats = index.stats()
+    assert stats['bloom_saturated'] and 'bloom_bytes' not in stats
+    # Sin filtro el resultado sigue siendo exacto
+    data = batch(200)
+    kept, skipped = index.filter(data)
+    assert skipped == 160 and len(kept) == 40
+    assert size == len(BloomFilter(100, index.error_rate).bits)
+
+
+def test_oversized_index_on_disk_does_not_build_a_bigger_bloom(data_dir):
+    DedupIndex(capacity=1000).add(1, keys(300))
+
+    index = DedupIndex(capacity=100)
+    kept, skipped = index.filter(batch(300))
+
+    assert skipped == 300 and not kept
+    assert index.stats()['bloom_saturated']
+
+
+def test_bloom_is_rebuilt_when_purge_makes_it_fit(data_dir):
+    index = DedupIndex(capacity=100)
+    index.add(1, keys(150))
+    index.add(2, keys(10, device_id=2))
+    assert index.stats()['bloom_saturated']
+
+    assert index.purge_device(1) == 150
+    index.filter(batch(10))
+
+    stats = index.stats()
+    assert not stats['bloom_saturated'] and stats['size'] == 10
+
+
+def test_ledger_counts_each_confirmation_once(data_dir):
+    index = DedupIndex()
+    first = keys(50)
+    index.add(1, first)
+    index.add(1, first[:10] + first[:10])
+
+    assert index.on_device(1) == (50, xor_keys(first))
+
+    index.record_purge(1, first[:20])
+    assert index.on_device(1) == (30, xor_keys(first[20:]))
+
+
+def test_ledger_is_built_for_indexes_created_before_it(data_dir):
+    index = DedupIndex()
+    index.add(1, keys(25))
+    index._conn.execute("DELETE FROM ledger")
+
+    reopened = DedupIndex(os.path.join(str(data_dir), 'dedup.db'))
+
+    assert reopened.on_device(1) == (25, xor_keys(keys(25)))
@@ -0,0 +1,33 @@
+import json
+import os
+
+from benchmarks.mock_api import MockApi
+from services.device_registry import DeviceRegistry
+
+DEVICES = [{'id': 1, 'name': 'Puerta', 'ip_address': '10.0.0.10', 'port': 4370}]
+
+
+def test_confirmation_without_changes_refreshes_saved_at(data_dir):
+    mock = MockApi(devices=DEVICES).start()
+    url = f"{mock.base_url}/biometricdevices"
+    path = os.path.join(data_dir, 'devices.json')
+    try:
+        assert DeviceRegistry(url, ttl=0).get_devices() == DEVICES
+
+        # La lista se guardó hace mucho y la API la confirma ahora sin cambios (304)
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        saved['saved_at'] -= 10000
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f)
+        registry = DeviceRegistry(url, ttl=0)
+        assert registry.get_devices() == DEVICES
+        assert registry.stats()['not_modified'] == 1
+
+        # Tras un reinicio con la API caída, la antigüedad cuenta desde esa confirmación
+        mock.failure_rate = 1.0
+        offline = DeviceRegistry(url, ttl=0, max_stale=3600)
+        assert offline.get_devices() == DEVICES
+        assert offline.stats()['fallbacks'] == 1
+    finally:
+        mock.stop()
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from services.jobs import JobManager, JobStore, SyncJob
+from zkteco_service import ZKTecoService
+
+
+def wait_done(manager, job, timeout=20):
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.05)
+    return manager.store.get(job.id)
+
+
+def test_concurrent_submits_create_a_single_job(device, api):
+    manager = JobManager(store=JobStore(persist=False), workers=2)
+    results = []
+    barrier = threading.Barrier(8)
+
+    def submit():
+        barrier.wait()
+        results.append(manager.submit(device.device_info(1), api_url_base=api.base_url))
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({job.id for job, _ in results}) == 1
+    assert sum(created for _, created in results) == 1
+    wait_done(manager, results[0][0])
+    manager.shutdown()
+
+
+def test_users_job_runs_through_the_manager(device, api):
+    manager = JobManager(store=JobStore(persist=False), workers=2)
+    job, created = manager.submit(device.device_info(1), api_url_base=api.base_url, kind='users')
+    # Un trabajo de asistencias del mismo dispositivo no se confunde con el de usuarios
+    other, other_created = manager.submit(device.device_info(1), api_url_base=api.base_url)
+
+    assert created and other_created and other.id != job.id
+    job = wait_done(manager, job)
+    wait_done(manager, other)
+    data = job.to_dict()
+    assert data['kind'] == 'users' and data['status'] == 'done'
+    assert data['progress']['added'] == 20 and data['progress']['sent'] == 20
+    assert api.stats['users_received'] == 20
+    manager.shutdown()
+
+
+def test_users_endpoints_are_configurable(settings, device, api):
+    settings['users'].update(upsert_path='missing')
+    manager = JobManager(store=JobStore(persist=False), workers=1)
+    job, _ = manager.submit(device.device_info(1), api_url_base=api.base_url, kind='users')
+
+    job = wait_done(manager, job)
+
+    assert job.status == 'failed'
+    assert api.stats['users_received'] == 0
+    manager.shutdown()
+
+
+def test_job_roundtrip_keeps_kind():
+    job = SyncJob({'id': 1, 'name': 'A', 'ip_address': '10.0.0.1', 'port': 4370}, kind='users')
+    assert SyncJob.from_dict(job.to_dict()).kind == 'users'
+
+
+def test_sync_users_route_returns_a_job(device, api):
+    service = ZKTecoService(installer_mode=True)
+    service.api_url_base = api.base_url
+    service.init_flask_server()
+    client = service.flask_app.test_client()
+
+    response = client.post('/sync-users', json=device.device_info(1))
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['job']['kind'] == 'users'
+    deadline = time.time() + 20
+    while client.get(f"/jobs/{body['job_id']}").get_json()['status'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert client.get(f"/jobs/{body['job_id']}").get_json()['status'] == 'done'
+    assert client.post('/sync-users', json={'id': 1}).status_code == 400
+
+
+def test_discover_route_runs_as_a_job(settings, device):
+    settings['discovery'].update(udp=False)
+    service = ZKTecoService(installer_mode=True)
+    service.init_flask_server()
+    client = service.flask_app.test_client()
+
+    response = client.post('/discover', json={'ranges': [f"{device.host}/32"], 'port': device.port})
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['job']['kind'] == 'discovery'
+    deadline = time.time() + 20
+    while client.get(f"/jobs/{body['job_id']}").get_json()['status'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    job = client.get(f"/jobs/{body['job_id']}").get_json()
+    assert job['status'] == 'done'
+    assert job['progress'] == {'hosts': 1, 'scanned': 1, 'found': 1}
+    assert [found['port'] for found in job['devices']] == [device.port]
+    assert client.post('/discover', json={'ranges': ['10.0.0.0/8']}).status_code == 400
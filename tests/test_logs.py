@@ -0,0 +1,36 @@
+import json
+import os
+import threading
+import time
+
+from services.logs import LogPipeline, get_logger, log_event
+
+
+def test_stop_flushes_json_lines(data_dir):
+    path = os.path.join(data_dir, 'logs', 'service.log')
+    pipeline = LogPipeline(path).start()
+    for i in range(100):
+        log_event(get_logger('test'), "Sincronización finalizada", device=i, ok=True)
+
+    assert pipeline.stop() is True
+
+    with open(path, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry['device'] for entry in entries] == list(range(100))
+    assert entries[0]['logger'] == 'zkteco.test' and entries[0]['msg'] == "Sincronización finalizada"
+
+
+def test_stop_is_bounded_when_the_writer_is_stuck(data_dir, settings):
+    settings['logging'].update(queue_size=5)
+    pipeline = LogPipeline(os.path.join(data_dir, 'service.log'))
+    release = threading.Event()
+    pipeline.file_handler.handle = lambda record: release.wait()
+    pipeline.start()
+    for i in range(20):
+        get_logger().info("mensaje %d", i)
+
+    started = time.time()
+    assert pipeline.stop(timeout=0.5) is False
+    assert time.time() - started < 1.5
+    assert pipeline.stats()['dropped'] > 0
+    release.set()
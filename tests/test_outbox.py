@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+from benchmarks.mock_api import MockApi
+from services import outbox as outbox_module
+from services.dedup import dedup_key, get_dedup_index
+from services.outbox import AttendanceOutbox, OutboxDrainer, get_outbox
+
+
+def rows(count, device_id=1):
+    data = [json.dumps({'uid': i, 'id': str(1000 + i), 'timestamp': f"2025-01-01 07:00:{i % 60:02d}",
+                        'state': 1, 'type': 0, 'device_id': device_id}) for i in range(count)]
+    keys = [dedup_key(device_id, str(1000 + i), f"2025-01-01 07:00:{i % 60:02d}", 0) for i in range(count)]
+    return data, keys
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado por la prueba para las reservas y esperas de la cola"""
+    now = [1000.0]
+    monkeypatch.setattr(outbox_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def mock_api():
+    mock = MockApi().start()
+    yield mock
+    mock.stop()
+
+
+def next_attempts(outbox):
+    return [row[0] for row in outbox._conn.execute("SELECT next_attempt FROM outbox ORDER BY id")]
+
+
+def test_claimed_rows_wait_for_the_lease(data_dir, clock):
+    outbox = AttendanceOutbox()
+    data, keys = rows(10)
+    assert outbox.enqueue('http://api/attendance', 1, data, keys) == 10
+
+    claimed = outbox.claim(4, lease=60)
+    assert [payload for _, _, payload in claimed] == data[:4]
+    assert [payload for _, _, payload in outbox.claim(100, lease=60)] == data[4:]
+    assert outbox.claim(100, lease=60) == []
+
+    clock[0] += 59
+    assert outbox.claim(100, lease=60) == []
+    clock[0] += 1
+    assert len(outbox.claim(100, lease=60)) == 10
+    assert outbox.depth() == 10
+
+
+def test_claim_by_device(data_dir, clock):
+    outbox = AttendanceOutbox()
+    outbox.enqueue('http://api/attendance', 1, rows(3, 1)[0])
+    outbox.enqueue('http://api/attendance', 2, rows(5, 2)[0])
+
+    assert len(outbox.claim(100, lease=60, device_id=2)) == 5
+    assert len(outbox.claim(100, lease=60)) == 3
+    assert outbox.depth_by_device() == {'1': 3, '2': 5}
+
+
+def test_ack_returns_keys_and_deletes_rows(data_dir):
+    outbox = AttendanceOutbox()
+    data, keys = rows(6)
+    outbox.enqueue('http://api/attendance', 1, data, keys)
+    outbox.enqueue('http://api/attendance', 2, rows(2, 2)[0])
+    claimed = outbox.claim(100, lease=60)
+
+    acked = outbox.ack([row_id for row_id, _, _ in claimed])
+
+    assert acked == {'1': keys}
+    assert outbox.depth() == 0
+
+
+def test_retry_later_backs_off_exponentially_up_to_the_maximum(data_dir, clock):
+    outbox = AttendanceOutbox()
+    outbox.enqueue('http://api/attendance', 1, rows(1)[0])
+    row_id = outbox.claim(1, lease=60)[0][0]
+
+    waits = []
+    for _ in range(9):
+        outbox.retry_later([row_id], backoff_base=10, backoff_max=900)
+        waits.append(next_attempts(outbox)[0] - clock[0])
+    assert waits == [10, 20, 40, 80, 160, 320, 640, 900, 900]
+    assert outbox._conn.execute("SELECT attempts FROM outbox").fetchone()[0] == 9
+
+    assert outbox.claim(1, lease=60) == []
+    clock[0] += 900
+    assert len(outbox.claim(1, lease=60)) == 1
+
+
+def test_purge_device_and_pending_keys(data_dir):
+    outbox = AttendanceOutbox()
+    data, keys = rows(5)
+    outbox.enqueue('http://api/attendance', 1, data, keys)
+    outbox.enqueue('http://api/attendance', 2, *rows(3, 2))
+
+    other = rows(8)[1][5:]
+    assert outbox.pending_keys(1, keys[2:] + other) == set(keys[2:])
+    assert outbox.pending_keys(2, keys) == set()
+
+    assert outbox.purge_device(1) == 5
+    assert outbox.depth(1) == 0
+    assert outbox.depth(2) == 3
+    assert outbox.pending_keys(1, keys) == set()
+
+
+def test_drain_sends_and_records_confirmed_keys(data_dir, mock_api):
+    outbox = get_outbox()
+    data, keys = rows(2500)
+    outbox.enqueue(f"{mock_api.base_url}/attendance", 1, data, keys)
+
+    totals = OutboxDrainer(outbox).drain_once()
+
+    assert totals['sent'] == 2500 and totals['failed'] == 0
+    assert mock_api.stats['records_received'] == 2500
+    assert outbox.depth() == 0
+    assert get_dedup_index().known(1, keys) == set(keys)
+
+
+def test_drain_keeps_failed_rows_with_backoff(data_dir, settings, mock_api):
+    settings['upload'].update(retries=0)
+    mock_api.failure_rate = 1.0
+    outbox = get_outbox()
+    data, keys = rows(50)
+    outbox.enqueue(f"{mock_api.base_url}/attendance", 1, data, keys)
+
+    totals = OutboxDrainer(outbox).drain_once()
+
+    assert totals['sent'] == 0 and totals['failed'] == 50
+    assert outbox.depth() == 50
+    assert {row[0] for row in outbox._conn.execute("SELECT attempts FROM outbox")} == {1}
+    # En espera: un segundo drenado no vuelve a intentarlo
+    assert OutboxDrainer(outbox).drain_once() == {'sent': 0, 'failed': 0, 'bytes': 0}
+    assert get_dedup_index().known(1, keys) == set()
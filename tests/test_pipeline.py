@@ -0,0 +1,73 @@
+import threading
+
+from services import silent_sync
+from services.outbox import AttendanceOutbox, get_outbox
+from services.silent_sync import ZKTecoSilentSync
+from services.watermark import get_watermark_store
+
+
+def make_sync(device, api, **kwargs):
+    return ZKTecoSilentSync(device.device_info(1), api_url_base=api.base_url, verbose=False, **kwargs)
+
+
+def test_reports_uploading_once_the_device_is_read(settings, device, api, monkeypatch):
+    settings['sync'].update(chunk_records=500)
+    sync = make_sync(device, api)
+    phases = []
+    drain_once = silent_sync.OutboxDrainer.drain_once
+
+    def recording_drain(drainer, device_id=None):
+        phases.append((sync.result['phase'], dict(sync.result['stage_state'])))
+        return drain_once(drainer, device_id)
+
+    monkeypatch.setattr(silent_sync.OutboxDrainer, 'drain_once', recording_drain)
+    result = sync.run()
+
+    assert result['ok'] and result['sent'] == 3000
+    assert all(state['upload'] == 'running' for _, state in phases)
+    # El último envío ocurre con el equipo ya leído
+    phase, state = phases[-1]
+    assert phase == 'uploading' and state['extract'] == 'done'
+    assert result['stage_state'] == {'extract': 'done', 'convert': 'done', 'upload': 'done'}
+    assert set(result['timings']) >= {'extracting', 'uploading'}
+
+
+def test_cancel_stops_enqueueing_and_the_next_run_does_not_duplicate(settings, device, api, monkeypatch):
+    settings['sync'].update(chunk_records=500)
+    settings['outbox'].update(backoff_base=0)
+    settings['upload'].update(retries=0)
+    assert make_sync(device, api).run()['ok']
+    watermark = get_watermark_store().get(1)
+    device.add_records(3000)
+    received = api.stats['records_received']
+
+    cancel = threading.Event()
+    enqueue = AttendanceOutbox.enqueue
+    calls = []
+
+    def cancelling_enqueue(outbox, *args, **kwargs):
+        calls.append(1)
+        count = enqueue(outbox, *args, **kwargs)
+        if len(calls) == 2:
+            cancel.set()
+        return count
+
+    monkeypatch.setattr(AttendanceOutbox, 'enqueue', cancelling_enqueue)
+    # La API no responde: lo encolado queda pendiente en la cola local
+    api.failure_rate = 1.0
+    result = make_sync(device, api, cancel_event=cancel).run()
+    api.failure_rate = 0.0
+    queued = get_outbox().depth(1)
+    assert queued
+
+    assert not result['ok'] and 'Cancelada' in result['error']
+    assert len(calls) == 2
+    # Con tramos sin encolar la marca de agua no avanza
+    assert get_watermark_store().get(1) == watermark
+
+    monkeypatch.setattr(AttendanceOutbox, 'enqueue', enqueue)
+    result = make_sync(device, api).run()
+
+    assert result['ok'] and result['new'] == 3000 and result['skipped'] == queued
+    # Lo encolado antes de cancelar se envía una sola vez
+    assert api.stats['records_received'] - received == 3000
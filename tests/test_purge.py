@@ -0,0 +1,119 @@
+import gzip
+import json
+
+from services.dedup import get_dedup_index
+from services.purge import list_archives, read_archive
+from services.silent_sync import ZKTecoSilentSync
+
+
+def sync(device, api, **kwargs):
+    return ZKTecoSilentSync(device.device_info(1), api_url_base=api.base_url, verbose=False, **kwargs).run()
+
+
+def enable_purge(settings, min_records=1000):
+    settings['purge'].update(enabled=True, min_records=min_records)
+
+
+def test_purges_after_confirmed_sync_and_archives_the_log(settings, device, api):
+    enable_purge(settings)
+    result = sync(device, api)
+
+    assert result['ok'] and result['sent'] == 3000
+    assert result['purged'] == 3000
+    assert result['purge']['status'] == 'purged'
+    assert device.record_count == 0
+    [archive] = list_archives(1)
+    rows, keys = read_archive(archive, 1)
+    assert len(rows) == 3000
+    assert result['purge']['checksum'] == json.load(open(archive.replace('.jsonl.gz', '.json')))['checksum']
+    # Todo lo confirmado quedó anotado como borrado del equipo
+    assert get_dedup_index().on_device(1) == (0, bytes(16))
+
+
+def test_ledger_matches_again_after_a_previous_purge(settings, device, api):
+    enable_purge(settings, min_records=100)
+    sync(device, api)
+    device.add_records(500)
+
+    result = sync(device, api)
+
+    assert result['sent'] == 500
+    assert result['purged'] == 500
+    assert len(list_archives(1)) == 2
+
+
+def test_skips_when_device_does_not_match_what_was_acked(settings, device, api):
+    sync(device, api)
+    # La API confirmó una marcación que el equipo ya no tiene (p. ej. se perdió un registro)
+    get_dedup_index().add(1, [b'x' * 16])
+    enable_purge(settings)
+
+    result = sync(device, api)
+
+    assert result['ok']
+    assert result['purge']['status'] == 'skipped'
+    assert 'no coincide' in result['purge']['reason']
+    assert device.record_count == 3000
+    assert list_archives(1) == []
+
+
+def test_skips_when_rows_are_not_confirmed(settings, device, api):
+    sync(device, api)
+    get_dedup_index().purge_device(1)
+    enable_purge(settings)
+
+    result = sync(device, api)
+
+    assert result['purge']['status'] == 'skipped'
+    assert device.record_count == 3000
+
+
+def test_skips_below_min_records(settings, device, api):
+    enable_purge(settings, min_records=5000)
+
+    result = sync(device, api)
+
+    assert result['purge']['status'] == 'skipped'
+    assert device.record_count == 3000
+
+
+def test_full_resync_resends_archived_rows(settings, device, api):
+    enable_purge(settings, min_records=100)
+    settings['sync'].update(clear_cloud=True)
+    sync(device, api)
+    device.add_records(200)
+    received = api.stats['records_received']
+    cleared = len(api.stats['cleared_devices'])
+
+    result = sync(device, api, full_resync=True)
+
+    assert result['ok']
+    assert api.stats['cleared_devices'][cleared:] == ['1']
+    # Lo archivado (3000) más lo que sigue en el equipo (200)
+    assert api.stats['records_received'] - received == 3200
+    assert result['purged'] == 200
+    count, digest = get_dedup_index().on_device(1)
+    assert (count, digest) == (0, bytes(16))
+
+
+def test_full_resync_does_not_clear_the_cloud_by_default(device, api):
+    sync(device, api)
+    received = api.stats['records_received']
+
+    result = sync(device, api, full_resync=True)
+
+    assert result['ok']
+    assert api.stats['cleared_devices'] == []
+    assert api.stats['records_received'] - received == 3000
+
+
+def test_archive_is_verified_gzip_jsonl(settings, device, api):
+    enable_purge(settings)
+    sync(device, api)
+    [archive] = list_archives(1)
+    with gzip.open(archive, 'rt', encoding='utf-8') as f:
+        first = json.loads(f.readline())
+    assert set(first) >= {'id', 'timestamp', 'type', 'device_id'}
+    rows, keys = read_archive(archive, 1)
+    assert json.loads(rows[0]) == first
+    assert len(keys) == len(rows) == 3000
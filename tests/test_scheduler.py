@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from services.scheduler import CronSchedule, IntervalSchedule, SyncScheduler, parse_schedule
+
+
+@pytest.mark.parametrize('expression, minutes', [
+    ('* * * * *', set(range(60))),
+    ('5 * * * *', {5}),
+    ('*/15 * * * *', {0, 15, 30, 45}),
+    ('5/10 * * * *', {5, 15, 25, 35, 45, 55}),
+    ('10-20/5 * * * *', {10, 15, 20}),
+    ('0,30 * * * *', {0, 30}),
+    ('1-3,50/5 * * * *', {1, 2, 3, 50, 55}),
+])
+def test_cron_minute_field(expression, minutes):
+    assert CronSchedule(expression).minutes == minutes
+
+
+def test_cron_step_start_applies_to_every_field():
+    schedule = CronSchedule('0 2/6 1/10 * *')
+    assert schedule.hours == {2, 8, 14, 20}
+    assert schedule.days == {1, 11, 21, 31}
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *', '60 * * * *', '* 24 * * *', '* * 0 * *', '* * * 13 *', '* * * * 7',
+    '*/0 * * * *', '10-5 * * * *', 'a * * * *',
+])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_cron_next_after():
+    schedule = CronSchedule('5/20 8 * * *')
+    assert schedule.next_after(datetime(2025, 3, 1, 8, 5)) == datetime(2025, 3, 1, 8, 25)
+    assert schedule.next_after(datetime(2025, 3, 1, 8, 45)) == datetime(2025, 3, 2, 8, 5)
+
+
+def test_cron_day_and_weekday_match_either_when_both_restricted():
+    # Día 1 del mes o lunes
+    schedule = CronSchedule('0 0 1 * 1')
+    assert schedule.next_after(datetime(2025, 3, 1, 0, 0)) == datetime(2025, 3, 3, 0, 0)
+    assert schedule.next_after(datetime(2025, 3, 31, 0, 0)) == datetime(2025, 4, 1, 0, 0)
+
+
+def test_parse_schedule_forms():
+    assert isinstance(parse_schedule({'cron': '0 * * * *'}), CronSchedule)
+    assert isinstance(parse_schedule({'interval': 600}), IntervalSchedule)
+    assert isinstance(parse_schedule(900), IntervalSchedule)
+    with pytest.raises(ValueError):
+        parse_schedule({'interval': 10})
+
+
+def make_scheduler(settings, run_devices):
+    settings['schedule'].update(default={'interval': 600}, jitter=0)
+    devices = [{'id': 1, 'name': 'A', 'ip_address': '10.0.0.1', 'port': 4370},
+               {'id': 2, 'name': 'B', 'ip_address': '10.0.0.2', 'port': 4370}]
+    scheduler = SyncScheduler(lambda: devices, run_devices, threading.Event())
+    scheduler.refresh_devices()
+    return scheduler
+
+
+def force_due(scheduler, *keys):
+    for key in keys:
+        scheduler._entries[key]['next_run'] = datetime(2000, 1, 1)
+
+
+def wait_idle(scheduler, timeout=5):
+    deadline = time.time() + timeout
+    while scheduler._running and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_dispatch_does_not_block_and_skips_running_devices(settings):
+    release = threading.Event()
+    calls = []
+
+    def run_devices(devices):
+        calls.append([device['id'] for device in devices])
+        release.wait(5)
+
+    scheduler = make_scheduler(settings, run_devices)
+    force_due(scheduler, '1')
+
+    assert scheduler.dispatch_due() == ['1']
+    # Sigue vencido pero ya se está sincronizando
+    assert scheduler.dispatch_due() == []
+    force_due(scheduler, '2')
+    assert scheduler.dispatch_due() == ['2']
+    assert {item['device_id']: item['running'] for item in scheduler.next_runs()} == {1: True, 2: True}
+
+    release.set()
+    wait_idle(scheduler)
+
+    assert sorted(calls) == [[1], [2]]
+    assert not scheduler._running
+    assert all(entry['next_run'] > datetime.now() for entry in scheduler._entries.values())
+    assert scheduler.dispatch_due() == []
+
+
+def test_refresh_during_a_run_does_not_run_it_twice(settings):
+    release = threading.Event()
+    scheduler = make_scheduler(settings, lambda devices: release.wait(5))
+    force_due(scheduler, '1')
+    scheduler.dispatch_due()
+
+    scheduler.refresh_devices()
+    release.set()
+    wait_idle(scheduler)
+
+    assert scheduler._entries['1']['next_run'] > datetime.now()
+    assert scheduler.dispatch_due() == []
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from services.sync_engine import SyncEngine
+from services.zkteco import device_pool
+
+
+def sync_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('zk-sync')]
+
+
+def wait_until(condition, timeout):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_syncs_all_devices(device, api):
+    summary = SyncEngine(api_url_base=api.base_url, verbose=False).run([device.device_info(1)])
+
+    assert summary['total'] == summary['ok'] == 1
+    assert summary['sent'] == 3000
+
+
+def test_timeout_aborts_the_blocked_device_call(device, api):
+    # Cada respuesta del equipo tarda más que el tiempo máximo por dispositivo
+    device.latency = 4
+    started = time.time()
+
+    summary = SyncEngine(api_url_base=api.base_url, device_timeout=1, verbose=False).run([device.device_info(1)])
+
+    assert summary['timeout'] == 1
+    assert summary['devices'][0]['error'].startswith('Timeout')
+    # El hilo no queda esperando al equipo: la sesión se cortó
+    assert wait_until(lambda: not sync_threads(), 1.5)
+    assert time.time() - started < 4
+
+
+def test_abort_without_session_is_a_no_op():
+    assert device_pool.abort('127.0.0.1', 1) is False
+
+
+def test_aborted_idle_session_reconnects(device):
+    info = device.device_info(1)
+    with device_pool.session(info['ip_address'], info['port']) as conn:
+        conn.get_time()
+    assert device_pool.abort(info['ip_address'], info['port'])
+
+    with device_pool.session(info['ip_address'], info['port']) as conn:
+        assert conn.get_time()
+
+
+def test_concurrency_is_shared_by_every_engine(settings, monkeypatch):
+    settings['sync'].update(concurrency=2)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    class SlowSync:
+        def __init__(self, device_data):
+            self.result = SyncEngine._failed_result(device_data, None)
+
+        def run(self):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.2)
+            with lock:
+                active[0] -= 1
+            return dict(self.result, ok=True)
+
+    monkeypatch.setattr(SyncEngine, '_create_sync', lambda self, device_data, cancel_event=None: SlowSync(device_data))
+    # Una ejecución por dispositivo, como los despachos del programador
+    summaries = []
+    threads = [threading.Thread(target=lambda i=i: summaries.append(
+        SyncEngine(verbose=False).run([{'id': i, 'name': f"d{i}"}]))) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(summary['ok'] for summary in summaries) == 6
+    assert peak[0] == 2
+
+
+def test_close_all_does_not_wait_for_a_busy_session(device):
+    info = device.device_info(1)
+    with device_pool.session(info['ip_address'], info['port']) as conn:
+        conn.get_time()
+    device.latency = 5
+    errors = []
+
+    def download():
+        try:
+            with device_pool.session(info['ip_address'], info['port']) as conn:
+                conn.get_attendance()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=download, daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    started = time.time()
+
+    device_pool.close_all(timeout=1)
+
+    assert time.time() - started < 2
+    thread.join(2)
+    assert not thread.is_alive() and errors
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+
+from services import watermark
+from services.watermark import WatermarkStore, get_watermark_store
+
+
+def write_marks(path, device_ids, updates):
+    """Avanza la marca de cada dispositivo `updates` veces con su propio almacén"""
+    store = WatermarkStore(path)
+    for i in range(updates):
+        for device_id in device_ids:
+            store.update(device_id, f"2025-01-01 07:00:{i:02d}", i)
+
+
+def test_update_never_goes_back(data_dir):
+    store = WatermarkStore()
+    store.update(1, "2025-01-01 08:00:00", 5)
+    store.update(1, "2025-01-01 07:00:00", 9)
+    store.update(1, "2025-01-01 08:00:00", 4)
+    assert store.get(1) == ("2025-01-01 08:00:00", 5)
+
+    store.update(1, "2025-01-01 08:00:00", 6)
+    assert store.get(1) == ("2025-01-01 08:00:00", 6)
+    assert WatermarkStore.is_newer(store.get(1), "2025-01-01 08:00:01", 0)
+    assert not WatermarkStore.is_newer(store.get(1), "2025-01-01 08:00:00", 6)
+
+
+def test_reset_and_persistence(data_dir):
+    store = WatermarkStore()
+    store.update(1, "2025-01-01 08:00:00", 5)
+    store.update('2', "2025-01-02 08:00:00", 1)
+    store.reset(1)
+
+    reopened = WatermarkStore()
+    assert reopened.get(1) is None
+    assert reopened.get(2) == ("2025-01-02 08:00:00", 1)
+
+
+def test_stores_do_not_overwrite_each_other(data_dir):
+    first, second = WatermarkStore(), WatermarkStore()
+    first.update(1, "2025-01-01 08:00:00", 1)
+    second.update(2, "2025-01-01 09:00:00", 2)
+    # `first` conserva en memoria una marca más antigua que la del archivo
+    second.update(1, "2025-01-01 10:00:00", 3)
+    first.update(1, "2025-01-01 09:30:00", 1)
+
+    marks = WatermarkStore()
+    assert marks.get(1) == ("2025-01-01 10:00:00", 3)
+    assert marks.get(2) == ("2025-01-01 09:00:00", 2)
+
+
+def test_concurrent_threads_keep_every_device(data_dir):
+    path = os.path.join(data_dir, 'watermarks.json')
+    threads = [threading.Thread(target=write_marks, args=(path, [f"t{n}-{d}" for d in range(3)], 20))
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = WatermarkStore(path)
+    for n in range(8):
+        for d in range(3):
+            assert store.get(f"t{n}-{d}") == ("2025-01-01 07:00:19", 19)
+    assert not [name for name in os.listdir(data_dir) if name.endswith('.tmp')]
+
+
+def test_concurrent_processes_keep_every_device(data_dir):
+    path = os.path.join(data_dir, 'watermarks.json')
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=write_marks, args=(path, [f"p{n}-{d}" for d in range(3)], 15))
+                 for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    store = WatermarkStore(path)
+    for n in range(4):
+        for d in range(3):
+            assert store.get(f"p{n}-{d}") == ("2025-01-01 07:00:14", 14)
+    assert not [name for name in os.listdir(data_dir) if name.endswith('.tmp')]
+
+
+def test_store_is_shared_by_the_process(data_dir):
+    store = get_watermark_store()
+    assert get_watermark_store() is store
+    assert store.path == os.path.join(data_dir, 'watermarks.json')
+    assert watermark._store is store
+
+
+def test_reads_marks_advanced_by_another_store(data_dir):
+    service, other = WatermarkStore(), WatermarkStore()
+    service.update(1, "2025-01-01 08:00:00", 1)
+    assert service.get(2) is None
+
+    # Otro proceso (p. ej. main2.py --silent) avanza las marcas después
+    other.update(1, "2025-01-01 09:00:00", 2)
+    other.update(2, "2025-01-01 09:00:00", 3)
+
+    assert service.get(1) == ("2025-01-01 09:00:00", 2)
+    assert service.get(2) == ("2025-01-01 09:00:00", 3)
+    other.reset(2)
+    assert service.get(2) is None
@@ -0,0 +1,138 @@
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+
+from services import wsgi_server
+from services.wsgi_server import create_server
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path == '/slow':
+        time.sleep(0.5)
+    if path == '/echo':
+        body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+    else:
+        # No lee el cuerpo de la petición
+        body = path.encode()
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+@pytest.fixture
+def server(settings):
+    settings['server'].update(workers=2, max_connections=8, keepalive=2)
+    http_server = create_server(app, '127.0.0.1', 0, 'production')
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    assert http_server.wait_serving(2)
+    yield http_server
+    http_server.drain(2)
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def connect(server):
+    return http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+
+
+def get(connection, path, method='GET', body=None):
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def test_keepalive_reuses_the_connection(server):
+    connection = connect(server)
+    assert get(connection, '/a') == (200, b'/a')
+    sock = connection.sock
+    assert get(connection, '/b') == (200, b'/b')
+    assert connection.sock is sock
+    assert server.stats()['open_connections'] == 1
+
+
+def test_unread_request_body_does_not_break_the_next_request(server):
+    connection = connect(server)
+    assert get(connection, '/ignored', 'POST', b'x' * 100000) == (200, b'/ignored')
+    assert get(connection, '/echo', 'POST', b'hola') == (200, b'hola')
+
+
+def test_oversized_headers_are_rejected(server):
+    connection = connect(server)
+    connection.putrequest('GET', '/')
+    connection.putheader('X-Big', 'a' * 300000)
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status in (400, 431)
+    # El servidor sigue atendiendo
+    assert get(connect(server), '/ok') == (200, b'/ok')
+
+
+def test_idle_keepalive_connections_are_closed(settings):
+    settings['server'].update(keepalive=1)
+    http_server = create_server(app, '127.0.0.1', 0, 'production')
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    http_server.wait_serving(2)
+    try:
+        connection = connect(http_server)
+        get(connection, '/a')
+        deadline = time.time() + 5
+        while http_server.stats()['open_connections'] and time.time() < deadline:
+            time.sleep(0.1)
+        assert http_server.stats()['open_connections'] == 0
+    finally:
+        http_server.drain(2)
+
+
+def test_drain_finishes_requests_in_flight_and_stops_accepting(server):
+    result = {}
+
+    def slow_request():
+        result['response'] = get(connect(server), '/slow')
+
+    thread = threading.Thread(target=slow_request)
+    thread.start()
+    time.sleep(0.2)
+
+    assert server.drain(5) is True
+    thread.join(5)
+    assert result['response'] == (200, b'/slow')
+    with pytest.raises(OSError):
+        socket.create_connection(('127.0.0.1', server.server_address[1]), timeout=1)
+
+
+def test_drain_reports_requests_that_did_not_finish(server):
+    def slow_request():
+        try:
+            get(connect(server), '/slow')
+        except OSError:
+            # La conexión se corta al terminar el cierre
+            pass
+
+    threading.Thread(target=slow_request, daemon=True).start()
+    time.sleep(0.2)
+    assert server.drain(0.1) is False
+
+
+def test_drain_without_serving(settings):
+    http_server = create_server(app, '127.0.0.1', 0, 'production')
+    assert http_server.drain(1) is True
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_server(app, '127.0.0.1', 0, 'gunicorn')
+
+
+def test_production_falls_back_to_dev_without_waitress(monkeypatch):
+    monkeypatch.setattr(wsgi_server, 'WAITRESS_AVAILABLE', False)
+    messages = []
+
+    http_server = create_server(app, '127.0.0.1', 0, log=messages.append)
+
+    assert http_server.stats()['backend'] == 'dev'
+    assert 'waitress' in messages[0]
+    http_server._server.server_close()
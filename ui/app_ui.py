@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from services.zkteco import Zkteco
-import requests
+from services.http_client import get_http_client
+from ui.device_tasks import DeviceTaskRunner
+from ui.paged_table import PagedTable
 
 class MainWindow:
     def __init__(self):
@@ -43,10 +45,12 @@ class MainWindow:
 
         connect_btn = ttk.Button(device_frame, text="Conectar", command=self.connect_device)
         connect_btn.grid(row=0, column=4, padx=10)
+        self.device_buttons = [connect_btn]
 
         # ----- Notebook (Pestañas) -----
         notebook = ttk.Notebook(frame)
         notebook.pack(fill="both", expand=True, pady=10)
+        self.notebook = notebook
 
         # ----- Tab 1: Acciones -----
         actions_tab = ttk.Frame(notebook)
@@ -63,101 +67,169 @@ class MainWindow:
 
         btn_att = ttk.Button(actions_tab, text="Listar Asistencias", command=self.get_attendance)
         btn_att.grid(row=0, column=3, padx=10, pady=10)
+        self.device_buttons += [btn_status, btn_users, btn_att]
 
         # Text box de logs
         self.log_text = tk.Text(actions_tab, height=15, width=110, wrap="word", state="disabled")
         self.log_text.grid(row=1, column=0, columnspan=4, padx=10, pady=10)
 
         # ----- Tab 2: Usuarios -----
-        users_tab = ttk.Frame(notebook)
-        notebook.add(users_tab, text="Usuarios")
+        self.users_tab = ttk.Frame(notebook)
+        notebook.add(self.users_tab, text="Usuarios")
 
-        self.users_tree = ttk.Treeview(users_tab, columns=("id", "name", "privilege"), show="headings", height=20)
-        self.users_tree.heading("id", text="ID")
-        self.users_tree.heading("name", text="Nombre")
-        self.users_tree.heading("privilege", text="Privilegio")
-        self.users_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        # Tablas paginadas: solo la página visible existe en el Treeview
+        self.users_table = PagedTable(self.users_tab, ("id", "name", "privilege"), ("ID", "Nombre", "Privilegio"),
+                                      user_column=0)
+        self.users_table.pack(fill="both", expand=True)
+        self.users_tree = self.users_table.tree
 
         # ----- Tab 3: Asistencias -----
-        att_tab = ttk.Frame(notebook)
-        notebook.add(att_tab, text="Asistencias")
-
-        self.att_tree = ttk.Treeview(att_tab, columns=("user_id", "timestamp", "status"), show="headings", height=20)
-        self.att_tree.heading("user_id", text="Usuario")
-        self.att_tree.heading("timestamp", text="Fecha / Hora")
-        self.att_tree.heading("status", text="Estado")
-        self.att_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.att_tab = ttk.Frame(notebook)
+        notebook.add(self.att_tab, text="Asistencias")
+
+        self.att_table = PagedTable(self.att_tab, ("user_id", "timestamp", "status"), ("Usuario", "Fecha / Hora", "Estado"),
+                                    formatters={1: lambda ts: ts.strftime("%Y-%m-%d %H:%M:%S") if ts else ""},
+                                    user_column=0, date_column=1)
+        self.att_table.pack(fill="both", expand=True)
+        self.att_tree = self.att_table.tree
+
+        # ----- Barra de estado: operación en curso con el dispositivo -----
+        status_bar = ttk.Frame(self.root, padding=(20, 0, 20, 10))
+        status_bar.pack(fill="x", side="bottom")
+        self.busy_var = tk.StringVar(value="Listo")
+        ttk.Label(status_bar, textvariable=self.busy_var).pack(side="left")
+        self.cancel_btn = ttk.Button(status_bar, text="Cancelar", command=self.cancel_device_task, state="disabled")
+        self.cancel_btn.pack(side="right")
+        self.progress = ttk.Progressbar(status_bar, mode="indeterminate", length=200)
+        self.progress.pack(side="right", padx=10)
+
+        # Las operaciones con el dispositivo corren en segundo plano; los resultados llegan por after()
+        self.tasks = DeviceTaskRunner(self.root, on_change=self._show_task)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
     # ---- Métodos ----
     def check_flask(self):
         try:
-            r = requests.get("http://127.0.0.1:5000/")
+            r = get_http_client().get("http://127.0.0.1:5000/", timeout=5)
             self.log(f"Flask: {r.json()['message']}")
             messagebox.showinfo("Respuesta Flask", r.json()["message"])
         except Exception as e:
             self.log(f"Error Flask: {e}")
             messagebox.showerror("Error", f"No se pudo conectar: {e}")
 
+    # ---- Operaciones con el dispositivo (en segundo plano) ----
+    def _run_device_task(self, name, func, on_done):
+        if self.tasks.busy:
+            self.log(f"Espere a que termine: {self.tasks.current.name}")
+            return
+        self.tasks.submit(name, func, on_done, on_error=lambda e: self.log(f"Excepción en UI ({name}): {e}"))
+
+    def _show_task(self, task, message):
+        """Indicador de operación en curso (se llama en el hilo de Tk)"""
+        if task is None:
+            self.busy_var.set("Listo")
+            self.progress.stop()
+            self.cancel_btn.config(state="disabled")
+            state = "normal"
+        else:
+            self.busy_var.set(f"{task.name}: {message}" if message else f"{task.name}...")
+            self.progress.start(15)
+            self.cancel_btn.config(state="normal")
+            state = "disabled"
+        for button in self.device_buttons:
+            button.config(state=state)
+
+    def cancel_device_task(self):
+        task = self.tasks.current
+        if task:
+            task.cancel()
+            self.log(f"{task.name}: cancelado")
+
     def connect_device(self):
         ip = self.ip_entry.get().strip()
-        port = int(self.port_entry.get().strip())
-        self.service = Zkteco(ip, port)
-        ok, msg = self.service.connect()
-        self.log(msg)
+        try:
+            port = int(self.port_entry.get().strip())
+        except ValueError:
+            self.log("Puerto inválido")
+            return
+        service = Zkteco(ip, port)
+
+        def done(result):
+            ok, msg = result
+            # Con una conexión fallida se conserva la sesión anterior (si la había)
+            if ok:
+                self.service = service
+            self.log(msg)
+
+        self._run_device_task("Conectando", lambda task: service.connect(), done)
 
     def get_device_status(self):
         if not self.service:
             self.log("Advertencia, Debes conectar primero")
             return
-        ok, result = self.service.get_status()
-        if ok:
-            info = "\n".join([f"{k}: {v}" for k, v in result.items()])
-            self.log(f"Estado del dispositivo: {info}")
-        else:
-            self.log(f"Error: {result}")
 
-    def get_users(self):
-        try:
-            success, result = self.service.get_users()
-            if success:
-                self.log("Usuarios obtenidos correctamente ✅")
-                if not result:
-                    self.log("No hay usuarios registrados en el dispotivo")
-                    return
-                formatted = []
-                for u in result:
-                    user_id = getattr(u, "user_id", None)
-                    name = getattr(u, "name", "Sin Nobre")
-                    privilege= getattr(u, "privilege", "N/A")
-            
-                    line = f"ID: {user_id} | Nombre: {name} | Privilegio: {privilege}"
-                    self.log(line)
-                    formatted.append(line)
+        def done(result):
+            ok, result = result
+            if ok:
+                info = "\n".join([f"{k}: {v}" for k, v in result.items()])
+                self.log(f"Estado del dispositivo: {info}")
             else:
                 self.log(f"Error: {result}")
-        except Exception as e:
-            self.log(f"Excepción en UI al obtener usuarios: {e}")
+
+        self._run_device_task("Obteniendo estado", lambda task: self.service.get_status(), done)
+
+    def get_users(self):
+        if not self.service:
+            self.log("Advertencia, Debes conectar primero")
+            return
+        service = self.service
+
+        def fetch(task):
+            success, result = service.get_users()
+            if not success:
+                return success, result
+            # La conversión a filas también se hace fuera del hilo de Tk
+            return True, [(getattr(u, "user_id", None), getattr(u, "name", "Sin Nombre"),
+                           getattr(u, "privilege", "N/A")) for u in result]
+
+        def done(result):
+            success, rows = result
+            if not success:
+                self.log(f"Error: {rows}")
+                return
+            self.log("Usuarios obtenidos correctamente ✅")
+            if not rows:
+                self.log("No hay usuarios registrados en el dispotivo")
+                return
+            self.users_table.set_rows(rows)
+            self.notebook.select(self.users_tab)
+            self.log(f"{len(rows)} usuarios cargados en la pestaña Usuarios")
+
+        self._run_device_task("Obteniendo usuarios", fetch, done)
 
     def get_attendance(self):
-        try:
-            success, result = self.service.get_attendance()
-            if success:
-                if not result:
-                    self.log("No hay asistencias registradas en el dispotivo")
-                    return
-                formatted = []
-                for a in result:
-                    user_id = getattr(a, "user_id", None)
-                    timestamp = getattr(a, "timestamp", None)
-                    status = getattr(a, "status", "-")
-
-                    line = f"ID: {user_id} | Fecha: {timestamp} | Estado: {status}"
-                    self.log(line)
-                    formatted.append(line)
-            else:
-                self.log(f"Error: {result}")
-        except Exception as e:
-            self.log(f"Excepción en UI al obtener asistencias: {e}")
+        if not self.service:
+            self.log("Advertencia, Debes conectar primero")
+            return
+        service = self.service
+
+        def fetch(task):
+            return service.get_attendance_rows(cancel_event=task.cancel_event,
+                                               progress=lambda count: task.progress(f"{count} registros descargados"))
+
+        def done(result):
+            success, rows = result
+            if not success:
+                self.log(f"Error: {rows}")
+                return
+            if not rows:
+                self.log("No hay asistencias registradas en el dispotivo")
+                return
+            self.att_table.set_rows(rows)
+            self.notebook.select(self.att_tab)
+            self.log(f"{len(rows)} asistencias cargadas en la pestaña Asistencias")
+
+        self._run_device_task("Descargando asistencias", fetch, done)
 
     def log(self, text):
         self.log_text.config(state="normal")
@@ -210,5 +282,9 @@ class MainWindow:
         else:
             self.set_light_mode()
 
+    def close(self):
+        self.tasks.shutdown()
+        self.root.destroy()
+
     def run(self):
         self.root.mainloop()
\ No newline at end of file
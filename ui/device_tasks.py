@@ -0,0 +1,116 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DeviceTask:
+    """Operación con el dispositivo en curso; `cancel_event` lo revisa la propia operación"""
+
+    def __init__(self, name, runner):
+        self.name = name
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._runner = runner
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def progress(self, message):
+        """Informa el avance (se puede llamar desde el hilo de trabajo)"""
+        self._runner._events.put((self, 'progress', message))
+
+    def cancel(self):
+        self.cancel_event.set()
+        # Si todavía no empezó, no llegará a ejecutarse y nadie más la retirará de la lista
+        if self.future is not None and self.future.cancel():
+            self._runner._events.put((self, 'cancelled', None))
+
+
+class DeviceTaskRunner:
+    """Ejecuta las operaciones con el dispositivo fuera del hilo de Tk.
+
+    Las operaciones corren de a una (comparten la conexión) en un hilo de trabajo; sus
+    resultados, errores y avances pasan por una cola que el hilo de Tk revisa con after(),
+    así los callbacks pueden tocar widgets. Una operación cancelada sigue hasta el próximo
+    punto en que revisa `cancel_event`, pero su resultado se descarta.
+    """
+
+    def __init__(self, root, on_change=None, interval=50):
+        self.root = root
+        self.on_change = on_change or (lambda task, message: None)
+        self.interval = interval
+        self.active = []
+        self._events = queue.Queue()
+        self._callbacks = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='device')
+        self._closed = False
+        self.root.after(self.interval, self._poll)
+
+    @property
+    def busy(self):
+        return bool(self.active)
+
+    def submit(self, name, func, on_done, on_error=None, on_progress=None):
+        """Ejecuta `func(task)` en segundo plano; `on_done(resultado)` se llama en el hilo de Tk"""
+        task = DeviceTask(name, self)
+        self._callbacks[task] = (on_done, on_error, on_progress)
+        self.active.append(task)
+
+        def run():
+            if task.cancelled:
+                self._events.put((task, 'cancelled', None))
+                return
+            try:
+                result = func(task)
+            except Exception as e:
+                self._events.put((task, 'error', e))
+            else:
+                self._events.put((task, 'done', result))
+
+        task.future = self._executor.submit(run)
+        self.on_change(self.current, None)
+        return task
+
+    @property
+    def current(self):
+        return self.active[0] if self.active else None
+
+    def cancel_all(self):
+        for task in list(self.active):
+            task.cancel()
+
+    def shutdown(self):
+        """Cancela lo pendiente sin esperar a la operación en curso (el hilo es de fondo)"""
+        self._closed = True
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        try:
+            while True:
+                task, kind, value = self._events.get_nowait()
+                self._dispatch(task, kind, value)
+        except queue.Empty:
+            pass
+        if not self._closed:
+            self.root.after(self.interval, self._poll)
+
+    def _dispatch(self, task, kind, value):
+        on_done, on_error, on_progress = self._callbacks.get(task, (None, None, None))
+        if kind == 'progress':
+            if not task.cancelled:
+                if on_progress:
+                    on_progress(value)
+                self.on_change(task, value)
+            return
+
+        self._callbacks.pop(task, None)
+        if task in self.active:
+            self.active.remove(task)
+        if not task.cancelled:
+            if kind == 'done' and on_done:
+                on_done(value)
+            elif kind == 'error' and on_error:
+                on_error(value)
+        self.on_change(self.current, None)
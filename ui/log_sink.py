@@ -0,0 +1,65 @@
+import collections
+import os
+
+
+class TextLogSink:
+    """Log de un tk.Text que se puede alimentar desde cualquier hilo.
+
+    `write()` solo encola la línea; el hilo de Tk vuelca todo lo acumulado cada `interval`
+    ms con una sola inserción. El widget conserva las últimas `max_lines` líneas (las
+    anteriores se descartan) y, si se indica `path`, el log completo se agrega a ese archivo.
+    """
+
+    def __init__(self, root, text, max_lines=2000, interval=50, path=None):
+        self.root = root
+        self.text = text
+        self.max_lines = max_lines
+        self.interval = interval
+        self._pending = collections.deque()
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+        self._closed = False
+        self.root.after(self.interval, self._flush)
+
+    def write(self, line):
+        """Encola una línea (sin salto final); seguro desde cualquier hilo"""
+        self._pending.append(line)
+
+    def clear(self):
+        self._pending.clear()
+        self.text.delete('1.0', 'end')
+
+    def _drain(self):
+        lines = []
+        pending = self._pending
+        while pending:
+            lines.append(pending.popleft())
+        return lines
+
+    def _flush(self):
+        lines = self._drain()
+        if lines:
+            if self._file is not None:
+                self._file.write('\n'.join(lines) + '\n')
+                self._file.flush()
+            # De una ráfaga grande solo se muestran las últimas líneas que caben en el widget
+            visible = lines[-self.max_lines:]
+            self.text.insert('end', '\n'.join(visible) + '\n')
+            excess = int(self.text.index('end-1c').split('.')[0]) - 1 - self.max_lines
+            if excess > 0:
+                self.text.delete('1.0', f'{excess + 1}.0')
+            self.text.see('end')
+        if not self._closed:
+            self.root.after(self.interval, self._flush)
+
+    def close(self):
+        """Escribe lo pendiente en el archivo y deja de volcar al widget"""
+        self._closed = True
+        lines = self._drain()
+        if self._file is not None:
+            if lines:
+                self._file.write('\n'.join(lines) + '\n')
+            self._file.close()
+            self._file = None
@@ -0,0 +1,244 @@
+import bisect
+import tkinter as tk
+from datetime import datetime, timedelta
+from tkinter import ttk
+
+
+def _sort_value(value):
+    """Clave de orden estable para valores mezclados (IDs numéricos como texto, None)"""
+    if value is None:
+        return (2, 0)
+    if isinstance(value, str):
+        return (0, int(value)) if value.isdigit() else (1, value.lower())
+    if isinstance(value, datetime):
+        return (0, value.timestamp())
+    return (0, value)
+
+
+class TableIndex:
+    """Filas en memoria con índices para filtrar por usuario o fecha y ordenar por columna.
+
+    Las consultas retornan posiciones de `rows`; los órdenes completos y los índices por
+    usuario y por fecha se construyen la primera vez que se piden y se reutilizan.
+    """
+
+    def __init__(self, rows, user_column=None, date_column=None):
+        self.rows = rows
+        self.user_column = user_column
+        self.date_column = date_column
+        self._orders = {}
+        self._by_user = None
+        self._by_date = None
+        self._dates = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _user_index(self):
+        if self._by_user is None:
+            by_user = {}
+            column = self.user_column
+            for position, row in enumerate(self.rows):
+                by_user.setdefault(str(row[column]), []).append(position)
+            self._by_user = by_user
+        return self._by_user
+
+    def _date_index(self):
+        if self._by_date is None:
+            column = self.date_column
+            rows = self.rows
+            self._by_date = sorted((p for p in range(len(rows)) if rows[p][column] is not None),
+                                   key=lambda p: rows[p][column])
+            self._dates = [rows[p][column] for p in self._by_date]
+        return self._by_date, self._dates
+
+    def _sorted(self, column, reverse):
+        order = self._orders.get((column, reverse))
+        if order is None:
+            rows = self.rows
+            order = sorted(range(len(rows)), key=lambda p: _sort_value(rows[p][column]), reverse=reverse)
+            self._orders[(column, reverse)] = order
+        return order
+
+    def query(self, user=None, start=None, end=None, sort_column=None, reverse=False):
+        """Posiciones de las filas que cumplen los filtros, en el orden pedido.
+
+        `start` es inclusivo y `end` exclusivo; sin `sort_column` se conserva el orden original.
+        """
+        rows = self.rows
+        positions = None
+        if user and self.user_column is not None:
+            positions = self._user_index().get(str(user), [])
+
+        if (start or end) and self.date_column is not None:
+            column = self.date_column
+            if positions is not None:
+                positions = [p for p in positions if rows[p][column] is not None
+                             and (not start or rows[p][column] >= start) and (not end or rows[p][column] < end)]
+            else:
+                by_date, dates = self._date_index()
+                low = bisect.bisect_left(dates, start) if start else 0
+                high = bisect.bisect_left(dates, end) if end else len(dates)
+                positions = sorted(by_date[low:high])
+
+        if sort_column is None:
+            return range(len(rows)) if positions is None else positions
+        if positions is None:
+            return self._sorted(sort_column, reverse)
+        return sorted(positions, key=lambda p: _sort_value(rows[p][sort_column]), reverse=reverse)
+
+
+class PagedTable:
+    """Treeview paginado: solo se crean los ítems de la página visible, en tandas con after().
+
+    Las filas completas quedan en un TableIndex; filtrar, ordenar (clic en el encabezado) o
+    cambiar de página solo recalcula posiciones y vuelve a llenar la página.
+    """
+
+    def __init__(self, parent, columns, headings, formatters=None, user_column=None, date_column=None,
+                 page_size=500, batch_size=100):
+        self.columns = columns
+        self.headings = headings
+        self.formatters = formatters or {}
+        self.user_column = user_column
+        self.date_column = date_column
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.index = TableIndex([], user_column, date_column)
+        self.view = range(0)
+        self.page = 0
+        self.sort_column = None
+        self.reverse = False
+        self._job = None
+
+        self.frame = ttk.Frame(parent)
+
+        # Filtros
+        toolbar = ttk.Frame(self.frame)
+        toolbar.pack(fill="x", padx=10, pady=(10, 0))
+        self.user_var = tk.StringVar()
+        self.start_var = tk.StringVar()
+        self.end_var = tk.StringVar()
+        if user_column is not None:
+            ttk.Label(toolbar, text="Usuario:").pack(side="left")
+            user_entry = ttk.Entry(toolbar, textvariable=self.user_var, width=10)
+            user_entry.pack(side="left", padx=(5, 10))
+            user_entry.bind("<Return>", lambda event: self.apply())
+        if date_column is not None:
+            ttk.Label(toolbar, text="Desde (AAAA-MM-DD):").pack(side="left")
+            start_entry = ttk.Entry(toolbar, textvariable=self.start_var, width=12)
+            start_entry.pack(side="left", padx=(5, 10))
+            start_entry.bind("<Return>", lambda event: self.apply())
+            ttk.Label(toolbar, text="Hasta:").pack(side="left")
+            end_entry = ttk.Entry(toolbar, textvariable=self.end_var, width=12)
+            end_entry.pack(side="left", padx=(5, 10))
+            end_entry.bind("<Return>", lambda event: self.apply())
+        if user_column is not None or date_column is not None:
+            ttk.Button(toolbar, text="Filtrar", command=self.apply).pack(side="left")
+            ttk.Button(toolbar, text="Limpiar", command=self.clear_filters).pack(side="left", padx=5)
+
+        # Tabla
+        table_frame = ttk.Frame(self.frame)
+        table_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=20)
+        for position, column in enumerate(columns):
+            self.tree.heading(column, text=headings[position], command=lambda p=position: self.sort_by(p))
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # Paginación
+        pager = ttk.Frame(self.frame)
+        pager.pack(fill="x", padx=10, pady=(0, 10))
+        ttk.Button(pager, text="◀", width=3, command=lambda: self.show_page(self.page - 1)).pack(side="left")
+        ttk.Button(pager, text="▶", width=3, command=lambda: self.show_page(self.page + 1)).pack(side="left", padx=5)
+        self.status_var = tk.StringVar(value="Sin datos")
+        ttk.Label(pager, textvariable=self.status_var).pack(side="left", padx=10)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    # --- Datos ---
+    def set_rows(self, rows):
+        """Reemplaza las filas (tuplas en el orden de `columns`) y muestra la primera página"""
+        self.index = TableIndex(rows, self.user_column, self.date_column)
+        self.apply()
+
+    @staticmethod
+    def _parse_date(text):
+        text = text.strip()
+        return datetime.strptime(text, "%Y-%m-%d") if text else None
+
+    def apply(self):
+        """Aplica filtros y orden actuales y vuelve a la primera página"""
+        try:
+            start = self._parse_date(self.start_var.get())
+            end = self._parse_date(self.end_var.get())
+        except ValueError:
+            self.status_var.set("Fecha inválida: use AAAA-MM-DD")
+            return
+        if end:
+            # "Hasta" incluye el día completo
+            end += timedelta(days=1)
+        self.view = self.index.query(user=self.user_var.get().strip() or None, start=start, end=end,
+                                     sort_column=self.sort_column, reverse=self.reverse)
+        self.show_page(0)
+
+    def clear_filters(self):
+        self.user_var.set("")
+        self.start_var.set("")
+        self.end_var.set("")
+        self.apply()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.reverse = not self.reverse
+        else:
+            self.sort_column, self.reverse = column, False
+        for position, name in enumerate(self.columns):
+            arrow = (" ▼" if self.reverse else " ▲") if position == column else ""
+            self.tree.heading(name, text=self.headings[position] + arrow)
+        self.apply()
+
+    # --- Página visible ---
+    def pages(self):
+        return max((len(self.view) + self.page_size - 1) // self.page_size, 1)
+
+    def show_page(self, page):
+        page = min(max(page, 0), self.pages() - 1)
+        if self._job is not None:
+            self.tree.after_cancel(self._job)
+            self._job = None
+        self.page = page
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.tree.yview_moveto(0)
+
+        start = page * self.page_size
+        end = min(start + self.page_size, len(self.view))
+        total = len(self.view)
+        if total:
+            self.status_var.set(f"Página {page + 1} de {self.pages()} · filas {start + 1}-{end} de {total}"
+                                f" ({len(self.index)} en total)")
+        else:
+            self.status_var.set("Sin resultados" if len(self.index) else "Sin datos")
+        self._insert_batch(start, end)
+
+    def _format(self, row):
+        formatters = self.formatters
+        return tuple(formatters[i](value) if i in formatters else ("" if value is None else value)
+                     for i, value in enumerate(row))
+
+    def _insert_batch(self, start, end):
+        """Inserta una tanda y agenda la siguiente, para que la ventana siga respondiendo"""
+        stop = min(start + self.batch_size, end)
+        rows = self.index.rows
+        insert = self.tree.insert
+        for position in self.view[start:stop]:
+            insert("", "end", values=self._format(rows[position]))
+        if stop < end:
+            self._job = self.tree.after(1, self._insert_batch, stop, end)
+        else:
+            self._job = None
@@ -0,0 +1,378 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import os
+import threading
+from datetime import datetime
+
+from services.attendance_batch import AttendanceBatch
+from services.attendance_store import get_attendance_store
+from services.config import get_base_dir, get_settings
+from services.dedup import get_dedup_index
+from services.outbox import OutboxDrainer, get_outbox
+from ui.log_sink import TextLogSink
+
+try:
+    from services.zkteco import device_pool
+    ZK_AVAILABLE = True
+except ImportError:
+    ZK_AVAILABLE = False
+
+
+class ZKTecoApp:
+    def __init__(self, root, system_params=None):
+        self.root = root
+        self.root.title("ZKTeco Sync v1.1 - Solo Asistencias")
+        self.root.resizable(True, True)
+        self.root.resizable(False, False)
+        
+        self.connection = None
+        self.device = None
+        self.is_connected = False
+        
+        self.system_params = system_params
+        
+        self.device_info = None
+        self.current_device_id = None
+        
+        self.setup_ui()
+        
+        if not ZK_AVAILABLE:
+            self.log("ADVERTENCIA: Librería 'pyzk' no encontrada.")
+            self.log("Instalar con: pip install pyzk")
+
+    def setup_ui(self):
+        # ... [El resto del código de `setup_ui` se mantiene sin cambios] ...
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        if self.system_params:
+            self.device_info = {
+                'id': self.system_params.get('id'),
+                'name': self.system_params.get('name', ''),
+                'ip_address': self.system_params.get('ip_address', ''),
+                'port': self.system_params.get('port', 4370)
+            }
+            self.current_device_id = self.device_info['id']
+
+        config_frame = ttk.LabelFrame(main_frame, text="Configuración de Conexión", padding="10")
+        config_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        if self.system_params:
+            labels_data = [
+                ("Dispositivo:", self.device_info['name']),
+                ("IP:", self.device_info['ip_address']),
+                ("Puerto:", str(self.device_info['port']))
+            ]
+            
+            for i, (label_text, value_text) in enumerate(labels_data):
+                ttk.Label(config_frame, text=label_text).grid(row=i, column=0, sticky=tk.W, padx=(0, 10))
+                value_label = ttk.Label(config_frame, text=value_text, font=('Arial', 9, 'bold') if i == 0 else None)
+                value_label.grid(row=i, column=1, sticky=tk.W)
+        else:
+            error_label = ttk.Label(config_frame, text="No se puede continuar sin parámetros del dispositivo", foreground='red')
+            error_label.grid(row=0, column=0, columnspan=2)
+
+        ttk.Label(config_frame, text="Timeout (s):").grid(row=3, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.timeout_var = tk.StringVar(value="5")
+        timeout_entry = ttk.Entry(config_frame, textvariable=self.timeout_var, width=10)
+        timeout_entry.grid(row=3, column=1, sticky=tk.W, pady=(10, 0))
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=1, column=0, columnspan=2, pady=(0, 10))
+        
+        button_state = "normal" if self.system_params else "disabled"
+        
+        self.test_btn = ttk.Button(button_frame, text="Probar Conexión", command=self.test_connection, state=button_state)
+        self.test_btn.grid(row=0, column=0, padx=(0, 10))
+        
+        self.connect_btn = ttk.Button(button_frame, text="Conectar", command=self.connect_device, state=button_state)
+        self.connect_btn.grid(row=0, column=1, padx=(0, 10))
+        
+        self.disconnect_btn = ttk.Button(button_frame, text="Desconectar", command=self.disconnect_device, state="disabled")
+        self.disconnect_btn.grid(row=0, column=2)
+        
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=2, column=0, columnspan=2, pady=(0, 10))
+        
+        ttk.Label(status_frame, text="Estado:").grid(row=0, column=0, padx=(0, 10))
+        self.status_var = tk.StringVar(value="Desconectado")
+        self.status_label = ttk.Label(status_frame, textvariable=self.status_var, foreground="red")
+        self.status_label.grid(row=0, column=1)
+        
+        data_frame = ttk.LabelFrame(main_frame, text="Extracción y Sincronización", padding="10")
+        data_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        self.extract_attendance_btn = ttk.Button(data_frame, text="Extraer y Enviar Asistencias", command=self.extract_attendance, state="disabled")
+        self.extract_attendance_btn.grid(row=0, column=0)
+        
+        log_frame = ttk.LabelFrame(main_frame, text="Log de Eventos", padding="10")
+        log_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        
+        log_scroll_frame = ttk.Frame(log_frame)
+        log_scroll_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        self.log_text = tk.Text(log_scroll_frame, height=15, width=70)
+        scrollbar = ttk.Scrollbar(log_scroll_frame, orient="vertical", command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=scrollbar.set)
+        
+        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+        # Los mensajes de los hilos de trabajo se acumulan y se vuelcan una vez por cuadro
+        settings = get_settings('ui')
+        log_file = settings['log_file']
+        self.log_sink = TextLogSink(
+            self.root, self.log_text,
+            max_lines=settings['log_max_lines'],
+            interval=settings['log_flush_ms'],
+            path=os.path.join(get_base_dir(), log_file) if log_file else None,
+        )
+        
+        ttk.Button(log_frame, text="Limpiar Log", command=self.clear_log).grid(row=1, column=0, pady=(10, 0))
+        
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(4, weight=1)
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(0, weight=1)
+        log_scroll_frame.columnconfigure(0, weight=1)
+        log_scroll_frame.rowconfigure(0, weight=1)
+        
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        
+        self.log("Aplicación iniciada - Solo sincronización de asistencias")
+        
+        if ZK_AVAILABLE:
+            self.log("Librería ZK cargada correctamente")
+        else:
+            self.log("ADVERTENCIA: Instalar con 'pip install pyzk requests'")
+        
+        if self.system_params:
+            self.log(f"✓ Dispositivo configurado: {self.device_info['name']} ({self.device_info['ip_address']}:{self.device_info['port']})")
+        else:
+            self.log("✗ No se recibieron parámetros del sistema")
+
+    def log(self, message):
+        """Agregar mensaje al log con timestamp"""
+        sink = getattr(self, 'log_sink', None)
+        if sink is not None:
+            sink.write(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+        else:
+            print(f"[LOG] {message}")
+    
+    def clear_log(self):
+        """Limpiar el log"""
+        self.log_sink.clear()
+    
+    def test_connection(self):
+        """Probar conexión con el dispositivo"""
+        if not ZK_AVAILABLE:
+            messagebox.showerror("Error", "Librería pyzk no está instalada")
+            return
+            
+        if not self.system_params:
+            messagebox.showerror("Error", "No hay parámetros de dispositivo disponibles")
+            return
+            
+        def test_conn():
+            try:
+                self.test_btn.config(state="disabled")
+                self.log("Probando conexión...")
+                
+                ip = self.device_info['ip_address']
+                port = int(self.device_info['port'])
+                timeout = int(self.timeout_var.get())
+                
+                self.log(f"Conectando a {ip}:{port}")
+                
+                with device_pool.session(ip, port, timeout=timeout) as conn:
+                    try:
+                        attendance_count = len(conn.get_attendance())
+                        
+                        self.log("✓ Conexión exitosa!")
+                        self.log(f"  - Registros de asistencia: {attendance_count}")
+
+                        messagebox.showinfo("Éxito", "Conexión establecida correctamente")
+                    except Exception as e:
+                        self.log(f"✓ Conexión establecida (error obteniendo detalles: {str(e)})")
+                        messagebox.showinfo("Éxito", "Conexión establecida correctamente")
+
+            except Exception as e:
+                self.log(f"✗ Error de conexión: {str(e)}")
+                messagebox.showerror("Error", f"Error de conexión: {str(e)}")
+            finally:
+                self.test_btn.config(state="normal")
+        
+        threading.Thread(target=test_conn, daemon=True).start()
+    
+    def connect_device(self):
+        """Conectar al dispositivo"""
+        if not ZK_AVAILABLE:
+            messagebox.showerror("Error", "Librería pyzk no está instalada")
+            return
+            
+        if not self.system_params:
+            messagebox.showerror("Error", "No hay parámetros de dispositivo disponibles")
+            return
+            
+        def connect():
+            try:
+                self.connect_btn.config(state="disabled")
+                self.log("Conectando al dispositivo...")
+                
+                ip = self.device_info['ip_address']
+                port = int(self.device_info['port'])
+                timeout = int(self.timeout_var.get())
+                
+                # La sesión queda abierta en el pool compartido; aquí solo se valida
+                with device_pool.session(ip, port, timeout=timeout):
+                    self.connection = (ip, port)
+                
+                if self.connection:
+                    self.is_connected = True
+                    self.status_var.set("Conectado")
+                    self.status_label.config(foreground="green")
+                    
+                    self.extract_attendance_btn.config(state="normal")
+                    self.disconnect_btn.config(state="normal")
+                    
+                    self.log("✓ Dispositivo conectado exitosamente")
+                    messagebox.showinfo("Éxito", "Dispositivo conectado correctamente")
+                else:
+                    self.log("✗ Error: No se pudo conectar")
+                    messagebox.showerror("Error", "No se pudo conectar al dispositivo")
+                    
+            except Exception as e:
+                self.log(f"✗ Error de conexión: {str(e)}")
+                messagebox.showerror("Error", f"Error de conexión: {str(e)}")
+            finally:
+                if not self.is_connected:
+                    self.connect_btn.config(state="normal")
+        
+        threading.Thread(target=connect, daemon=True).start()
+    
+    def disconnect_device(self):
+        """Desconectar del dispositivo"""
+        try:
+            if self.connection:
+                device_pool.close(*self.connection)
+                self.connection = None
+                self.device = None
+                
+            self.is_connected = False
+            self.status_var.set("Desconectado")
+            self.status_label.config(foreground="red")
+            
+            self.extract_attendance_btn.config(state="disabled")
+            self.disconnect_btn.config(state="disabled")
+            self.connect_btn.config(state="normal")
+            
+            self.log("Dispositivo desconectado")
+            
+        except Exception as e:
+            self.log(f"Error al desconectar: {str(e)}")
+    
+    def extract_attendance(self):
+        """Extraer registros de asistencia y enviar a la nube"""
+        if not self.connection:
+            return
+            
+        def extract():
+            try:
+                self.extract_attendance_btn.config(state="disabled")
+                self.log("Extrayendo registros de asistencia...")
+                
+                with device_pool.session(*self.connection) as conn:
+                    attendance = conn.get_attendance()
+                
+                if attendance:
+                    device_id = self.device_info.get('id')
+                    attendance_data = AttendanceBatch.from_pyzk(attendance, device_id)
+                    
+                    self.log(f"✓ {len(attendance_data)} registros extraídos del dispositivo")
+                    stored = get_attendance_store().add(attendance_data)
+                    if stored:
+                        self.log(f"✓ {stored} registros nuevos guardados en el almacén local")
+
+                    # Omitir las marcaciones que la API ya confirmó en envíos anteriores
+                    dedup_keys, skipped = get_dedup_index().filter(attendance_data)
+                    if skipped:
+                        self.log(f"✓ {skipped} registros omitidos (ya enviados anteriormente)")
+                    # Ni las que ya esperan en la cola local de un intento anterior
+                    outbox = get_outbox()
+                    queued = outbox.pending_keys(device_id, dedup_keys) if dedup_keys else set()
+                    if queued:
+                        indexes = [i for i, key in enumerate(dedup_keys) if key not in queued]
+                        attendance_data.keep(indexes)
+                        dedup_keys = [dedup_keys[i] for i in indexes]
+                        self.log(f"✓ {len(queued)} registros ya estaban en la cola local")
+
+                    endpoint = 'http://localhost:8000/api/zkteco/attendance'
+                    # URL de producción
+                    #endpoint = 'https://sistemas.regionpuno.gob.pe/asiss-api/api/zkteco/attendance'
+
+                    # Primero a la cola local: si la API falla se reenvían luego, no se pierden
+                    if attendance_data:
+                        outbox.enqueue(endpoint, device_id, attendance_data.iter_json_rows(), dedup_keys)
+                        self.log(f"✓ {len(attendance_data)} registros guardados en la cola local")
+                    elif not queued:
+                        self.log("No hay registros nuevos para enviar")
+                        messagebox.showinfo("Información", "Todas las asistencias ya estaban sincronizadas")
+                        return
+
+                    cloud_success = self.send_data_to_cloud('attendance', device_id)
+
+                    if cloud_success:
+                        messagebox.showinfo("Éxito", "Asistencias sincronizadas correctamente")
+                        self.log("✓ Sincronización completada exitosamente")
+                    else:
+                        messagebox.showerror("Error", "No se pudo sincronizar las asistencias")
+                        
+                else:
+                    self.log("No se encontraron registros de asistencia")
+                    messagebox.showinfo("Información", "No se encontraron registros de asistencia en el dispositivo")
+                    
+            except Exception as e:
+                self.log(f"✗ Error extrayendo asistencias: {str(e)}")
+                messagebox.showerror("Error", f"Error extrayendo asistencias: {str(e)}")
+            finally:
+                self.extract_attendance_btn.config(state="normal")
+        
+        threading.Thread(target=extract, daemon=True).start()
+
+    def send_data_to_cloud(self, data_type, device_id):
+        """Drena hacia la API de Laravel los registros en cola del dispositivo, en lotes acotados"""
+        try:
+            outbox = get_outbox()
+            self.log(f"Enviando {data_type} a la nube...")
+            self.log(f"Cantidad de registros: {outbox.depth(device_id)}")
+
+            # Los lotes confirmados salen de la cola y quedan registrados en el índice de duplicados
+            totals = OutboxDrainer(outbox, log=self.log).drain_once(device_id)
+            pending = outbox.depth(device_id)
+
+            if not pending:
+                self.log(f"✓ {data_type.title()} enviados exitosamente ({totals['sent']} registros)")
+                return True
+            self.log(f"✗ {pending} registros quedan en la cola local; se reenviarán en el próximo envío "
+                     f"o desde el servicio")
+            return False
+
+        except Exception as e:
+            self.log(f"✗ Error enviando a la nube: {str(e)}")
+            return False
+
+
+def run(system_params=None):
+    """Abre la ventana de sincronización del dispositivo"""
+    root = tk.Tk()
+    app = ZKTecoApp(root, system_params)
+
+    def on_closing():
+        if app.is_connected:
+            app.disconnect_device()
+        app.log_sink.close()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
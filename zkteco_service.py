@@ -4,27 +4,60 @@ ZKTeco Service - Servicio de consola mejorado para instalación silenciosa
 Uso: 
     python zkteco_service.py start    - Iniciar servicio
     python zkteco_service.py stop     - Detener servicio
+    python zkteco_service.py start --server dev    - Usar el servidor de desarrollo de Werkzeug
+    python zkteco_service.py start --installer     - Modo instalador (sin consola); también ZKTECO_INSTALLER_MODE=1
+    python zkteco_service.py wait --timeout 30     - Esperar a que el servicio esté listo (código 0) o fallar (1)
+    python zkteco_service.py discover 192.168.1.0/24 [--port 4370]  - Buscar terminales ZKTeco en la red
 """
 
 import sys
 import time
+
+_STARTED = time.perf_counter()
+
 import signal
 import threading
 import requests
 import socket
 import os
-import subprocess
 import json
-from datetime import datetime, time as datetime_time
-from flask import Flask, jsonify, request
+from datetime import datetime
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import argparse
 import logging
 
+from services.attendance_store import get_attendance_store, time_bound
+from services.config import get_base_dir, get_data_dir, get_settings
+from services.dedup import get_dedup_index
+from services.device_registry import DeviceRegistry
+from services.discovery import SubnetScanner, expand_ranges
+from services.http_client import get_http_client
+from services.jobs import get_job_manager
+from services.logs import get_logger, log_event, logging_stats, start_logging, stop_logging
+from services.metrics import metrics
+from services.outbox import OutboxDrainer, get_outbox
+from services.scheduler import SyncScheduler
+from services.startup import StartupTimer
+from services.sync_engine import SyncEngine
+from services.wsgi_server import SERVER_BACKENDS, create_server
+
+# Variable de entorno con el modo: 1/true/yes (instalador) o 0/false/no (consola)
+INSTALLER_MODE_ENV = 'ZKTECO_INSTALLER_MODE'
+# Tiempo máximo de espera de cada componente al arrancar
+READY_TIMEOUT = 10
+
+
 class ZKTecoService:
-    def __init__(self):
+    def __init__(self, installer_mode=None):
+        self.startup = StartupTimer(_STARTED)
+        self.startup.mark('imports')
+        self.ready_event = threading.Event()
         self.flask_app = None
         self.flask_thread = None
+        self.http_server = None
+        # 'dev' o 'production'; None usa el valor de config/service.json
+        self.server_backend = None
         self.running = False
         self.port = 3322
         self.host = "127.0.0.1"
@@ -36,40 +69,62 @@ class ZKTecoService:
         # Configurar logging mínimo
         self.setup_logging()
         
-        # Detectar si estamos en un instalador
-        self.is_installer_mode = self.detect_installer_mode()
+        # Modo instalador: flag explícito, variable de entorno o detección guardada
+        self.is_installer_mode, self.installer_mode_source = self.detect_installer_mode(installer_mode)
         
         # --- PARTE AGREGADA: Configuración de la sincronización automática ---
         self.auto_sync_thread = None
+        self.scheduler = None
+        self.device_registry = None
         self.api_url_base = "http://localhost:8000/api/zkteco"
+        self.last_sync_summary = None
+        self.outbox_drainer = None
         # --- FIN DE LA PARTE AGREGADA ---
+        self.startup.mark('init')
         
-    def detect_installer_mode(self):
-        """Detectar si estamos siendo ejecutados desde un instalador"""
-        # Verificar variables de entorno del instalador
-        installer_vars = ['INNO_SETUP', 'SETUP_RUNNING', 'TEMP']
-        
-        # Si hay procesos de instalador ejecutándose
+    def detect_installer_mode(self, explicit=None):
+        """Retorna (modo instalador, origen): flag explícito, variable de entorno o detección.
+
+        La detección (archivos de instalación junto al ejecutable) se guarda en
+        data/installer_mode.json y solo se repite si cambia el directorio de la aplicación.
+        """
+        if explicit is not None:
+            return bool(explicit), 'flag'
+
+        value = os.environ.get(INSTALLER_MODE_ENV, '').strip().lower()
+        if value in ('1', 'true', 'yes', 'si', 'sí'):
+            return True, 'env'
+        if value in ('0', 'false', 'no'):
+            return False, 'env'
+
+        base_dir = get_base_dir()
         try:
-            import psutil
-            for proc in psutil.process_iter(['name']):
-                proc_name = proc.info['name'].lower()
-                if any(installer in proc_name for installer in ['setup', 'install', 'inno']):
-                    return True
-        except:
-            pass
-            
-        # Verificar si el directorio padre contiene archivos de instalación
+            signature = f"{base_dir}|{os.stat(base_dir).st_mtime_ns}"
+        except OSError:
+            signature = None
+        cache_path = os.path.join(get_data_dir(), 'installer_mode.json')
         try:
-            parent_dir = os.path.dirname(os.path.abspath(__file__))
-            files = os.listdir(parent_dir)
-            installer_files = [f for f in files if any(ext in f.lower() for ext in ['.iss', 'setup', 'install'])]
-            if installer_files:
-                return True
-        except:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if signature and cached.get('signature') == signature:
+                return bool(cached['installer_mode']), 'cache'
+        except (OSError, ValueError, KeyError, AttributeError):
             pass
-            
-        return False
+
+        # Archivos de instalación en el directorio de la aplicación
+        try:
+            files = os.listdir(base_dir)
+            detected = any(any(ext in f.lower() for ext in ['.iss', 'setup', 'install']) for f in files)
+        except OSError:
+            detected = False
+
+        if signature:
+            try:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump({'signature': signature, 'installer_mode': detected}, f)
+            except OSError:
+                pass
+        return detected, 'detected'
         
     def setup_logging(self):
         """Configurar logging básico"""
@@ -79,7 +134,8 @@ class ZKTecoService:
         
         # Configurar logger principal
         logging.basicConfig(level=logging.ERROR)
-        self.logger = logging.getLogger(__name__)
+        # Registros estructurados del servicio (logs/service.log, al iniciar con start_service)
+        self.logger = get_logger('service')
     
     def check_port_available(self, port):
         """Verificar si el puerto está disponible"""
@@ -94,117 +150,90 @@ class ZKTecoService:
     def _run_auto_sync_loop(self):
         """Bucle principal de la sincronización automática."""
         if not self.is_installer_mode:
-            print("✓ Sincronización automática activada. Programada para 12:00:00 y 00:00:00.")
-            
-        while not self.shutdown_event.is_set():
-            now = datetime.now()
-            
-            # Sincronización a las 12:00:00 (mediodía)
-            next_noon_sync = datetime.combine(now.date(), datetime_time(12, 0))
-            # Sincronización a las 00:00:00 (medianoche)
-            next_midnight_sync = datetime.combine(now.date(), datetime_time(0, 0))
-            
-            # Calcular la fecha de la próxima sincronización de mediodía y medianoche
-            if now > next_noon_sync:
-                # Si ya pasó mediodía, el próximo es a medianoche
-                next_sync_time = next_midnight_sync.replace(day=now.day + 1)
-            elif now > next_midnight_sync:
-                # Si ya pasó medianoche, el próximo es a mediodía
-                next_sync_time = next_noon_sync
-            else:
-                # Si el programa se inicia antes de medianoche
-                next_sync_time = next_midnight_sync
-
-            time_to_wait = (next_sync_time - now).total_seconds()
-
-            # Si el servicio se inicia muy cerca de una hora de sincronización,
-            # forzar la ejecución en unos segundos.
-            if time_to_wait < 60:
-                time_to_wait = 5
-
-            if not self.is_installer_mode:
-                print(f"Próxima sincronización programada para las {next_sync_time.strftime('%H:%M:%S')}. Esperando {int(time_to_wait)} segundos.")
+            print("✓ Sincronización automática activada (programación por dispositivo).")
             
-            # Esperar hasta la próxima sincronización o hasta que el servicio se detenga
-            self.shutdown_event.wait(timeout=time_to_wait)
+        self.scheduler.run()
             
-            if self.shutdown_event.is_set():
-                break
-                
-            self._perform_auto_sync()
+    def _fetch_devices(self):
+        """Obtiene la lista de dispositivos (caché con TTL; None si no hay API ni lista guardada)"""
+        devices_url = f"{self.api_url_base}/biometricdevices"
+        if self.device_registry is None or self.device_registry.url != devices_url:
+            self.device_registry = DeviceRegistry(devices_url, log=self._log_sync)
+        return self.device_registry.get_devices()
             
     def _perform_auto_sync(self):
         """Realiza la sincronización de todos los dispositivos de la red local."""
+        devices = self._fetch_devices()
+        if devices:
+            if not self.is_installer_mode:
+                print(f"✓ {len(devices)} dispositivos encontrados en el sistema.")
+            self._sync_devices(devices)
+        elif not self.is_installer_mode:
+            print("✗ No se encontraron dispositivos para sincronizar.")
+            
+    def _sync_devices(self, devices):
+        """Sincroniza los dispositivos indicados en este mismo proceso con concurrencia limitada"""
         if not self.is_installer_mode:
             print(f"\n--- Iniciando sincronización automática a las {datetime.now().strftime('%H:%M:%S')} ---")
         
         try:
-            # 1. Obtener la lista de dispositivos de la API
-            devices_url = f"{self.api_url_base}/biometricdevices"
-            response = requests.get(devices_url, timeout=10)
-            devices = response.json()
-            
-            if not isinstance(devices, list) or not devices:
-                if not self.is_installer_mode:
-                    print("✗ No se encontraron dispositivos para sincronizar.")
-                return
-            
+            devices = [d for d in devices if d.get('ip_address') and d.get('port')]
+            engine = SyncEngine(
+                api_url_base=self.api_url_base,
+                verbose=not self.is_installer_mode,
+                log=self._log_sync,
+            )
             if not self.is_installer_mode:
-                print(f"✓ {len(devices)} dispositivos encontrados en el sistema.")
-                
-            # 2. Iterar sobre cada dispositivo
-            app_path = self.get_sync_app_path()
-            if not app_path:
-                if not self.is_installer_mode:
-                    print("✗ Ejecutable ZKTeco-Sync.exe no encontrado. Abortando.")
-                return
-                
-            for device_data in devices:
-                ip = device_data.get('ip_address')
-                port = device_data.get('port')
-                if not ip or not port:
-                    continue
-                
-                # Opcional: Verificación simple de conectividad (ping)
-                if not self.is_installer_mode:
-                    print(f"  > Intentando conectar con {ip} ({device_data.get('name')})...")
-                    
-                # Ejecutar la sincronización en modo silencioso. La app ZKTeco-Sync.exe se encargará de la conexión.
-                params = json.dumps(device_data, ensure_ascii=False)
-                
-                # Ejecutar la aplicación en modo silencioso (con el nuevo argumento --silent)
-                subprocess.Popen(
-                    [app_path, '--params-system', params, '--silent'],
-                    shell=False,
-                    creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-                )
-                if not self.is_installer_mode:
-                    print(f"    ✓ Sincronización silenciosa iniciada para {ip}.")
+                print(f"  > Sincronizando {len(devices)} dispositivos (máx. {engine.concurrency} en paralelo)...")
+
+            summary = engine.run(devices)
+            self.last_sync_summary = summary
+            log_event(self.logger, "Sincronización automática finalizada",
+                      level=logging.INFO if not summary['failed'] and not summary['timeout'] else logging.WARNING,
+                      devices=len(devices), ok=summary['ok'], failed=summary['failed'], timeout=summary['timeout'],
+                      sent=summary['sent'], skipped=summary['skipped'], duration=round(summary['elapsed'], 3))
 
-        except requests.exceptions.RequestException as e:
             if not self.is_installer_mode:
-                print(f"✗ Error al conectar con la API de dispositivos: {e}")
+                print(f"✓ Resumen: {summary['ok']} correctos, {summary['failed']} con error, "
+                      f"{summary['timeout']} por timeout; {summary['sent']} registros enviados, "
+                      f"{summary['skipped']} omitidos por duplicados, en {summary['elapsed']:.1f}s.")
+                for result in summary['devices']:
+                    if not result['ok']:
+                        print(f"    ✗ {result['name']} ({result['ip_address']}): {result['error']}")
+
         except Exception as e:
+            self.logger.exception("Error durante la sincronización automática")
             if not self.is_installer_mode:
                 print(f"✗ Error durante la sincronización automática: {e}")
                 
         if not self.is_installer_mode:
             print("--- Sincronización automática finalizada ---")
+
+    @staticmethod
+    def _collect_outbox_depth(registry):
+        """Actualiza la profundidad de la cola local por dispositivo antes de exportar las métricas"""
+        registry.replace('zkteco_outbox_depth', [
+            ({'device': device_id}, count) for device_id, count in get_outbox().depth_by_device().items()
+        ])
+
+    def _log_sync(self, message):
+        """Mensajes del motor de sincronización"""
+        self.logger.info(message)
+        if not self.is_installer_mode:
+            print(message)
+
+    def _log_warning(self, message):
+        """Avisos del servicio que no impiden arrancar"""
+        self.logger.warning(message)
+        if not self.is_installer_mode:
+            print(f"⚠ {message}")
     # --- FIN DE LA PARTE AGREGADA ---
     
-    def get_sync_app_path(self):
-        """Busca y retorna la ruta del ejecutable ZKTeco-Sync.exe"""
-        app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ZKTeco-Sync.exe')
-        if not os.path.exists(app_path):
-            app_path = 'C:\\Program Files\\ZKTeco Sync\\ZKTeco-Sync.exe'
-        if not os.path.exists(app_path):
-            return None
-        return app_path
-
     def init_flask_server(self):
         """Inicializar servidor Flask básico"""
         self.flask_app = Flask(__name__)
         CORS(self.flask_app)
+        metrics.add_collector(self._collect_outbox_depth)
         
         # Suprimir logs de Flask completamente
         import logging
@@ -220,9 +249,22 @@ class ZKTecoService:
                 'tipo': 'servicio_windows',
                 'timestamp': datetime.now().isoformat(),
                 'uptime': int(time.time() - self.start_time) if self.start_time else 0,
-                'installer_mode': self.is_installer_mode
+                'installer_mode': self.is_installer_mode,
+                'ready': self.ready_event.is_set(),
+                'startup': self.startup.as_dict(),
+                'http': get_http_client().stats(),
+                'dedup': get_dedup_index().stats(),
+                'registry': self.device_registry.stats() if self.device_registry else None,
+                'server': self.http_server.stats() if self.http_server else None,
+                'logging': logging_stats()
             })
         
+        @self.flask_app.route('/ready', methods=['GET'])
+        def ready():
+            # 200 solo cuando el servidor acepta conexiones y el programador está en marcha
+            status = 200 if self.ready_event.is_set() else 503
+            return jsonify({'ready': status == 200, 'startup': self.startup.as_dict()}), status
+        
         @self.flask_app.route('/execute-sync', methods=['POST'])
         def execute_sync():
             """Ejecuta la sincronización con parámetros del dispositivo"""
@@ -236,41 +278,144 @@ class ZKTecoService:
                     if field not in device_data:
                         return jsonify({'success': False, 'message': f'Campo requerido faltante: {field}'}), 400
 
-                app_path = self.get_sync_app_path()
-                if not app_path:
-                    return jsonify({'success': False, 'message': 'ZKTeco-Sync no encontrada'}), 404
-
-                params = json.dumps(device_data, ensure_ascii=False)
+                job, created = get_job_manager().submit(
+                    device_data,
+                    api_url_base=self.api_url_base,
+                    full_resync=bool(device_data.get('full_resync')),
+                )
                 
-                # Debug - log de los parámetros enviados (solo si no está en modo instalador)
+                log_event(self.logger, "Sincronización manual solicitada", job=job.id, created=created,
+                          device=device_data['id'], name=device_data['name'])
                 if not self.is_installer_mode:
-                    print(f"\n[MANUAL] Ejecutando: {app_path}")
-                    print(f"[MANUAL] Parámetros: {params}")
-                
-                # Ejecutar en modo interactivo (con GUI)
-                subprocess.Popen(
-                    [app_path, '--params-system', params],
-                    shell=False,
-                    creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-                )
+                    estado_job = 'creado' if created else 'ya en curso'
+                    print(f"\n[MANUAL] Trabajo {job.id} {estado_job}: {device_data['name']} ({device_data['ip_address']}:{device_data['port']})")
                 
                 return jsonify({
                     'success': True, 
-                    'message': 'Sincronización iniciada',
+                    'message': 'Sincronización iniciada' if created else 'Ya hay una sincronización en curso para este dispositivo',
+                    'job_id': job.id,
+                    'job': job.to_dict(),
                     'device_info': {
                         'id': device_data['id'],
                         'name': device_data['name'],
                         'ip': device_data['ip_address'],
                         'port': device_data['port']
                     }
-                })
+                }), 202
                 
             except Exception as e:
                 error_msg = f'Error ejecutando sincronización: {str(e)}'
+                self.logger.exception("Error ejecutando sincronización manual")
                 if not self.is_installer_mode:
                     print(error_msg)
                 return jsonify({'success': False, 'message': error_msg}), 500
         
+        @self.flask_app.route('/sync-users', methods=['POST'])
+        def sync_users():
+            """Envía a la nube los usuarios del dispositivo que cambiaron desde el último envío"""
+            device_data = request.get_json(silent=True)
+            if not device_data:
+                return jsonify({'success': False, 'message': 'No se recibieron datos'}), 400
+            for field in ('id', 'name', 'ip_address', 'port'):
+                if field not in device_data:
+                    return jsonify({'success': False, 'message': f'Campo requerido faltante: {field}'}), 400
+
+            # Como /execute-sync: se ejecuta como trabajo y se consulta en /jobs/<id>
+            job, created = get_job_manager().submit(device_data, api_url_base=self.api_url_base,
+                                                    full_resync=bool(device_data.get('full')), kind='users')
+            log_event(self.logger, "Sincronización de usuarios solicitada", job=job.id, created=created,
+                      device=device_data['id'], name=device_data['name'])
+            return jsonify({
+                'success': True,
+                'message': ('Sincronización de usuarios iniciada' if created
+                            else 'Ya hay una sincronización de usuarios en curso para este dispositivo'),
+                'job_id': job.id,
+                'job': job.to_dict(),
+            }), 202
+        
+        @self.flask_app.route('/discover', methods=['POST'])
+        def discover():
+            """Busca terminales en rangos de red: {"ranges": ["192.168.1.0/24"], "port": 4370}"""
+            data = request.get_json(silent=True) or {}
+            ranges = data.get('ranges')
+            if isinstance(ranges, str):
+                ranges = [ranges]
+            if not ranges:
+                return jsonify({'success': False, 'message': 'Campo requerido faltante: ranges'}), 400
+            try:
+                port = int(data.get('port', 4370))
+                expand_ranges(ranges, get_settings('discovery')['max_hosts'])
+            except (TypeError, ValueError) as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+
+            # Puede tardar minutos: se ejecuta como trabajo y se consulta en /jobs/<id>
+            job, created = get_job_manager().submit_discovery([str(value).strip() for value in ranges], port)
+            log_event(self.logger, "Búsqueda de dispositivos solicitada", job=job.id, created=created,
+                      ranges=ranges, port=port)
+            return jsonify({
+                'success': True,
+                'message': 'Búsqueda iniciada' if created else 'Ya hay una búsqueda en curso para esos rangos',
+                'job_id': job.id,
+                'job': job.to_dict(),
+            }), 202
+        
+        @self.flask_app.route('/jobs', methods=['GET'])
+        def list_jobs():
+            """Trabajos de sincronización recientes (más nuevos primero)"""
+            try:
+                limit = max(1, min(int(request.args.get('limit', 50)), 500))
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Parámetro limit inválido'}), 400
+            jobs = get_job_manager().store.recent(limit=limit, status=request.args.get('status'))
+            return jsonify({'jobs': [job.to_dict() for job in jobs]})
+        
+        @self.flask_app.route('/jobs/<job_id>', methods=['GET'])
+        def get_job(job_id):
+            """Estado, progreso y resultado de un trabajo de sincronización"""
+            job = get_job_manager().store.get(job_id)
+            if not job:
+                return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+            return jsonify(job.to_dict())
+        
+        @self.flask_app.route('/attendance', methods=['GET'])
+        def attendance():
+            """Marcaciones del almacén local: ?user=&device=&from=&to=&page=&per_page="""
+            args = request.args
+            try:
+                page = max(1, int(args.get('page', 1)))
+                per_page = max(1, min(int(args.get('per_page', 100)), 1000))
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Parámetros page/per_page inválidos'}), 400
+            try:
+                start = time_bound(args['from']) if args.get('from') else None
+                end = time_bound(args['to'], end=True) if args.get('to') else None
+            except ValueError:
+                return jsonify({'success': False,
+                                'message': 'Fecha inválida: use AAAA-MM-DD o AAAA-MM-DD HH:MM:SS'}), 400
+
+            rows, total = get_attendance_store().query(
+                user=args.get('user') or None, device=args.get('device') or None, start=start, end=end,
+                limit=per_page, offset=(page - 1) * per_page)
+            return jsonify({
+                'data': rows,
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+            })
+        
+        @self.flask_app.route('/metrics', methods=['GET'])
+        def metrics_endpoint():
+            """Métricas de sincronización en formato de texto de Prometheus"""
+            return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+        
+        @self.flask_app.route('/schedule', methods=['GET'])
+        def schedule():
+            """Próximas sincronizaciones programadas por dispositivo"""
+            if not self.scheduler:
+                return jsonify({'devices': []})
+            return jsonify({'devices': self.scheduler.next_runs()})
+        
         @self.flask_app.route('/shutdown', methods=['POST'])
         def shutdown():
             """Cerrar servicio"""
@@ -290,8 +435,12 @@ class ZKTecoService:
     def start_service(self):
         """Iniciar el servicio"""
         try:
+            start_logging()
+            self.startup.mark('logging')
+
             # Verificar si el puerto está disponible
             if not self.check_port_available(self.port):
+                self.logger.error(f"Puerto {self.port} ya está en uso")
                 if not self.is_installer_mode:
                     print(f"✗ Puerto {self.port} ya está en uso")
                 return False
@@ -304,52 +453,70 @@ class ZKTecoService:
             
             # Inicializar Flask
             self.init_flask_server()
+            self.startup.mark('flask_app')
             
-            # Iniciar servidor Flask en thread separado
-            def run_flask():
-                # Suprimir salida de Flask completamente en modo instalador
-                if self.is_installer_mode:
-                    import sys
-                    from io import StringIO
-                    old_stdout = sys.stdout
-                    old_stderr = sys.stderr
-                    sys.stdout = StringIO()
-                    sys.stderr = StringIO()
-                
-                try:
-                    self.flask_app.run(
-                        host=self.host,
-                        port=self.port,
-                        debug=False,
-                        use_reloader=False,
-                        threaded=True
-                    )
-                except Exception as e:
-                    if not self.is_installer_mode:
-                        print(f"Error en Flask: {e}")
-                finally:
-                    if self.is_installer_mode:
-                        sys.stdout = old_stdout
-                        sys.stderr = old_stderr
+            # Crear el servidor HTTP (el socket queda escuchando aquí mismo) y atenderlo en un hilo
+            try:
+                self.http_server = create_server(self.flask_app, self.host, self.port, self.server_backend,
+                                                 log=self._log_warning)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Error iniciando el servidor HTTP: {e}")
+                if not self.is_installer_mode:
+                    print(f"✗ Error iniciando el servidor HTTP: {e}")
+                return False
+            self.startup.mark('bind')
             
-            self.flask_thread = threading.Thread(target=run_flask, daemon=True)
+            self.flask_thread = threading.Thread(target=self.http_server.serve_forever, name='http-server', daemon=True)
             self.flask_thread.start()
+            if not self.http_server.wait_serving(READY_TIMEOUT):
+                self.logger.error("El servidor HTTP no respondió a tiempo")
+                if not self.is_installer_mode:
+                    print("✗ El servidor HTTP no respondió a tiempo")
+                return False
+            self.startup.mark('serving')
 
             # --- PARTE AGREGADA: Iniciar el hilo de sincronización automática ---
-            self.auto_sync_thread = threading.Thread(target=self._run_auto_sync_loop, daemon=True)
+            self.scheduler = SyncScheduler(
+                fetch_devices=self._fetch_devices,
+                run_devices=self._sync_devices,
+                shutdown_event=self.shutdown_event,
+                log=self._log_sync,
+            )
+            self.auto_sync_thread = threading.Thread(target=self._run_auto_sync_loop, name='scheduler', daemon=True)
             self.auto_sync_thread.start()
+            if not self.scheduler.started.wait(READY_TIMEOUT):
+                self.logger.error("El programador de sincronizaciones no arrancó a tiempo")
+                if not self.is_installer_mode:
+                    print("✗ El programador de sincronizaciones no arrancó a tiempo")
+                return False
+            self.startup.mark('scheduler')
+
+            # Drenado en segundo plano de la cola local de asistencias pendientes
+            self.outbox_drainer = OutboxDrainer(get_outbox(), log=self._log_sync)
+            self.outbox_drainer.start()
+            self.startup.mark('outbox')
             # --- FIN DE LA PARTE AGREGADA ---
             
-            # Esperar un momento para que Flask se inicie
-            time.sleep(1 if not self.is_installer_mode else 2)
-            
             self.running = True
+            self.ready_event.set()
+            log_event(self.logger, "Servicio iniciado", host=self.host, port=self.port,
+                      backend=self.http_server.stats()['backend'], installer_mode=self.is_installer_mode,
+                      mode_source=self.installer_mode_source, startup=self.startup.as_dict())
             
             if not self.is_installer_mode:
-                print(f"✓ Servidor iniciado en http://{self.host}:{self.port}")
+                print(f"✓ {self.startup.summary()}; modo: {self.installer_mode_source}")
+                print(f"✓ Servidor iniciado en http://{self.host}:{self.port} ({self.http_server.stats()['backend']})")
                 print("Rutas disponibles:")
                 print("   GET  /estado - Estado del servicio")
+                print("   GET  /ready - Listo para recibir peticiones (503 mientras arranca)")
                 print("   POST /execute-sync - Ejecutar sincronización (manual)")
+                print("   GET  /jobs - Trabajos de sincronización recientes")
+                print("   GET  /jobs/<id> - Estado de un trabajo de sincronización")
+                print("   POST /sync-users - Sincronizar usuarios del dispositivo (trabajo)")
+                print("   GET  /attendance - Consultar marcaciones del almacén local")
+                print("   POST /discover - Buscar terminales en rangos de red (trabajo)")
+                print("   GET  /schedule - Próximas sincronizaciones programadas")
+                print("   GET  /metrics - Métricas de sincronización (Prometheus)")
                 print("   GET/POST /test - Ruta de prueba")
                 print("   POST /shutdown - Cerrar servicio")
             
@@ -361,9 +528,11 @@ class ZKTecoService:
                 # En modo normal, esperar comandos del usuario
                 self.run_interactive_service()
             
+            self.stop_service()
             return True
             
         except Exception as e:
+            self.logger.exception("Error iniciando servicio")
             if not self.is_installer_mode:
                 print(f"✗ Error iniciando servicio: {e}")
             return False
@@ -399,9 +568,23 @@ class ZKTecoService:
         """Detener el servicio"""
         try:
             self.shutdown_event.set()
+            if self.outbox_drainer:
+                self.outbox_drainer.stop()
+            if self.http_server:
+                # Terminar las peticiones en curso (incluida la de /shutdown) antes de salir
+                server, self.http_server = self.http_server, None
+                drained = server.drain(get_settings('server')['drain_timeout'])
+                if not drained:
+                    self.logger.warning("Algunas peticiones no terminaron a tiempo")
+                    if not self.is_installer_mode:
+                        print("✗ Algunas peticiones no terminaron a tiempo")
             self.running = False
+            log_event(self.logger, "Servicio detenido",
+                      uptime=int(time.time() - self.start_time) if self.start_time else 0)
+            stop_logging()
             return True
         except Exception as e:
+            self.logger.exception("Error deteniendo servicio")
             if not self.is_installer_mode:
                 print(f"✗ Error deteniendo servicio: {e}")
             return False
@@ -414,6 +597,20 @@ class ZKTecoService:
         except:
             return False
 
+    def wait_until_ready(self, timeout=30):
+        """Espera a que otra instancia del servicio responda 200 en /ready"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                response = requests.get(f'http://{self.host}:{self.port}/ready', timeout=2)
+                if response.status_code == 200:
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.1)
+
 
 def signal_handler(signum, frame):
     """Manejar señales del sistema"""
@@ -425,14 +622,40 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    if len(sys.argv) != 2 or sys.argv[1] not in ['start', 'stop']:
-        print("Uso:")
-        print("   python zkteco_service.py start    - Iniciar servicio")
-        print("   python zkteco_service.py stop    - Detener servicio")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="ZKTeco Service")
+    parser.add_argument('action', choices=['start', 'stop', 'wait', 'discover'],
+                        help="start: iniciar servicio, stop: detener servicio, wait: esperar a que esté listo, "
+                             "discover: buscar terminales en la red")
+    parser.add_argument('ranges', nargs='*', help="Rangos CIDR o IPs para 'discover' (p. ej. 192.168.1.0/24)")
+    parser.add_argument('--port', type=int, default=4370, help="Puerto de los terminales para 'discover'")
+    parser.add_argument('--server', choices=SERVER_BACKENDS,
+                        help="Servidor HTTP: 'production' (hilos y cola acotados) o 'dev' (servidor de desarrollo)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--installer', dest='installer_mode', action='store_true', default=None,
+                      help="Modo instalador: sin mensajes ni consola interactiva")
+    mode.add_argument('--interactive', dest='installer_mode', action='store_false',
+                      help="Modo consola, aunque se detecten archivos de instalación")
+    parser.add_argument('--timeout', type=float, default=30, help="Segundos de espera para 'wait'")
+    args = parser.parse_args()
     
-    action = sys.argv[1]
-    service = ZKTecoService()
+    action = args.action
+    if action == 'discover':
+        if not args.ranges:
+            parser.error("'discover' requiere al menos un rango (p. ej. 192.168.1.0/24)")
+        try:
+            result = SubnetScanner(port=args.port).scan(args.ranges)
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        for device in result['devices']:
+            print(f"✓ {device['ip']}:{device['port']} ({device['protocol'].upper()}) - {device['device_name']} "
+                  f"· serie {device['serial_number']} · firmware {device['firmware_version']}")
+        print(f"{len(result['devices'])} dispositivos encontrados en {result['scanned']} direcciones "
+              f"({result['elapsed']:.1f}s)")
+        sys.exit(0 if result['devices'] else 1)
+
+    service = ZKTecoService(installer_mode=args.installer_mode)
+    service.server_backend = args.server
     
     if action == 'start':
         # Verificar si ya está ejecutándose
@@ -459,6 +682,15 @@ def main():
                 print(f"✗ Error: {e}")
             sys.exit(1)
     
+    elif action == 'wait':
+        if service.wait_until_ready(args.timeout):
+            if not service.is_installer_mode:
+                print("✓ El servicio está listo")
+            sys.exit(0)
+        if not service.is_installer_mode:
+            print(f"✗ El servicio no estuvo listo en {args.timeout:g}s")
+        sys.exit(1)
+    
     elif action == 'stop':
         # Verificar si está ejecutándose
         if not service.is_running():
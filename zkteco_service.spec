@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # waitress se importa dentro de un try (servidor 'production'): incluirlo siempre
+    hiddenimports=['waitress', 'waitress.server', 'waitress.wasyncore'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],